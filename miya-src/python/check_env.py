@@ -4,9 +4,20 @@ import json
 import os
 import shutil
 import sys
+import time
 from pathlib import Path
-from typing import Any
-from path_layout import flux_klein_dir, flux_schnell_dir, sovits_dir
+from typing import Any, Optional
+from path_layout import (
+    capability_profile_path,
+    flux_klein_dir,
+    flux_schnell_dir,
+    load_manifest,
+    manifest_is_fresh,
+    sovits_dir,
+)
+
+# 基准参考值：调度器按 实测/参考 比例缩放超时，参考机约为 RTX 3060 级别。
+_REFERENCE_GPU_GFLOPS = 12000.0
 
 
 def _to_mb(v: int) -> float:
@@ -48,14 +59,17 @@ def _probe_paths() -> dict[str, Any]:
             str(sovits_dir()),
         )
     )
-    return {
-        "flux1_exists": flux_path.exists(),
-        "flux1_path": str(flux_path),
-        "flux2_exists": flux2_path.exists(),
-        "flux2_path": str(flux2_path),
-        "sovits_exists": sovits_path.exists(),
-        "sovits_path": str(sovits_path),
-    }
+    out: dict[str, Any] = {}
+    for key, path in (("flux1", flux_path), ("flux2", flux2_path), ("sovits", sovits_path)):
+        exists = path.is_dir()
+        out[f"{key}_exists"] = exists
+        out[f"{key}_path"] = str(path)
+        # 只读已有清单，不遍历也不写盘；清单缺失或过期时不报文件数，由首次装载模型时重建。
+        manifest = load_manifest(path) if exists else None
+        if manifest is not None and manifest_is_fresh(path, manifest):
+            out[f"{key}_files"] = len(manifest["files"])
+            out[f"{key}_bytes"] = manifest["total_bytes"]
+    return out
 
 
 def _probe_bins() -> dict[str, Any]:
@@ -67,10 +81,78 @@ def _probe_bins() -> dict[str, Any]:
     }
 
 
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeats)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _bench_gpu_matmul(repeats: int) -> Optional[dict[str, Any]]:
+    try:
+        import torch  # type: ignore
+    except Exception:
+        return None
+    try:
+        if not torch.cuda.is_available():
+            return None
+        torch.manual_seed(0)
+        n = 2048
+        a = torch.rand((n, n), dtype=torch.float16, device="cuda")
+        b = torch.rand((n, n), dtype=torch.float16, device="cuda")
+        torch.matmul(a, b)
+        torch.cuda.synchronize()
+
+        def _run():
+            torch.matmul(a, b)
+            torch.cuda.synchronize()
+
+        elapsed = _best_of(_run, repeats)
+        del a, b
+        torch.cuda.empty_cache()
+        gflops = (2 * n**3) / max(elapsed, 1e-9) / 1e9
+        return {"dtype": "float16", "size": n, "seconds": round(elapsed, 6), "gflops": round(gflops, 3)}
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+def _scale(reference: float, measured: Optional[float]) -> Optional[float]:
+    if not measured or measured <= 0:
+        return None
+    return round(max(0.25, min(16.0, reference / measured)), 3)
+
+
+def run_bench(repeats: int) -> dict[str, Any]:
+    # 只测调度器实际读取的 GPU 吞吐（timeout_scale.gpu）。
+    gpu = _bench_gpu_matmul(repeats)
+    gpu_gflops = gpu.get("gflops") if gpu else None
+    return {
+        "version": 1,
+        "measuredAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "gpu_matmul": gpu,
+        # 调度器直接读取的派生值：>1 表示比参考机慢，GPU 任务的超时和出图规划按比例放大。
+        "timeout_scale": {
+            "gpu": _scale(_REFERENCE_GPU_GFLOPS, gpu_gflops),
+        },
+    }
+
+
+def _write_profile(path: Path, profile: dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(profile, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description="Miya runtime environment check")
     p.add_argument("--min-vram-mb", type=int, default=int(os.getenv("MIYA_MIN_VRAM_MB", "4096")))
     p.add_argument("--strict", action="store_true", help="exit non-zero if critical checks fail")
+    p.add_argument("--bench", action="store_true", help="benchmark GPU throughput and write a capability profile")
+    p.add_argument("--bench-output", default=os.getenv("MIYA_CAPABILITY_PROFILE", str(capability_profile_path())))
+    p.add_argument("--bench-repeats", type=int, default=int(os.getenv("MIYA_BENCH_REPEATS", "3")))
     return p
 
 
@@ -104,6 +186,13 @@ def main() -> int:
         "binaries": bins_info,
         "min_vram_mb": args.min_vram_mb,
     }
+    if args.bench:
+        profile = run_bench(args.bench_repeats)
+        profile["vram_total_mb"] = torch_info.get("vram_total_mb")
+        profile["vram_free_mb"] = torch_info.get("vram_free_mb")
+        _write_profile(Path(args.bench_output), profile)
+        result["bench"] = profile
+        result["bench_output"] = args.bench_output
     print(json.dumps(result, ensure_ascii=False, indent=2))
 
     if args.strict and issues:
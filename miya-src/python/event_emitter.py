@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Iterable, Optional
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional speedup
+    orjson = None
+
+TERMINAL_EVENTS = frozenset({"done", "error", "canceled"})
+DEFAULT_COALESCED_EVENTS = frozenset({"progress", "gpu"})
+_BATCH_LIMIT = 64
+
+
+def _encode(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload) + b"\n"
+    return json.dumps(payload).encode("utf-8") + b"\n"
+
+
+class _Item:
+    __slots__ = ("line", "counted", "written")
+
+    def __init__(self, line: bytes, counted: bool, written: Optional[threading.Event] = None):
+        self.line = line
+        self.counted = counted
+        self.written = written
+
+
+class EventEmitter:
+    """Single-writer JSON-lines emitter for worker stdout.
+
+    Events go through a bounded queue to one writer thread that batches them
+    into a single write per wakeup. Chatty event types (``progress``/``gpu``)
+    are coalesced to at most one line per ``coalesce_interval_s`` with the
+    latest payload winning; ``done``/``error``/``canceled`` flush any pending
+    coalesced events first and block until they are on the wire.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[BinaryIO] = None,
+        coalesce_interval_s: Optional[float] = None,
+        coalesce_events: Iterable[str] = DEFAULT_COALESCED_EVENTS,
+        max_queue: int = 256,
+        on_broken_pipe: Optional[Callable[[], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if coalesce_interval_s is None:
+            coalesce_interval_s = float(os.getenv("MIYA_EVENT_COALESCE_MS", "500")) / 1000.0
+        self._stream = stream
+        self.coalesce_interval_s = max(0.0, coalesce_interval_s)
+        self.coalesce_events = frozenset(coalesce_events)
+        self.on_broken_pipe = on_broken_pipe
+        self.broken = False
+        self.lines_written = 0
+        self.writes = 0
+        self._clock = clock
+        # SimpleQueue.put 可重入（信号处理函数里也能安全调用），容量上限由信号量保证。
+        self._queue: queue.SimpleQueue[Optional[_Item]] = queue.SimpleQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_queue))
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict] = {}
+        self._last_sent: dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def stream(self) -> BinaryIO:
+        return self._stream if self._stream is not None else sys.stdout.buffer
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="miya-emitter", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def emit(self, payload: dict):
+        if self.broken:
+            raise BrokenPipeError("event_stream_closed")
+        if self._closed:
+            self._write_direct(payload)
+            return
+        self._ensure_writer()
+        event = payload.get("event")
+        if event in TERMINAL_EVENTS:
+            self._flush_pending()
+            written = threading.Event()
+            self._put(_encode(payload), written=written)
+            written.wait(5.0)
+            if self.broken:
+                raise BrokenPipeError("event_stream_closed")
+            return
+        if event in self.coalesce_events and self.coalesce_interval_s > 0:
+            now = self._clock()
+            with self._lock:
+                if event not in self._pending and now - self._last_sent.get(event, -1e9) >= self.coalesce_interval_s:
+                    self._last_sent[event] = now
+                else:
+                    wake = event not in self._pending
+                    self._pending[event] = payload
+                    if wake:
+                        # 唤醒写线程以重新计算下一次合并发送的截止时间。
+                        self._queue.put(_Item(b"", counted=False))
+                    return
+        self._put(_encode(payload))
+
+    def emit_reentrant(self, payload: dict):
+        """Enqueue without taking any lock; safe to call from signal handlers."""
+        if self.broken or self._thread is None:
+            self._write_direct(payload)
+            return
+        self._queue.put(_Item(_encode(payload), counted=False))
+
+    def _put(self, line: bytes, written: Optional[threading.Event] = None, counted: bool = True):
+        if counted:
+            self._slots.acquire()
+        self._queue.put(_Item(line, counted=counted, written=written))
+
+    def _flush_pending(self, due_only: bool = False, counted: bool = True) -> Optional[float]:
+        """Move coalesced events into the queue; returns seconds until the next one is due."""
+        now = self._clock()
+        ready: list[dict] = []
+        next_due: Optional[float] = None
+        with self._lock:
+            for event, payload in list(self._pending.items()):
+                due_at = self._last_sent.get(event, -1e9) + self.coalesce_interval_s
+                if due_only and due_at > now:
+                    wait = due_at - now
+                    next_due = wait if next_due is None else min(next_due, wait)
+                    continue
+                ready.append(payload)
+                self._last_sent[event] = now
+                del self._pending[event]
+        for payload in ready:
+            self._put(_encode(payload), counted=counted)
+        return next_due
+
+    def _write_direct(self, payload: dict):
+        # 信号处理函数也会走到这里：直接 os.write 到 fd，不碰缓冲流的锁（可能正被写线程持有）。
+        data = _encode(payload)
+        try:
+            fd = self.stream.fileno()
+            while data:
+                data = data[os.write(fd, data):]
+        except (OSError, ValueError):
+            self._mark_broken()
+
+    def _mark_broken(self):
+        if self.broken:
+            return
+        self.broken = True
+        if self.on_broken_pipe is not None:
+            try:
+                self.on_broken_pipe()
+            except Exception:
+                pass
+
+    def _run(self):
+        timeout: Optional[float] = None
+        while True:
+            try:
+                first = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                first = _Item(b"", counted=False)
+            batch = [first]
+            while len(batch) < _BATCH_LIMIT:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is None for item in batch)
+            items = [item for item in batch if item is not None]
+            data = b"".join(item.line for item in items)
+            if data and not self.broken:
+                try:
+                    self.stream.write(data)
+                    self.stream.flush()
+                    self.writes += 1
+                    self.lines_written += sum(1 for item in items if item.line)
+                except (BrokenPipeError, ValueError, OSError):
+                    self._mark_broken()
+            for item in items:
+                if item.counted:
+                    self._slots.release()
+                if item.written is not None:
+                    item.written.set()
+            if stop:
+                return
+            # 写线程自身不能占用队列名额，否则队列满时会等待自己释放。
+            timeout = self._flush_pending(due_only=True, counted=False)
+
+    def close(self, timeout: float = 5.0):
+        if self._closed:
+            return
+        if self._thread is not None:
+            self._flush_pending()
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._closed = True
+
+
+def create_emitter(stop_event: Optional[threading.Event] = None, **kwargs: Any) -> EventEmitter:
+    on_broken = stop_event.set if stop_event is not None else None
+    return EventEmitter(on_broken_pipe=on_broken, **kwargs)
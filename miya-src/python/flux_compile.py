@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import Any, Callable, Optional
+from path_layout import compile_cache_dir
+
+DEFAULT_BUCKETS = "512,768,1024"
+
+
+def parse_buckets(text: str) -> list[tuple[int, int]]:
+    """``"512,768x512"`` -> [(512, 512), (768, 512)]; a bare number means a square size."""
+    buckets: list[tuple[int, int]] = []
+    for item in (text or "").split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if "x" in item:
+            w, h = item.split("x", 1)
+            size = (int(w), int(h))
+        else:
+            size = (int(item), int(item))
+        if size not in buckets:
+            buckets.append(size)
+    return buckets
+
+
+def configure_cache() -> str:
+    """Point inductor/triton at a persistent cache under the data root (explicit env wins).
+
+    Call before torch is imported: inductor reads these variables into its
+    config at import time, so setting them later only partly takes effect.
+    """
+    root = compile_cache_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", str(root / "inductor"))
+    os.environ.setdefault("TRITON_CACHE_DIR", str(root / "triton"))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+    return str(root)
+
+
+def _cache_counters() -> tuple[int, int]:
+    try:
+        from torch._dynamo.utils import counters  # type: ignore
+
+        inductor = counters["inductor"]
+        return int(inductor["fxgraph_cache_hit"]), int(inductor["fxgraph_cache_miss"])
+    except Exception:
+        return 0, 0
+
+
+class CompiledDenoiser:
+    """torch.compile'd transformer for fixed size buckets; every other size runs the eager module.
+
+    ``dynamic=False`` keeps one specialised graph per bucket. The pipeline's
+    ``transformer`` attribute is swapped per call by :meth:`select`.
+    """
+
+    def __init__(self, torch, pipe, buckets: list[tuple[int, int]], emit: Callable[[dict], None]):
+        self.torch = torch
+        self.eager = pipe.transformer
+        self.compiled: Optional[Any] = None
+        self.buckets = list(buckets)
+        self.warm: set[tuple[int, int]] = set()
+        self.emit = emit
+
+    def enable(self) -> bool:
+        if "torch._inductor.config" in sys.modules and "TORCHINDUCTOR_CACHE_DIR" not in os.environ:
+            # 调用方没有在导入 torch 前配置缓存：仍可编译，但 FX 图缓存开关已按默认值读取。
+            self.emit({"event": "warn", "message": "compile_cache_configured_late"})
+        try:
+            cache_dir = configure_cache()
+            dynamo_config = self.torch._dynamo.config
+            dynamo_config.cache_size_limit = max(dynamo_config.cache_size_limit, len(self.buckets) + 2)
+            self.compiled = self.torch.compile(self.eager, dynamic=False)
+        except Exception as exc:
+            self.emit({"event": "warn", "message": f"compile_unavailable:{exc}"})
+            self.compiled = None
+            return False
+        self.emit(
+            {
+                "event": "compile_enabled",
+                "buckets": [f"{w}x{h}" for w, h in self.buckets],
+                "cache_dir": cache_dir,
+            }
+        )
+        return True
+
+    def select(self, pipe, width: int, height: int) -> bool:
+        use = self.compiled is not None and (width, height) in self.buckets
+        pipe.transformer = self.compiled if use else self.eager
+        return use
+
+    def warmup(self, pipe, sizes: Optional[list[tuple[int, int]]] = None) -> list[dict[str, Any]]:
+        """One 1-step latent-only run per bucket: compiles it, or loads it from the on-disk cache."""
+        reports: list[dict[str, Any]] = []
+        for width, height in sizes if sizes is not None else self.buckets:
+            if self.compiled is None:
+                break
+            if (width, height) in self.warm or (width, height) not in self.buckets:
+                continue
+            self.select(pipe, width, height)
+            hits_before, misses_before = _cache_counters()
+            t0 = time.perf_counter()
+            try:
+                pipe(prompt="warmup", num_inference_steps=1, width=width, height=height, output_type="latent")
+            except Exception as exc:
+                # 编译失败不影响出图：整体退回 eager。
+                self.emit({"event": "warn", "message": f"compile_failed:{width}x{height}:{exc}"})
+                self.compiled = None
+                pipe.transformer = self.eager
+                break
+            hits_after, misses_after = _cache_counters()
+            hits, misses = hits_after - hits_before, misses_after - misses_before
+            report = {
+                "event": "compile",
+                "size": f"{width}x{height}",
+                "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+                # 全部子图都命中磁盘缓存才算 hit；计数器不可用时如实标记 unknown。
+                "cache": "miss" if misses else ("hit" if hits else "unknown"),
+                "graph_hits": hits,
+                "graph_misses": misses,
+            }
+            self.warm.add((width, height))
+            self.emit(report)
+            reports.append(report)
+        return reports
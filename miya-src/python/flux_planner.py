@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+from path_layout import (
+    capability_profile_path,
+    flux_klein_dir,
+    flux_schnell_dir,
+    flux_timing_profile_path,
+)
+
+PROFILE_VERSION = 2
+_EWMA_ALPHA = 0.3
+# 单步耗时统一折算到 1024x1024 并按像素数线性缩放（这一尺寸范围内近似成立）；
+# 固定开销以文本编码为主，与分辨率无关，按实测值直接记录。
+_REFERENCE_PIXELS = 1024 * 1024
+_RESOLUTION_LADDER = (1024, 768, 512)
+
+
+@dataclass(frozen=True)
+class ModelChoice:
+    name: str
+    model_dir: Callable[[], Path]
+    steps: tuple[int, ...]
+    # 同一 family 共享架构，LoRA 可以互相套用；换到别的 family 会装不上。
+    family: str
+    # 该模型推荐的 guidance：schnell 蒸馏后不读 guidance，klein 按 1.0 引导。
+    guidance_scale: float
+    # 未实测时的先验（参考机约 RTX 3060 级别，再按 capability profile 的 gpu 系数缩放）。
+    prior_step_ms: float
+    prior_overhead_ms: float
+    prior_load_ms: float
+
+
+# 按质量从高到低排列；同一分辨率下先试完前一个模型的步数阶梯。
+# schnell 与 klein 都是少步蒸馏模型，多跑步数没有收益。
+MODEL_CHOICES = (
+    ModelChoice("schnell", flux_schnell_dir, (4, 3, 2), "flux1", 0.0, 1400.0, 1500.0, 30000.0),
+    ModelChoice("klein", flux_klein_dir, (4, 3, 2), "flux2", 1.0, 550.0, 900.0, 12000.0),
+)
+
+
+def model_family(model_dir: str, choices: tuple[ModelChoice, ...] = MODEL_CHOICES) -> Optional[str]:
+    """Family of a known model dir, matched by path first and then by directory name."""
+    target = Path(model_dir)
+    for choice in choices:
+        if choice.model_dir() == target:
+            return choice.family
+    name = target.name.lower()
+    for choice in choices:
+        if choice.name in name:
+            return choice.family
+    return None
+
+
+def profile_key(model_dir: str) -> str:
+    return Path(model_dir).name
+
+
+def load_profile(path: Optional[Path] = None) -> dict[str, Any]:
+    path = path or flux_timing_profile_path()
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        raw = None
+    if not isinstance(raw, dict) or raw.get("version") != PROFILE_VERSION:
+        return {"version": PROFILE_VERSION, "models": {}}
+    raw.setdefault("models", {})
+    return raw
+
+
+def _save_profile(path: Path, profile: dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(profile, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _ewma(old: Optional[float], new: float) -> float:
+    if old is None:
+        return round(new, 2)
+    return round(old + _EWMA_ALPHA * (new - old), 2)
+
+
+def record_timing(
+    model_dir: str,
+    width: int,
+    height: int,
+    step_ms: Optional[float] = None,
+    overhead_ms: Optional[float] = None,
+    load_ms: Optional[float] = None,
+    path: Optional[Path] = None,
+):
+    """Fold one measurement into the per-model EWMA profile (step time normalised to 1024x1024)."""
+    path = path or flux_timing_profile_path()
+    profile = load_profile(path)
+    entry = profile["models"].setdefault(profile_key(model_dir), {})
+    scale = _REFERENCE_PIXELS / max(1, width * height)
+    if step_ms is not None:
+        entry["step_ms"] = _ewma(entry.get("step_ms"), step_ms * scale)
+        entry["samples"] = int(entry.get("samples", 0)) + 1
+    if overhead_ms is not None:
+        entry["overhead_ms"] = _ewma(entry.get("overhead_ms"), overhead_ms)
+    if load_ms is not None:
+        entry["load_ms"] = _ewma(entry.get("load_ms"), load_ms)
+    try:
+        _save_profile(path, profile)
+    except OSError:
+        pass
+
+
+def _gpu_scale() -> float:
+    try:
+        raw = json.loads(capability_profile_path().read_text(encoding="utf-8"))
+        value = float(raw["timeout_scale"]["gpu"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 1.0
+    return value if value > 0 else 1.0
+
+
+def _scaled_size(width: int, height: int, long_side: int) -> tuple[int, int]:
+    current = max(width, height)
+    if current <= long_side:
+        return width, height
+    ratio = long_side / current
+    # FLUX 的 latent 以 16 像素为粒度。
+    return max(16, int(width * ratio) // 16 * 16), max(16, int(height * ratio) // 16 * 16)
+
+
+def plan(
+    budget_ms: float,
+    width: int,
+    height: int,
+    loaded_model_dir: Optional[str] = None,
+    profile: Optional[dict[str, Any]] = None,
+    choices: tuple[ModelChoice, ...] = MODEL_CHOICES,
+    family: Optional[str] = None,
+) -> Optional[dict[str, Any]]:
+    """Best-quality (model, steps, size) whose estimated wall time fits ``budget_ms``.
+
+    Resolutions are tried from the requested size downwards and, at each size,
+    models in quality order with their step ladders. When nothing fits, the
+    cheapest candidate is returned with ``over_budget``. ``family`` limits the
+    candidates to models that share an architecture (a LoRA only loads there).
+    Returns None when no eligible model is installed.
+    """
+    profile = profile if profile is not None else load_profile()
+    gpu_scale = _gpu_scale()
+    available = [c for c in choices if c.model_dir().is_dir() and (family is None or c.family == family)]
+    if not available:
+        return None
+    sizes: list[tuple[int, int]] = []
+    for long_side in (max(width, height), *_RESOLUTION_LADDER):
+        size = _scaled_size(width, height, long_side)
+        if size not in sizes:
+            sizes.append(size)
+
+    candidates: list[dict[str, Any]] = []
+    for w, h in sizes:
+        pixel_scale = (w * h) / _REFERENCE_PIXELS
+        for choice in available:
+            model_dir = str(choice.model_dir())
+            measured = profile.get("models", {}).get(profile_key(model_dir), {})
+            step_ms = measured.get("step_ms")
+            overhead_ms = measured.get("overhead_ms")
+            load_ms = measured.get("load_ms")
+            source = "measured" if step_ms is not None else "prior"
+            step_ms = step_ms if step_ms is not None else choice.prior_step_ms * gpu_scale
+            overhead_ms = overhead_ms if overhead_ms is not None else choice.prior_overhead_ms * gpu_scale
+            load_ms = load_ms if load_ms is not None else choice.prior_load_ms
+            if loaded_model_dir == model_dir:
+                load_ms = 0.0
+            for steps in choice.steps:
+                estimate = load_ms + overhead_ms + steps * step_ms * pixel_scale
+                candidates.append(
+                    {
+                        "model": choice.name,
+                        "model_dir": model_dir,
+                        "steps": steps,
+                        "guidance_scale": choice.guidance_scale,
+                        "width": w,
+                        "height": h,
+                        "estimate_ms": round(estimate, 1),
+                        "load_ms": round(load_ms, 1),
+                        "source": source,
+                    }
+                )
+    for candidate in candidates:
+        if candidate["estimate_ms"] <= budget_ms:
+            return {**candidate, "budget_ms": budget_ms, "over_budget": False}
+    cheapest = min(candidates, key=lambda c: c["estimate_ms"])
+    return {**cheapest, "budget_ms": budget_ms, "over_budget": True}
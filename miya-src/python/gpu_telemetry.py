@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterable, Optional, Protocol
+
+METRIC_FIELDS = ("total_mb", "used_mb", "free_mb", "util_pct", "temp_c", "rss_mb", "cpu_pct")
+
+
+@dataclass
+class TelemetrySample:
+    ts: float
+    total_mb: Optional[float] = None
+    used_mb: Optional[float] = None
+    free_mb: Optional[float] = None
+    util_pct: Optional[float] = None
+    temp_c: Optional[float] = None
+    rss_mb: Optional[float] = None
+    cpu_pct: Optional[float] = None
+
+
+class GpuBackend(Protocol):
+    name: str
+
+    def read(self) -> dict[str, float]: ...
+
+
+class NvmlBackend:
+    name = "nvml"
+
+    def __init__(self, index: int = 0):
+        import pynvml  # type: ignore
+
+        pynvml.nvmlInit()
+        self._nvml = pynvml
+        self._handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+
+    def read(self) -> dict[str, float]:
+        nvml = self._nvml
+        mem = nvml.nvmlDeviceGetMemoryInfo(self._handle)
+        out = {
+            "total_mb": mem.total / 1024 / 1024,
+            "used_mb": mem.used / 1024 / 1024,
+            "free_mb": mem.free / 1024 / 1024,
+        }
+        try:
+            out["util_pct"] = float(nvml.nvmlDeviceGetUtilizationRates(self._handle).gpu)
+        except Exception:
+            pass
+        try:
+            out["temp_c"] = float(nvml.nvmlDeviceGetTemperature(self._handle, nvml.NVML_TEMPERATURE_GPU))
+        except Exception:
+            pass
+        return out
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self):
+        import torch  # type: ignore
+
+        if not torch.cuda.is_available():
+            raise RuntimeError("cuda_not_available")
+        self._torch = torch
+
+    def read(self) -> dict[str, float]:
+        free_b, total_b = self._torch.cuda.mem_get_info()
+        free_mb = free_b / 1024 / 1024
+        total_mb = total_b / 1024 / 1024
+        return {"total_mb": total_mb, "used_mb": total_mb - free_mb, "free_mb": free_mb}
+
+
+def detect_backend() -> Optional[GpuBackend]:
+    # NVML 不占用 CUDA 上下文且能读利用率/温度，优先；torch 只作兜底。
+    for factory in (NvmlBackend, TorchBackend):
+        try:
+            return factory()
+        except Exception:
+            continue
+    return None
+
+
+class ProcessProbe:
+    """Current process RSS and CPU share; psutil when present, /proc and os.times otherwise."""
+
+    def __init__(self):
+        try:
+            import psutil  # type: ignore
+
+            self._proc = psutil.Process(os.getpid())
+            self._proc.cpu_percent(None)
+        except Exception:
+            self._proc = None
+        self._last_cpu = sum(os.times()[:2])
+        self._last_wall = time.monotonic()
+
+    def read(self) -> dict[str, float]:
+        out: dict[str, float] = {}
+        if self._proc is not None:
+            try:
+                out["rss_mb"] = self._proc.memory_info().rss / 1024 / 1024
+                out["cpu_pct"] = float(self._proc.cpu_percent(None))
+                return out
+            except Exception:
+                pass
+        try:
+            with open("/proc/self/statm", "r", encoding="ascii") as f:
+                pages = int(f.read().split()[1])
+            out["rss_mb"] = pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+        except (OSError, ValueError, AttributeError, IndexError):
+            pass
+        cpu = sum(os.times()[:2])
+        wall = time.monotonic()
+        if wall > self._last_wall:
+            out["cpu_pct"] = 100.0 * (cpu - self._last_cpu) / (wall - self._last_wall)
+        self._last_cpu, self._last_wall = cpu, wall
+        return out
+
+
+def summarize(samples: Iterable[TelemetrySample]) -> dict[str, dict[str, float]]:
+    buckets: dict[str, list[float]] = {name: [] for name in METRIC_FIELDS}
+    for sample in samples:
+        for name in METRIC_FIELDS:
+            value = getattr(sample, name)
+            if value is not None:
+                buckets[name].append(value)
+    return {
+        name: {
+            "min": round(min(values), 2),
+            "avg": round(sum(values) / len(values), 2),
+            "max": round(max(values), 2),
+        }
+        for name, values in buckets.items()
+        if values
+    }
+
+
+class TelemetrySampler:
+    """Samples into a fixed-size ring buffer and emits one min/avg/max ``gpu`` event per window."""
+
+    def __init__(
+        self,
+        emit: Callable[[dict], None],
+        stop_event: threading.Event,
+        backend: Optional[GpuBackend] = None,
+        sample_interval_s: float = 1.0,
+        emit_interval_s: float = 5.0,
+        capacity: int = 600,
+        process_probe: Optional[Any] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._emit = emit
+        self._stop = stop_event
+        self.backend = backend
+        self.sample_interval_s = max(0.05, sample_interval_s)
+        self.emit_interval_s = max(self.sample_interval_s, emit_interval_s)
+        self.samples: deque[TelemetrySample] = deque(maxlen=max(1, capacity))
+        self._probe = process_probe if process_probe is not None else ProcessProbe()
+        self._clock = clock
+        self._window_start = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def sample_once(self) -> TelemetrySample:
+        values: dict[str, float] = {}
+        if self.backend is not None:
+            try:
+                values.update(self.backend.read())
+            except Exception:
+                pass
+        try:
+            values.update(self._probe.read())
+        except Exception:
+            pass
+        sample = TelemetrySample(ts=self._clock(), **{k: v for k, v in values.items() if k in METRIC_FIELDS})
+        if len(self.samples) == self.samples.maxlen:
+            self._window_start = max(0, self._window_start - 1)
+        self.samples.append(sample)
+        return sample
+
+    def flush_window(self) -> Optional[dict]:
+        window = list(self.samples)[self._window_start :]
+        self._window_start = len(self.samples)
+        if not window:
+            return None
+        payload = {
+            "event": "gpu",
+            "backend": self.backend.name if self.backend is not None else "none",
+            "samples": len(window),
+            "window_s": round(window[-1].ts - window[0].ts, 3),
+            "latest": {k: round(v, 2) for k, v in asdict(window[-1]).items() if k != "ts" and v is not None},
+            "metrics": summarize(window),
+        }
+        self._emit(payload)
+        return payload
+
+    def run(self):
+        per_window = max(1, round(self.emit_interval_s / self.sample_interval_s))
+        pending = 0
+        while not self._stop.is_set():
+            self.sample_once()
+            pending += 1
+            if pending >= per_window:
+                self.flush_window()
+                pending = 0
+            self._stop.wait(self.sample_interval_s)
+        if pending:
+            self.flush_window()
+
+    def start(self) -> threading.Thread:
+        # 没有 GPU 后端时照常采样进程 RSS/CPU，事件里 backend 为 "none"。
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+def start_gpu_telemetry(
+    emit: Callable[[dict], None],
+    stop_event: threading.Event,
+    emit_interval_s: float,
+    sample_interval_s: float = 1.0,
+) -> TelemetrySampler:
+    sampler = TelemetrySampler(
+        emit,
+        stop_event,
+        backend=detect_backend(),
+        sample_interval_s=sample_interval_s,
+        emit_interval_s=emit_interval_s,
+    )
+    sampler.start()
+    return sampler
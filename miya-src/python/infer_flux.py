@@ -1,25 +1,59 @@
 #!/usr/bin/env python3
 import argparse
+import copy
+import gc
+import inspect
+import io
 import json
 import os
+import queue
+import secrets
+import signal
 import sys
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib import metadata
 from pathlib import Path
 from typing import Optional
-from path_layout import flux_schnell_dir
+from event_emitter import create_emitter
+from flux_compile import DEFAULT_BUCKETS, CompiledDenoiser, configure_cache, parse_buckets
+from flux_planner import model_family, plan, record_timing
+from model_host import ModelHost, default_budgets
+from model_snapshot import QUANTS, pretrained_source, source_fingerprint, torch_dtype
+from path_layout import flux_schnell_dir, result_cache_dir
+from result_cache import ResultCache, cache_key, file_digest
 
 
 STOP_EVENT = threading.Event()
+# worker 模式下仅中止当前任务的取消标记；STOP_EVENT 则结束整个进程。
+JOB_CANCEL = threading.Event()
+OUTPUT_SUFFIXES = {"png": (".png",), "webp": (".webp",), "jpeg": (".jpg", ".jpeg")}
+
+
+EMITTER = create_emitter(STOP_EVENT)
 
 
 def _emit(payload: dict):
     try:
-        print(json.dumps(payload), flush=True)
+        EMITTER.emit(payload)
     except BrokenPipeError:
         STOP_EVENT.set()
         raise SystemExit(86)
 
 
+def _on_signal(signum, _frame):
+    STOP_EVENT.set()
+    EMITTER.emit_reentrant({"event": "signal", "signal": int(signum), "message": "interrupt_requested"})
+
+
+def _cancel_requested() -> bool:
+    return STOP_EVENT.is_set() or JOB_CANCEL.is_set()
+
+
 def _stdin_parent_watchdog():
     if os.getenv("MIYA_PARENT_STDIN_MONITOR") != "1":
         return
@@ -30,6 +64,39 @@ def _stdin_parent_watchdog():
             return
 
 
+class _DiffusersUnavailable(Exception):
+    pass
+
+
+class _Canceled(Exception):
+    def __init__(self, step: int):
+        super().__init__(f"canceled_at_step:{step}")
+        self.step = step
+
+
+class _StepMonitor:
+    """callback_on_step_end hook: aborts on STOP_EVENT/JOB_CANCEL and timestamps each finished step."""
+
+    def __init__(self):
+        self.marks: list[float] = []
+        self.latents = None
+
+    def __call__(self, _pipe, step: int, _timestep, callback_kwargs: dict) -> dict:
+        # 每个去噪步结束时检查；直接抛出以跳过剩余步数和 VAE 解码。
+        if _cancel_requested():
+            raise _Canceled(step + 1)
+        self.marks.append(time.perf_counter())
+        # 调度器每步返回新张量，只保留引用即可；最后一步的即为解码前的最终 latents。
+        self.latents = callback_kwargs.get("latents")
+        return callback_kwargs
+
+
+def _release_cuda_cache(torch):
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
 def _env(name: str, default: Optional[str] = None) -> Optional[str]:
     value = os.getenv(name)
     if value is None or value == "":
@@ -59,10 +126,62 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--embeddings-path", default=_env("MIYA_FLUX_EMBED_PATH"))
     p.add_argument("--output-path", default=_env("MIYA_FLUX_OUTPUT_PATH"))
     p.add_argument("--size", default=_env("MIYA_FLUX_SIZE", "1024x1024"))
-    p.add_argument("--steps", type=int, default=int(_env("MIYA_FLUX_STEPS", "20")))
+    p.add_argument(
+        "--steps",
+        type=int,
+        default=int(_env("MIYA_FLUX_STEPS")) if _env("MIYA_FLUX_STEPS") else None,
+        help="defaults to 4 for schnell, 20 otherwise",
+    )
     p.add_argument("--guidance-scale", type=float, default=float(_env("MIYA_FLUX_GUIDANCE_SCALE", "3.5")))
     p.add_argument("--seed", type=int, default=int(_env("MIYA_FLUX_SEED", "0")))
     p.add_argument("--tier", default=_env("MIYA_FLUX_TIER", "lora"))
+    p.add_argument(
+        "--latency-budget-ms",
+        type=float,
+        default=float(_env("MIYA_FLUX_LATENCY_BUDGET_MS", "0")),
+        help="pick model/steps/size from the local timing profile to fit this wall time (0 = off)",
+    )
+    p.add_argument(
+        "--output-format",
+        choices=sorted(OUTPUT_SUFFIXES),
+        default=_env("MIYA_FLUX_OUTPUT_FORMAT", "png"),
+    )
+    p.add_argument("--quality", type=int, default=int(_env("MIYA_FLUX_QUALITY", "90")), help="webp/jpeg quality")
+    p.add_argument(
+        "--compress-level",
+        type=int,
+        default=int(_env("MIYA_FLUX_PNG_COMPRESS_LEVEL", "6")),
+        help="png zlib level 0-9",
+    )
+    p.add_argument("--cache-max-mb", type=float, default=float(_env("MIYA_FLUX_CACHE_MAX_MB", "2048")))
+    p.add_argument("--no-cache", action="store_true", help="always regenerate and do not store the result")
+    p.add_argument(
+        "--latent-cache-size",
+        type=int,
+        default=int(_env("MIYA_FLUX_LATENT_CACHE_SIZE", "8")),
+        help="worker mode: final latents kept for refine requests",
+    )
+    p.add_argument(
+        "--compile",
+        action="store_true",
+        default=_env("MIYA_FLUX_COMPILE", "0") == "1",
+        help="torch.compile the transformer for --compile-buckets with a persistent cache under the data root",
+    )
+    p.add_argument("--compile-buckets", default=_env("MIYA_FLUX_COMPILE_BUCKETS", DEFAULT_BUCKETS))
+    p.add_argument(
+        "--quant",
+        choices=QUANTS,
+        default=_env("MIYA_FLUX_QUANT", "none"),
+        help="load only the prepared snapshot with this weight quantization (model_snapshot.py prepare --quant)",
+    )
+    p.add_argument(
+        "--worker",
+        action="store_true",
+        help=(
+            "read NDJSON jobs from stdin and keep the pipeline loaded; {\"cmd\": \"cancel\", \"id\": ...} aborts a job, "
+            "{\"cmd\": \"stats\"} reports resident models and budgets, {\"cmd\": \"unload\", \"model_dir\": ...} drops a model"
+        ),
+    )
     p.add_argument("--dry-run", action="store_true")
     return p
 
@@ -77,18 +196,245 @@ def _save_blank_png(path: Path):
     path.write_bytes(png_1x1)
 
 
-def _run_with_diffusers(args: argparse.Namespace, width: int, height: int, output: Path) -> bool:
+def _check_output_suffix(path: Path, fmt: str):
+    # 调用方按给定路径读取并按后缀判断 MIME，不能擅自改写文件名；不一致直接报错。
+    if path.suffix.lower() not in OUTPUT_SUFFIXES[fmt]:
+        raise ValueError(f"output_suffix_mismatch:{fmt}:{path.name}")
+
+
+def _encode_image(image, output: Path, fmt: str, quality: int, compress_level: int) -> dict:
+    t0 = time.perf_counter()
+    buf = io.BytesIO()
+    if fmt == "png":
+        image.save(buf, format="PNG", compress_level=min(9, max(0, compress_level)))
+    elif fmt == "webp":
+        image.save(buf, format="WEBP", quality=min(100, max(1, quality)), method=4)
+    else:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(buf, format="JPEG", quality=min(95, max(1, quality)), optimize=True)
+    data = buf.getvalue()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, output)
+    return {
+        "output_path": str(output),
+        "format": fmt,
+        "bytes": len(data),
+        "encode_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+
+
+def _placeholder_result(output: Path, args: argparse.Namespace) -> dict:
+    """Writes a 1x1 image in the requested format; without PIL it is PNG and ``format`` says so."""
+    try:
+        from PIL import Image  # type: ignore
+    except Exception:
+        _save_blank_png(output)
+        return {"output_path": str(output), "format": "png", "bytes": output.stat().st_size, "encode_ms": 0.0}
+    info = _encode_image(Image.new("RGB", (1, 1)), output, args.output_format, args.quality, args.compress_level)
+    return {**info, "encode_ms": 0.0}
+
+
+class _BackgroundEncoder:
+    """Single encode thread: PIL releases the GIL in zlib/libwebp, so the next job can denoise meanwhile."""
+
+    def __init__(self, cache: Optional[ResultCache] = None, max_pending: int = 2):
+        self.cache = cache
+        self.max_pending = max(1, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="miya-encode")
+        self._pending: list[Future] = []
+
+    def submit(self, job_id, image, output: Path, args: argparse.Namespace, key: Optional[str] = None):
+        self._pending = [f for f in self._pending if not f.done()]
+        # 限制排队的图片数量，避免编码跟不上时整图堆积在内存里。
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(0).result()
+        self._pending.append(self._pool.submit(self._encode, job_id, image, output, args, key))
+
+    def _encode(self, job_id, image, output: Path, args: argparse.Namespace, key: Optional[str]):
+        try:
+            info = _encode_image(image, output, args.output_format, args.quality, args.compress_level)
+        except Exception as exc:
+            _emit({"event": "request_error", "id": job_id, "message": f"encode_failed:{exc}"})
+            return
+        cache_status = _store_result(self.cache, key, output, args)
+        _emit({"event": "result", "id": job_id, "status": "ok", "seed": args.seed, "cache": cache_status, **info})
+
+    def drain(self):
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        self._pool.shutdown(wait=True)
+
+
+class _PipelineCache:
+    """FLUX pipelines held in a ModelHost, so the worker can keep several models resident.
+
+    Switching between models (schnell/klein, or a LoRA variant) reuses a pipeline that
+    is still within the VRAM/RAM budget; the host offloads or drops the least recently
+    used ones when a load would not fit.
+    """
+
+    def __init__(self, host: Optional[ModelHost] = None):
+        if host is None:
+            vram_budget, _ = default_budgets()
+            # 单模型时代的 worker 不限制内存；默认仍不限，只有显式设置时才按内存预算卸载。
+            ram_budget = float(_env("MIYA_FLUX_RAM_BUDGET_MB", "0"))
+            host = ModelHost(vram_budget, ram_budget, self._on_host_event, loaders={"flux": self._load})
+        self.host = host
+        self.key: Optional[tuple[str, str]] = None
+        self.pipe = None
+        self.torch = None
+        self.load_ms = 0.0
+        self.snapshot = False
+        self.denoiser: Optional[CompiledDenoiser] = None
+        self._loading: Optional[argparse.Namespace] = None
+        self._sources: dict[str, tuple[str, bool]] = {}
+        self._denoisers: dict[str, Optional[CompiledDenoiser]] = {}
+
+    def _load(self, model_dir: str, device: str, options: dict):
+        loaded = _load_pipeline(self._loading)
+        if loaded is None:
+            raise _DiffusersUnavailable()
+        self.torch, pipe, source, snapshot = loaded
+        self._sources[options["host_key"]] = (source, snapshot)
+        return pipe
+
+    def _on_host_event(self, payload: dict):
+        if payload.get("to") == "disk":
+            # 被卸载的管线不能再被编译封装引用，否则显存不会释放。
+            self._denoisers.pop(payload.get("key"), None)
+            self._sources.pop(payload.get("key"), None)
+        _emit(payload)
+
+    def get(self, args: argparse.Namespace):
+        key = (str(args.model_dir), str(args.lora_path or ""))
+        host_key = "\0".join(key)
+        self.pipe = None
+        self._loading = args
+        try:
+            entry, status = self.host.load(host_key, "flux", args.model_dir, options={"host_key": host_key})
+        except _DiffusersUnavailable:
+            self.key = None
+            return None
+        finally:
+            self._loading = None
+        self.key = key
+        self.pipe = entry.model
+        self.load_ms = entry.load_ms if status == "loaded" else 0.0
+        self.snapshot = self._sources.get(host_key, ("", False))[1]
+        if status == "loaded":
+            record_timing(args.model_dir, 1, 1, load_ms=self.load_ms)
+            _emit(
+                {
+                    "event": "model_loaded",
+                    "model_dir": args.model_dir,
+                    "source": self._sources[host_key][0],
+                    "snapshot": self.snapshot,
+                    "load_ms": self.load_ms,
+                    "device": entry.device,
+                    "footprint_mb": entry.footprint_mb,
+                }
+            )
+            denoiser = None
+            if args.compile and hasattr(self.pipe, "transformer"):
+                denoiser = CompiledDenoiser(self.torch, self.pipe, parse_buckets(args.compile_buckets), _emit)
+                denoiser = denoiser if denoiser.enable() else None
+            self._denoisers[host_key] = denoiser
+        self.denoiser = self._denoisers.get(host_key)
+        return self.pipe
+
+    @property
+    def loaded_model_dir(self) -> Optional[str]:
+        return self.key[0] if self.pipe is not None and self.key else None
+
+    def unload(self, model_dir: str) -> list[str]:
+        """Drops every resident pipeline of model_dir (any LoRA); returns the unloaded host keys."""
+        keys = [key for key, entry in self.host.models.items() if entry.model_dir == model_dir]
+        for key in keys:
+            self.host.unload(key)
+        if self.key is not None and self.key[0] == model_dir:
+            self.pipe = None
+            self.key = None
+            self.denoiser = None
+        return keys
+
+    def clear(self):
+        self.pipe = None
+        self.key = None
+        self.denoiser = None
+        self._denoisers.clear()
+        self._sources.clear()
+        self.host.unload_all()
+
+
+@dataclass
+class _LatentEntry:
+    latents: object
+    model_dir: str
+    lora_path: Optional[str]
+    size: str
+    prompt: str
+    seed: int
+
+
+class _LatentCache:
+    """Final (packed) latents of recent worker jobs, LRU by entry; addressable by job id or output path."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(0, capacity)
+        self.entries: OrderedDict[str, _LatentEntry] = OrderedDict()
+        self.aliases: dict[str, str] = {}
+
+    def put(self, output: Path, job_id, entry: _LatentEntry):
+        if self.capacity == 0 or entry.latents is None:
+            return
+        key = str(output.resolve())
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if job_id is not None:
+            self.aliases[str(job_id)] = key
+        while len(self.entries) > self.capacity:
+            evicted, _ = self.entries.popitem(last=False)
+            self.aliases = {a: k for a, k in self.aliases.items() if k != evicted}
+
+    def get(self, ref) -> Optional[_LatentEntry]:
+        key = self.aliases.get(str(ref))
+        if key is None:
+            key = str(Path(str(ref)).resolve())
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.aliases.clear()
+
+
+def _load_pipeline(args: argparse.Namespace):
     try:
         import torch  # type: ignore
         from diffusers import DiffusionPipeline  # type: ignore
     except Exception as exc:
-        print(json.dumps({"event": "warn", "message": f"diffusers_unavailable:{exc}"}), flush=True)
-        return False
+        _emit({"event": "warn", "message": f"diffusers_unavailable:{exc}"})
+        return None
 
-    pipe = DiffusionPipeline.from_pretrained(
-        args.model_dir,
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    )
+    dtype = _inference_dtype()
+    # 预先转换好的 safetensors 快照按 mmap 直接装载，无需再做 dtype 转换（见 model_snapshot.py prepare）。
+    source, from_snapshot = pretrained_source(args.model_dir, dtype, args.quant)
+    if args.quant != "none" and not from_snapshot:
+        _emit({"event": "warn", "message": f"quant_snapshot_missing:{dtype}-{args.quant}"})
+    try:
+        pipe = DiffusionPipeline.from_pretrained(source, torch_dtype=torch_dtype(torch, dtype))
+    except Exception as exc:
+        if not from_snapshot:
+            raise
+        _emit({"event": "warn", "message": f"snapshot_load_failed:{exc}"})
+        source, from_snapshot = args.model_dir, False
+        pipe = DiffusionPipeline.from_pretrained(source, torch_dtype=torch_dtype(torch, dtype))
     if torch.cuda.is_available():
         pipe = pipe.to("cuda")
 
@@ -96,46 +442,520 @@ def _run_with_diffusers(args: argparse.Namespace, width: int, height: int, outpu
     if args.lora_path and Path(args.lora_path).exists():
         try:
             pipe.load_lora_weights(str(Path(args.lora_path).parent), weight_name=Path(args.lora_path).name)
-            print(json.dumps({"event": "lora_loaded", "path": args.lora_path}), flush=True)
+            _emit({"event": "lora_loaded", "path": args.lora_path})
         except Exception as exc:
-            print(json.dumps({"event": "warn", "message": f"lora_load_failed:{exc}"}), flush=True)
+            _emit({"event": "warn", "message": f"lora_load_failed:{exc}"})
+    return torch, pipe, source, from_snapshot
+
+
+def _refine_kwargs(torch, pipe, init_latents, strength: float, steps: int, generator) -> dict:
+    """Noise cached final latents onto the tail of the flow-match schedule (img2img without a VAE encode).
 
+    Of a ``steps``-long schedule only the last ``strength`` fraction is run;
+    x_t = sigma * noise + (1 - sigma) * x_0 at the first kept (shifted) sigma.
+    """
+    params = inspect.signature(pipe.__call__).parameters
+    if "latents" not in params or "sigmas" not in params:
+        raise ValueError("refine_unsupported_by_pipeline")
+    total = max(1, steps)
+    run = min(total, max(1, int(round(total * strength))))
+    # 与 FluxPipeline 默认调度一致：linspace(1, 1/N, N)，只取尾部 run 个。
+    full = [1.0 - i * (1.0 - 1.0 / total) / (total - 1) for i in range(total)] if total > 1 else [1.0]
+    sigmas = full[total - run:]
+    scheduler = copy.deepcopy(pipe.scheduler)
+    mu = None
+    if scheduler.config.get("use_dynamic_shifting", False):
+        from diffusers.pipelines.flux.pipeline_flux import calculate_shift  # type: ignore
+
+        mu = calculate_shift(
+            init_latents.shape[1],
+            scheduler.config.get("base_image_seq_len", 256),
+            scheduler.config.get("max_image_seq_len", 4096),
+            scheduler.config.get("base_shift", 0.5),
+            scheduler.config.get("max_shift", 1.15),
+        )
+    scheduler.set_timesteps(sigmas=sigmas, device=init_latents.device, mu=mu)
+    start = float(scheduler.sigmas[0])
+    noise = torch.randn(init_latents.shape, generator=generator, device=init_latents.device, dtype=init_latents.dtype)
+    return {
+        "latents": start * noise + (1.0 - start) * init_latents,
+        "sigmas": sigmas,
+        "num_inference_steps": run,
+    }
+
+
+def _generate(torch, pipe, args: argparse.Namespace, width: int, height: int, refine: Optional[tuple] = None):
+    """Returns (image, final_latents); ``refine`` is (cached latents, strength)."""
     generator = None
     if args.seed != 0:
         generator = torch.Generator(device="cuda" if torch.cuda.is_available() else "cpu").manual_seed(args.seed)
 
-    image = pipe(
-        prompt=args.prompt,
-        negative_prompt=args.negative_prompt or None,
-        num_inference_steps=max(1, args.steps),
-        guidance_scale=max(0.0, args.guidance_scale),
-        width=width,
-        height=height,
-        generator=generator,
-    ).images[0]
+    monitor = _StepMonitor()
+    call_kwargs = {"num_inference_steps": max(1, args.steps)}
+    if "callback_on_step_end" in inspect.signature(pipe.__call__).parameters:
+        call_kwargs["callback_on_step_end"] = monitor
+    if refine is not None:
+        call_kwargs.update(_refine_kwargs(torch, pipe, refine[0], refine[1], args.steps, generator))
+    canceled_step: Optional[int] = None
+    try:
+        if _cancel_requested():
+            raise _Canceled(0)
+        t0 = time.perf_counter()
+        image = pipe(
+            prompt=args.prompt,
+            negative_prompt=args.negative_prompt or None,
+            guidance_scale=max(0.0, args.guidance_scale),
+            width=width,
+            height=height,
+            generator=generator,
+            **call_kwargs,
+        ).images[0]
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        steps = call_kwargs["num_inference_steps"]
+        if monitor.marks:
+            # 首个回调之前包含文本编码，最后一个回调之后是 VAE 解码，都计入固定开销。
+            marks = monitor.marks
+            if len(marks) > 1:
+                step_ms = (marks[-1] - marks[0]) * 1000.0 / (len(marks) - 1)
+            else:
+                step_ms = (marks[0] - t0) * 1000.0
+            overhead_ms = max(0.0, total_ms - step_ms * steps)
+            record_timing(args.model_dir, width, height, step_ms=step_ms, overhead_ms=overhead_ms)
+        else:
+            record_timing(args.model_dir, width, height, step_ms=total_ms / steps)
+        return image, monitor.latents
+    except _Canceled as exc:
+        canceled_step = exc.step
+    # 在 except 块之外重新抛出：原回溯会持有管线内部帧里的 latents。
+    raise _Canceled(canceled_step)
+
 
-    output.parent.mkdir(parents=True, exist_ok=True)
-    image.save(output)
-    return True
+def _render(
+    cache: _PipelineCache,
+    args: argparse.Namespace,
+    width: int,
+    height: int,
+    refine: Optional[tuple] = None,
+):
+    """Returns (image, final_latents); image is None when diffusers is unavailable. Raises _Canceled on stop."""
+    pipe = cache.get(args)
+    if pipe is None:
+        return None, None
+    if cache.denoiser is not None:
+        # 首次遇到某个尺寸桶时先单步预热（编译或读盘缓存），其余尺寸走 eager。
+        cache.denoiser.warmup(pipe, [(width, height)])
+        cache.denoiser.select(pipe, width, height)
+    return _generate(cache.torch, pipe, args, width, height, refine)
 
 
-def main() -> int:
-    args = build_parser().parse_args()
-    threading.Thread(target=_stdin_parent_watchdog, daemon=True).start()
+def _effective_seed(seed: int) -> int:
+    # seed 0 表示随机：先抽定具体种子并回报，这样结果可复现。
+    return seed if seed != 0 else secrets.randbelow(2**31 - 1) + 1
+
+
+@lru_cache(maxsize=None)
+def _library_versions() -> tuple[str, str]:
+    versions = []
+    for dist in ("torch", "diffusers"):
+        try:
+            versions.append(metadata.version(dist))
+        except metadata.PackageNotFoundError:
+            versions.append("")
+    return versions[0], versions[1]
+
+
+@lru_cache(maxsize=1)
+def _inference_dtype() -> str:
+    # 结果缓存键需要实际推理所用的 dtype；未命中时本就要导入 torch，这里提前导入一次。
+    try:
+        import torch  # type: ignore
+    except Exception:
+        return ""
+    return "fp16" if torch.cuda.is_available() else "fp32"
+
+
+def _result_cache(args: argparse.Namespace) -> Optional[ResultCache]:
+    if args.no_cache or args.dry_run or args.cache_max_mb <= 0:
+        return None
+    return ResultCache(result_cache_dir("flux"), int(args.cache_max_mb * 1024 * 1024))
+
+
+def _generation_key(args: argparse.Namespace) -> Optional[str]:
+    """Hash of everything that determines the output bytes; None when the model can't be addressed."""
+    try:
+        # 按清单里的文件名/大小/mtime 寻址，不在首个任务上同步读完整个模型做内容哈希。
+        model_hash = source_fingerprint(Path(args.model_dir))
+        lora_hash = ""
+        if args.lora_path and Path(args.lora_path).exists():
+            lora_hash = file_digest(Path(args.lora_path))
+    except OSError:
+        return None
+    if not model_hash:
+        return None
+    torch_version, diffusers_version = _library_versions()
+    dtype = _inference_dtype()
+    _, from_snapshot = pretrained_source(args.model_dir, dtype, args.quant)
+    return cache_key(
+        {
+            "model": model_hash,
+            "source": "snapshot" if from_snapshot else "original",
+            "dtype": dtype,
+            "quant": args.quant,
+            "compile": bool(args.compile),
+            "lora": lora_hash,
+            "prompt": args.prompt,
+            "negative_prompt": args.negative_prompt or "",
+            "size": args.size,
+            "steps": max(1, args.steps),
+            "guidance_scale": max(0.0, args.guidance_scale),
+            "seed": args.seed,
+            "output_format": args.output_format,
+            "quality": args.quality if args.output_format != "png" else None,
+            "compress_level": args.compress_level if args.output_format == "png" else None,
+            "torch": torch_version,
+            "diffusers": diffusers_version,
+        }
+    )
+
+
+def _lookup_result(cache: Optional[ResultCache], args: argparse.Namespace, output: Path):
+    """Returns (key, hit_info); hit_info is the done/result payload when the output was served from cache."""
+    if cache is None:
+        return None, None
+    key = _generation_key(args)
+    if key is None:
+        return None, None
+    meta = cache.materialize(key, output)
+    if meta is None:
+        return key, None
+    return key, {
+        "output_path": str(output),
+        "format": meta.get("format", args.output_format),
+        "bytes": int(meta.get("bytes", 0)),
+        "encode_ms": 0.0,
+        "seed": args.seed,
+        "cache": "hit",
+    }
+
+
+def _store_result(cache: Optional[ResultCache], key: Optional[str], output: Path, args: argparse.Namespace) -> str:
+    if cache is None or key is None:
+        return "off"
+    cache.store(key, output, {"format": args.output_format, "seed": args.seed, "prompt": args.prompt})
+    return "miss"
+
+
+def _default_steps(model_dir: str) -> int:
+    # schnell 是 4 步蒸馏模型，多跑步数只增加耗时。
+    return 4 if "schnell" in Path(model_dir).name.lower() else 20
+
+
+def _validate(args: argparse.Namespace) -> tuple[int, int]:
     if not args.prompt:
-        _emit({"event": "error", "message": "prompt_required"})
-        return 2
+        raise ValueError("prompt_required")
     if not args.output_path:
-        _emit({"event": "error", "message": "output_path_required"})
-        return 2
+        raise ValueError("output_path_required")
+    _check_output_suffix(Path(args.output_path), args.output_format)
+    if args.steps is None:
+        args.steps = _default_steps(args.model_dir)
+    return _parse_size(args.size)
+
+
+def _apply_latency_plan(
+    args: argparse.Namespace,
+    width: int,
+    height: int,
+    loaded_model_dir: Optional[str] = None,
+    job_id=None,
+) -> tuple[int, int]:
+    """Overrides model_dir/steps/size from the timing profile when a latency budget is set."""
+    if not args.latency_budget_ms or args.latency_budget_ms <= 0:
+        return width, height
+    tag = {} if job_id is None else {"id": job_id}
+    family = None
+    if args.lora_path:
+        # LoRA 只能套在同架构的模型上，规划只在请求模型的 family 内换档。
+        family = model_family(args.model_dir)
+        if family is None:
+            _emit({"event": "warn", **tag, "message": "latency_plan_lora_unknown_family"})
+            return width, height
+    chosen = plan(args.latency_budget_ms, width, height, loaded_model_dir=loaded_model_dir, family=family)
+    if chosen is None:
+        _emit({"event": "warn", **tag, "message": "latency_plan_no_known_model"})
+        return width, height
+    if Path(chosen["model_dir"]) != Path(args.model_dir):
+        # 调用方的 guidance 是按原模型给的，换模型后改用所选模型的推荐值。
+        args.guidance_scale = chosen["guidance_scale"]
+    args.model_dir = chosen["model_dir"]
+    args.steps = chosen["steps"]
+    args.size = f"{chosen['width']}x{chosen['height']}"
+    _emit({"event": "plan", **tag, **chosen})
+    return chosen["width"], chosen["height"]
+
+
+def _job_args(base: argparse.Namespace, job: dict) -> argparse.Namespace:
+    merged = argparse.Namespace(**vars(base))
+    for key, value in job.items():
+        attr = str(key).replace("-", "_")
+        if attr not in _JOB_FIELDS or value is None:
+            continue
+        setattr(merged, attr, _JOB_FIELDS[attr](value))
+    if merged.output_format not in OUTPUT_SUFFIXES:
+        raise ValueError(f"invalid_output_format:{merged.output_format}")
+    return merged
+
+
+_JOB_FIELDS = {
+    "prompt": str,
+    "negative_prompt": str,
+    "model_dir": str,
+    "lora_path": str,
+    "output_path": str,
+    "size": str,
+    "steps": int,
+    "guidance_scale": float,
+    "seed": int,
+    "tier": str,
+    "latency_budget_ms": float,
+    "output_format": str,
+    "quality": int,
+    "compress_level": int,
+}
+
+
+class _WorkerInput:
+    """Reads worker stdin on its own thread so a cancel line lands while a job is denoising.
+
+    ``{"cmd": "cancel", "id": ...}`` sets JOB_CANCEL when it names the running job (or
+    omits the id); a cancel for a job that has not started yet is remembered and the
+    job is skipped when it comes up. Every other line, including the ``stats`` and
+    ``unload`` commands, is queued for the main loop so they never race a running job.
+    EOF on the stream sets STOP_EVENT and JOB_CANCEL, so a running job stops at its next step.
+    """
+
+    def __init__(self, stream):
+        self._lines: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._current = None
+        self._running = False
+        self._pending_cancel: set = set()
+        threading.Thread(target=self._read, args=(stream,), name="miya-flux-input", daemon=True).start()
+
+    def _read(self, stream):
+        try:
+            for line in stream:
+                if not self._control(line):
+                    self._lines.put(line)
+        finally:
+            # stdin EOF 即父进程已退出或要求停止：中止正在去噪的任务，不再接后续任务。
+            STOP_EVENT.set()
+            JOB_CANCEL.set()
+            self._lines.put(None)
+
+    def _control(self, line: str) -> bool:
+        if '"cmd"' not in line:
+            return False
+        try:
+            req = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(req, dict) or req.get("cmd") != "cancel":
+            return False
+        job_id = req.get("id")
+        with self._lock:
+            if self._running and (job_id is None or job_id == self._current):
+                JOB_CANCEL.set()
+            elif job_id is not None:
+                self._pending_cancel.add(job_id)
+        return True
+
+    def next_line(self) -> Optional[str]:
+        """Blocks for the next job line; None on EOF or once STOP_EVENT is set."""
+        while not STOP_EVENT.is_set():
+            try:
+                return self._lines.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def begin(self, job_id) -> bool:
+        """Marks job_id as running; False when it was canceled before it started."""
+        with self._lock:
+            JOB_CANCEL.clear()
+            if job_id is not None and job_id in self._pending_cancel:
+                self._pending_cancel.discard(job_id)
+                return False
+            self._current = job_id
+            self._running = True
+            return True
+
+    def end(self):
+        with self._lock:
+            self._current = None
+            self._running = False
+            JOB_CANCEL.clear()
+
+
+def _worker_command(cache: _PipelineCache, req: dict):
+    """Handles the ``stats`` and ``unload`` commands between jobs, on the main loop."""
+    cmd = req.get("cmd")
+    req_id = req.get("id")
+    if cmd == "stats":
+        _emit({"event": "stats", "id": req_id, **cache.host.stats()})
+    elif cmd == "unload":
+        model_dir = req.get("model_dir")
+        if not model_dir:
+            _emit({"event": "request_error", "id": req_id, "message": "unload_requires_model_dir"})
+            return
+        keys = cache.unload(str(model_dir))
+        _emit({"event": "unload_done", "id": req_id, "model_dir": str(model_dir), "unloaded": len(keys)})
+    else:
+        _emit({"event": "request_error", "id": req_id, "message": f"unknown_cmd:{cmd}"})
+
+
+def run_worker(args: argparse.Namespace, stream=None) -> int:
+    inputs = _WorkerInput(stream if stream is not None else sys.stdin)
+    cache = _PipelineCache()
+    results = _result_cache(args)
+    encoder = _BackgroundEncoder(results)
+    latents = _LatentCache(args.latent_cache_size)
+    jobs = 0
+    if args.compile and not args.dry_run:
+        # 常驻 worker 在就绪前装载并预热全部尺寸桶，之后的任务不再承担编译耗时。
+        pipe = cache.get(args)
+        if pipe is not None and cache.denoiser is not None:
+            cache.denoiser.warmup(pipe)
+    _emit({"event": "ready", "model_dir": args.model_dir, "tier": args.tier, "output_format": args.output_format})
+    try:
+        while True:
+            line = inputs.next_line()
+            if line is None:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError:
+                _emit({"event": "request_error", "message": "invalid_json"})
+                continue
+            job_id = req.get("id") if isinstance(req, dict) else None
+            if isinstance(req, dict) and "cmd" in req:
+                _worker_command(cache, req)
+                continue
+            refine: Optional[tuple] = None
+            try:
+                job = _job_args(args, req)
+                if req.get("refine") is not None:
+                    # refine 沿用源任务的模型、LoRA 与尺寸（latents 与三者绑定），提示词未给时也沿用。
+                    source = latents.get(req["refine"])
+                    if source is None:
+                        raise ValueError(f"refine_source_not_found:{req['refine']}")
+                    strength = min(1.0, max(0.01, float(req.get("strength", 0.5))))
+                    if req.get("lora_path") is not None and str(req["lora_path"]) != (source.lora_path or ""):
+                        raise ValueError("refine_lora_mismatch")
+                    job.model_dir = source.model_dir
+                    job.lora_path = source.lora_path
+                    job.size = source.size
+                    if not req.get("prompt"):
+                        job.prompt = source.prompt
+                    refine = (source.latents, strength)
+                width, height = _validate(job)
+            except Exception as exc:
+                _emit({"event": "request_error", "id": job_id, "message": str(exc)})
+                continue
+            if refine is None:
+                width, height = _apply_latency_plan(job, width, height, cache.loaded_model_dir, job_id)
+
+            if not inputs.begin(job_id):
+                _emit({"event": "job_canceled", "id": job_id, "step": 0, "total": max(1, job.steps)})
+                continue
+            try:
+                # 只有调用方给定种子时结果才可能再次被请求；随机种子的输出不进结果缓存。
+                explicit_seed = job.seed != 0
+                job.seed = _effective_seed(job.seed)
+                output = Path(job.output_path)
+                start_event = {
+                    "event": "job_start",
+                    "id": job_id,
+                    "output_path": str(output),
+                    "size": job.size,
+                    "seed": job.seed,
+                }
+                if refine is not None:
+                    start_event.update({"refine": req["refine"], "strength": refine[1]})
+                _emit(start_event)
+                jobs += 1
+                if args.dry_run:
+                    _emit({"event": "result", "id": job_id, "status": "dry_run", **_placeholder_result(output, job)})
+                    continue
+                # refine 的输出取决于缓存中的 latents，不进入按输入寻址的结果缓存。
+                key, hit = _lookup_result(results if refine is None and explicit_seed else None, job, output)
+                if hit is not None:
+                    _emit({"event": "result", "id": job_id, "status": "ok", **hit})
+                    continue
+
+                canceled_step: Optional[int] = None
+                try:
+                    image, final_latents = _render(cache, job, width, height, refine)
+                except _Canceled as exc:
+                    canceled_step = exc.step
+                    image = final_latents = None
+                except Exception as exc:
+                    _emit({"event": "request_error", "id": job_id, "message": str(exc)})
+                    continue
+                if canceled_step is not None:
+                    if not STOP_EVENT.is_set():
+                        # 仅取消当前任务：管线与 latents 缓存保留，继续处理后续任务。
+                        # 中途张量与回溯此时都已释放，立即把显存缓存还给驱动。
+                        if cache.torch is not None:
+                            _release_cuda_cache(cache.torch)
+                        _emit({"event": "job_canceled", "id": job_id, "step": canceled_step, "total": max(1, job.steps)})
+                        continue
+                    latents.clear()
+                    cache.clear()
+                    encoder.drain()
+                    _emit({"event": "canceled", "id": job_id, "step": canceled_step, "total": max(1, job.steps)})
+                    return 130
+                if image is None:
+                    _emit({"event": "result", "id": job_id, "status": "ok", **_placeholder_result(output, job)})
+                else:
+                    latents.put(output, job_id, _LatentEntry(final_latents, job.model_dir, job.lora_path, job.size, job.prompt, job.seed))
+                    encoder.submit(job_id, image, output, job, key)
+                    image = final_latents = None
+            finally:
+                inputs.end()
+    finally:
+        encoder.drain()
+        latents.clear()
+        cache.clear()
+    _emit({"event": "done", "status": "ok", "jobs": jobs})
+    return 0
 
+
+def main() -> int:
+    args = build_parser().parse_args()
+    # 信号只中止当前任务并结束进程；worker 中单个任务的取消走 stdin 的 cancel 命令。
+    signal.signal(signal.SIGINT, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+    if args.compile and not args.dry_run:
+        # inductor 在 import torch 时读取缓存相关环境变量，必须赶在任何 torch 导入之前设置。
+        configure_cache()
+    if args.worker:
+        # worker 模式下 stdin 承载任务流，EOF 即父进程退出。
+        return run_worker(args)
+    threading.Thread(target=_stdin_parent_watchdog, daemon=True).start()
     try:
-        width, height = _parse_size(args.size)
+        width, height = _validate(args)
     except Exception as exc:
         _emit({"event": "error", "message": str(exc)})
         return 2
 
+    width, height = _apply_latency_plan(args, width, height)
+    explicit_seed = args.seed != 0
+    args.seed = _effective_seed(args.seed)
     output = Path(args.output_path)
+
     _emit(
         {
             "event": "start",
@@ -143,23 +963,51 @@ def main() -> int:
             "tier": args.tier,
             "output_path": str(output),
             "size": args.size,
+            "steps": args.steps,
+            "seed": args.seed,
         }
     )
 
     if args.dry_run:
-        _save_blank_png(output)
-        _emit({"event": "done", "status": "dry_run", "output_path": str(output)})
+        _emit({"event": "done", "status": "dry_run", **_placeholder_result(output, args)})
         return 0
 
+    cache = _PipelineCache()
+    results = _result_cache(args) if explicit_seed else None
+    canceled_step: Optional[int] = None
     try:
-        ok = _run_with_diffusers(args, width, height, output)
-        if not ok:
-            _save_blank_png(output)
-        _emit({"event": "done", "status": "ok", "output_path": str(output)})
+        key, hit = _lookup_result(results, args, output)
+        if hit is not None:
+            _emit({"event": "done", "status": "ok", **hit})
+            return 0
+        image, _ = _render(cache, args, width, height)
+        if image is None:
+            info = _placeholder_result(output, args)
+            cache_status = "off"
+        else:
+            info = _encode_image(image, output, args.output_format, args.quality, args.compress_level)
+            cache_status = _store_result(results, key, output, args)
+        # 冷启动装载耗时随 done 上报（装载失败时 start 之后直接是 error）。
+        _emit(
+            {
+                "event": "done",
+                "status": "ok",
+                "seed": args.seed,
+                "cache": cache_status,
+                "load_ms": cache.load_ms,
+                "snapshot": cache.snapshot,
+                **info,
+            }
+        )
         return 0
+    except _Canceled as exc:
+        canceled_step = exc.step
     except Exception as exc:
         _emit({"event": "error", "message": str(exc)})
         return 1
+    cache.clear()
+    _emit({"event": "canceled", "step": canceled_step, "total": max(1, args.steps)})
+    return 130
 
 
 if __name__ == "__main__":
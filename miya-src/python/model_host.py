@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+from path_layout import WEIGHT_SUFFIXES, ensure_manifest
+
+
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value
+
+
+def _to_mb(v: float) -> float:
+    return round(v / 1024 / 1024, 2)
+
+
+_DTYPE_BYTES = {"fp16": 2, "bf16": 2, "fp32": 4}
+_SAFETENSORS_ITEM_BYTES = {"F64": 8, "F32": 4, "F16": 2, "BF16": 2, "I64": 8, "I32": 4, "I16": 2, "I8": 1, "U8": 1, "BOOL": 1}
+
+
+def _safetensors_bytes(path: Path, dtype: str) -> Optional[int]:
+    """Bytes of the tensors in ``path`` once loaded as ``dtype``, from the header alone."""
+    try:
+        with path.open("rb") as f:
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len))
+    except (OSError, ValueError):
+        return None
+    target = _DTYPE_BYTES.get(dtype)
+    total = 0
+    for name, info in header.items():
+        if name == "__metadata__" or not isinstance(info, dict):
+            continue
+        numel = 1
+        for dim in info.get("shape", ()):
+            numel *= int(dim)
+        stored = _SAFETENSORS_ITEM_BYTES.get(str(info.get("dtype")), 4)
+        # 只有浮点权重会被转换到加载 dtype；整数张量保持原样。
+        is_float = str(info.get("dtype", "")).startswith(("F", "BF"))
+        total += numel * (target if target and is_float else stored)
+    return total
+
+
+def estimate_footprint_mb(model_dir: Path, dtype: str = "fp16") -> float:
+    """Expected resident size when loading ``model_dir`` as ``dtype``; a guess before the first load.
+
+    Counts one weight format per directory and skips a root-level single-file
+    checkpoint when the component subfolders carry their own weights.
+    Safetensors are sized from their headers at the load dtype; other formats
+    count at their size on disk.
+    """
+    manifest = ensure_manifest(model_dir)
+    if manifest is None:
+        return 0.0
+    by_dir: dict[str, dict[str, list[tuple[str, int]]]] = {}
+    for rel, (size, _) in manifest["files"].items():
+        suffix = os.path.splitext(rel)[1].lower()
+        if suffix not in WEIGHT_SUFFIXES:
+            continue
+        by_dir.setdefault(os.path.dirname(rel), {}).setdefault(suffix, []).append((rel, size))
+    if len(by_dir) > 1:
+        by_dir.pop("", None)
+    total = 0
+    for formats in by_dir.values():
+        suffix = next(s for s in WEIGHT_SUFFIXES if s in formats)
+        for rel, size in formats[suffix]:
+            loaded = _safetensors_bytes(model_dir / rel, dtype) if suffix == ".safetensors" else None
+            total += loaded if loaded is not None else size
+    return _to_mb(total)
+
+
+def module_bytes(model: Any) -> int:
+    """Parameter and buffer bytes of a torch module, or of every module in a diffusers pipeline."""
+    if hasattr(model, "parameters"):
+        modules = [model]
+    elif hasattr(model, "components"):
+        modules = [m for m in model.components.values() if hasattr(m, "parameters")]
+    else:
+        return 0
+    total = 0
+    seen: set[int] = set()
+    for module in modules:
+        for tensor in [*module.parameters(), *module.buffers()]:
+            if id(tensor) in seen:
+                continue
+            seen.add(id(tensor))
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch  # type: ignore
+
+        return bool(torch.cuda.is_available())
+    except Exception:
+        return False
+
+
+def _release_cuda_cache():
+    gc.collect()
+    try:
+        import torch  # type: ignore
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def _move(model: Any, device: str) -> Any:
+    if hasattr(model, "to"):
+        moved = model.to(device)
+        return model if moved is None else moved
+    return model
+
+
+@dataclass
+class ResidentModel:
+    key: str
+    kind: str
+    model_dir: str
+    model: Any
+    device: str
+    footprint_mb: float
+    measured: bool
+    load_ms: float
+    last_used: float
+    uses: int = 0
+
+
+class ModelHost:
+    """Keeps several pipelines resident under VRAM/RAM budgets with LRU eviction.
+
+    ``models`` is ordered least- to most-recently used. When a load would
+    exceed the budget of its device, the oldest models on that device are
+    moved to CPU (if RAM allows) or dropped; dropped models are reloaded
+    from disk on the next request. A budget of 0 means unlimited.
+    """
+
+    def __init__(
+        self,
+        vram_budget_mb: float,
+        ram_budget_mb: float,
+        emit: Callable[[dict], None],
+        loaders: dict[str, Callable[[str, str, dict], Any]],
+        cuda_available: Optional[bool] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.vram_budget_mb = max(0.0, vram_budget_mb)
+        self.ram_budget_mb = max(0.0, ram_budget_mb)
+        self._emit = emit
+        self.loaders = dict(loaders)
+        self.cuda_available = _cuda_available() if cuda_available is None else cuda_available
+        self._clock = clock
+        self.models: OrderedDict[str, ResidentModel] = OrderedDict()
+        # 实测占用在模型被淘汰后仍保留，下次装载前据此腾出空间。
+        self.footprints: dict[str, float] = {}
+        self.counters = {"loads": 0, "hits": 0, "restores": 0, "offloads": 0, "drops": 0}
+
+    def _budget(self, device: str) -> float:
+        return self.vram_budget_mb if device == "cuda" else self.ram_budget_mb
+
+    def used_mb(self, device: str) -> float:
+        return round(sum(m.footprint_mb for m in self.models.values() if m.device == device), 2)
+
+    def _fits(self, device: str, need_mb: float) -> bool:
+        budget = self._budget(device)
+        return budget <= 0 or self.used_mb(device) + need_mb <= budget
+
+    def _make_room(self, device: str, need_mb: float, keep: frozenset[str], strict: bool = True):
+        """Offload/drop LRU models on ``device`` until ``need_mb`` fits.
+
+        ``strict=False`` (used with pre-load estimates) frees what it can and
+        returns instead of raising; the measured footprint decides after the load.
+        """
+        budget = self._budget(device)
+        if budget <= 0:
+            return
+        if need_mb > budget and strict:
+            raise RuntimeError(f"model_exceeds_{'vram' if device == 'cuda' else 'ram'}_budget:{need_mb}>{budget}")
+        for key in list(self.models):
+            if self._fits(device, need_mb):
+                return
+            entry = self.models.get(key)
+            if entry is None or key in keep or entry.device != device:
+                continue
+            if device == "cuda" and self._try_offload(entry, keep):
+                continue
+            self._drop(entry, reason="budget")
+        if strict and not self._fits(device, need_mb):
+            raise RuntimeError(f"{'vram' if device == 'cuda' else 'ram'}_budget_exhausted")
+
+    def _try_offload(self, entry: ResidentModel, keep: frozenset[str]) -> bool:
+        try:
+            self._make_room("cpu", entry.footprint_mb, keep | {entry.key})
+        except RuntimeError:
+            return False
+        entry.model = _move(entry.model, "cpu")
+        entry.device = "cpu"
+        self.counters["offloads"] += 1
+        _release_cuda_cache()
+        self._emit({"event": "evicted", "key": entry.key, "to": "cpu", "freed_vram_mb": entry.footprint_mb})
+        return True
+
+    def _drop(self, entry: ResidentModel, reason: str):
+        self.models.pop(entry.key, None)
+        device = entry.device
+        entry.model = None
+        self.counters["drops"] += 1
+        # 先通知调用方释放它对该模型的其它引用（如编译封装），之后回收才真正腾出显存。
+        self._emit(
+            {
+                "event": "evicted" if reason == "budget" else "unloaded",
+                "key": entry.key,
+                "to": "disk",
+                "from": device,
+                "freed_mb": entry.footprint_mb,
+            }
+        )
+        if device == "cuda":
+            _release_cuda_cache()
+        else:
+            gc.collect()
+
+    def load(
+        self,
+        key: str,
+        kind: str,
+        model_dir: str,
+        device: str = "cuda",
+        options: Optional[dict] = None,
+    ) -> tuple[ResidentModel, str]:
+        """Make a model resident on device; returns (entry, "hit" | "restored" | "loaded")."""
+        options = options or {}
+        if device == "cuda" and not self.cuda_available:
+            device = "cpu"
+        entry = self.models.get(key)
+        if entry is not None:
+            self.models.move_to_end(key)
+            entry.last_used = self._clock()
+            entry.uses += 1
+            if entry.device == device:
+                self.counters["hits"] += 1
+                return entry, "hit"
+            self._make_room(device, entry.footprint_mb, frozenset({key}))
+            entry.model = _move(entry.model, device)
+            entry.device = device
+            self.counters["restores"] += 1
+            return entry, "restored"
+
+        loader = self.loaders.get(kind)
+        if loader is None:
+            raise ValueError(f"unknown_model_kind:{kind}")
+        dtype = str(options.get("dtype") or ("fp16" if device == "cuda" else "fp32"))
+        estimate = float(
+            options.get("footprint_mb")
+            or self.footprints.get(key)
+            or estimate_footprint_mb(Path(model_dir), dtype)
+        )
+        # 估算只用来提前腾空间，不据此拒绝装载；是否放得下以装载后的实测为准。
+        self._make_room(device, estimate, frozenset({key}), strict=False)
+        t0 = time.perf_counter()
+        model = loader(model_dir, device, options)
+        load_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        measured_bytes = module_bytes(model)
+        footprint = _to_mb(measured_bytes) if measured_bytes else estimate
+        entry = ResidentModel(
+            key=key,
+            kind=kind,
+            model_dir=model_dir,
+            model=model,
+            device=device,
+            footprint_mb=footprint,
+            measured=bool(measured_bytes),
+            load_ms=load_ms,
+            last_used=self._clock(),
+            uses=1,
+        )
+        self.models[key] = entry
+        self.footprints[key] = footprint
+        self.counters["loads"] += 1
+        # 按实测值再腾一次空间；仍放不下则撤销登记并释放刚装载的模型。
+        try:
+            self._make_room(device, 0.0, frozenset({key}))
+        except RuntimeError:
+            self._drop(entry, reason="budget")
+            raise
+        return entry, "loaded"
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.models.get(key)
+        if entry is None:
+            return None
+        self.models.move_to_end(key)
+        entry.last_used = self._clock()
+        entry.uses += 1
+        return entry.model
+
+    def unload(self, key: str) -> bool:
+        entry = self.models.get(key)
+        if entry is None:
+            return False
+        self._drop(entry, reason="request")
+        return True
+
+    def unload_all(self):
+        for key in list(self.models):
+            self.unload(key)
+
+    def stats(self) -> dict:
+        now = self._clock()
+        out = {
+            "models": [
+                {
+                    "key": m.key,
+                    "kind": m.kind,
+                    "device": m.device,
+                    "footprint_mb": m.footprint_mb,
+                    "measured": m.measured,
+                    "uses": m.uses,
+                    "idle_s": round(now - m.last_used, 1),
+                    "load_ms": m.load_ms,
+                }
+                for m in self.models.values()
+            ],
+            "vram_used_mb": self.used_mb("cuda"),
+            "ram_used_mb": self.used_mb("cpu"),
+            "vram_budget_mb": self.vram_budget_mb,
+            "ram_budget_mb": self.ram_budget_mb,
+            "counters": dict(self.counters),
+        }
+        if self.cuda_available:
+            try:
+                import torch  # type: ignore
+
+                out["cuda_allocated_mb"] = _to_mb(torch.cuda.memory_allocated())
+                out["cuda_reserved_mb"] = _to_mb(torch.cuda.memory_reserved())
+            except Exception:
+                pass
+        return out
+
+
+def _default_vram_budget_mb() -> float:
+    try:
+        import torch  # type: ignore
+
+        if torch.cuda.is_available():
+            _, total_b = torch.cuda.mem_get_info()
+            # 预留 1GB 给 CUDA 上下文与推理中间激活。
+            return max(0.0, _to_mb(total_b) - 1024.0)
+    except Exception:
+        pass
+    return 0.0
+
+
+def _default_ram_budget_mb() -> float:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0.0
+    return round(_to_mb(total) * 0.5, 2)
+
+
+def default_budgets() -> tuple[float, float]:
+    """(vram_mb, ram_mb) from MIYA_HOST_*_BUDGET_MB, or derived from the device when unset/negative."""
+    vram = float(_env("MIYA_HOST_VRAM_BUDGET_MB", "-1"))
+    ram = float(_env("MIYA_HOST_RAM_BUDGET_MB", "-1"))
+    return (
+        vram if vram >= 0 else _default_vram_budget_mb(),
+        ram if ram >= 0 else _default_ram_budget_mb(),
+    )
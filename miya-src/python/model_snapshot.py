@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+from event_emitter import create_emitter
+from path_layout import ensure_manifest, flux_schnell_dir
+
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_INFO = "miya-snapshot.json"
+DTYPES = ("fp16", "bf16", "fp32")
+QUANTS = ("none", "int8")
+
+
+def snapshot_dir(model_dir: Path, dtype: str, quant: str = "none") -> Path:
+    # 放在模型目录旁边，不改动原模型目录。
+    suffix = dtype if quant == "none" else f"{dtype}-{quant}"
+    return model_dir.parent / f"{model_dir.name}.miya-{suffix}"
+
+
+def source_fingerprint(model_dir: Path) -> Optional[str]:
+    # 快照是否过期取决于每个文件（含配置与分词器），浅检查只看根目录与权重文件，这里必须逐个 stat。
+    manifest = ensure_manifest(model_dir, deep=True)
+    if manifest is None:
+        return None
+    return hashlib.sha256(json.dumps(manifest["files"], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_snapshot_info(path: Path) -> Optional[dict[str, Any]]:
+    try:
+        raw = json.loads((path / SNAPSHOT_INFO).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(raw, dict) or raw.get("version") != SNAPSHOT_VERSION:
+        return None
+    return raw
+
+
+def find_snapshot(model_dir: Path, dtype: str, quant: str = "none") -> Optional[Path]:
+    """The prepared snapshot for ``model_dir`` when it exists and the source is unchanged."""
+    path = snapshot_dir(model_dir, dtype, quant)
+    info = load_snapshot_info(path)
+    if info is None:
+        return None
+    if info.get("source_fingerprint") != source_fingerprint(model_dir):
+        return None
+    return path
+
+
+def pretrained_source(model_dir: str, dtype: str, quant: str = "none") -> tuple[str, bool]:
+    """Directory to hand to from_pretrained: the fresh snapshot of exactly this dtype/quant, else the original."""
+    if os.getenv("MIYA_MODEL_SNAPSHOTS", "1") == "0":
+        return model_dir, False
+    found = find_snapshot(Path(model_dir), dtype, quant)
+    if found is not None:
+        return str(found), True
+    return model_dir, False
+
+
+def torch_dtype(torch, dtype: str):
+    return {"fp16": torch.float16, "bf16": torch.bfloat16, "fp32": torch.float32}[dtype]
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def prepare(
+    model_dir: Path,
+    dtype: str,
+    quant: str,
+    emit: Callable[[dict], None],
+    force: bool = False,
+) -> dict[str, Any]:
+    """Load once, convert (and optionally weight-quantize), then save_pretrained as safetensors."""
+    target = snapshot_dir(model_dir, dtype, quant)
+    fingerprint = source_fingerprint(model_dir)
+    if fingerprint is None:
+        raise FileNotFoundError(f"model_dir_missing:{model_dir}")
+    if not force and find_snapshot(model_dir, dtype, quant) is not None:
+        return {"status": "fresh", "snapshot": str(target), "bytes": _dir_bytes(target)}
+
+    import torch  # type: ignore
+    from diffusers import DiffusionPipeline  # type: ignore
+
+    kwargs: dict[str, Any] = {"torch_dtype": torch_dtype(torch, dtype)}
+    if quant == "int8":
+        try:
+            from diffusers.quantizers import PipelineQuantizationConfig  # type: ignore
+        except Exception as exc:
+            raise RuntimeError(f"quantization_unavailable:{exc}") from exc
+        # 只量化权重、只动 transformer：文本编码器与 VAE 对精度更敏感，体积占比也小。
+        kwargs["quantization_config"] = PipelineQuantizationConfig(
+            quant_backend="quanto",
+            quant_kwargs={"weights_dtype": "int8"},
+            components_to_quantize=["transformer"],
+        )
+
+    t0 = time.perf_counter()
+    emit({"event": "progress", "stage": "load", "model_dir": str(model_dir)})
+    pipe = DiffusionPipeline.from_pretrained(str(model_dir), **kwargs)
+    convert_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    emit({"event": "progress", "stage": "save", "snapshot": str(target)})
+    pipe.save_pretrained(str(tmp), safe_serialization=True)
+    (tmp / SNAPSHOT_INFO).write_text(
+        json.dumps(
+            {
+                "version": SNAPSHOT_VERSION,
+                "source": str(model_dir),
+                "source_fingerprint": fingerprint,
+                "dtype": dtype,
+                "quant": quant,
+                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return {
+        "status": "ok",
+        "snapshot": str(target),
+        "bytes": _dir_bytes(target),
+        "convert_ms": convert_ms,
+        "total_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Miya model snapshot preparation")
+    sub = p.add_subparsers(dest="command", required=True)
+    prep = sub.add_parser("prepare", help="write a dtype-converted safetensors snapshot next to the model")
+    prep.add_argument("--model-dir", default=os.getenv("MIYA_FLUX_MODEL_DIR", str(flux_schnell_dir())))
+    prep.add_argument("--dtype", choices=DTYPES, default=os.getenv("MIYA_SNAPSHOT_DTYPE", "fp16"))
+    prep.add_argument("--quant", choices=QUANTS, default=os.getenv("MIYA_SNAPSHOT_QUANT", "none"))
+    prep.add_argument("--force", action="store_true", help="rebuild even if a fresh snapshot exists")
+    status = sub.add_parser("status", help="report which snapshots exist and are fresh")
+    status.add_argument("--model-dir", default=os.getenv("MIYA_FLUX_MODEL_DIR", str(flux_schnell_dir())))
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    stop_event = threading.Event()
+    emitter = create_emitter(stop_event)
+
+    def _emit(payload: dict):
+        try:
+            emitter.emit(payload)
+        except BrokenPipeError:
+            stop_event.set()
+            raise SystemExit(86)
+
+    model_dir = Path(args.model_dir)
+    if args.command == "status":
+        snapshots = {}
+        for dtype in DTYPES:
+            for quant in QUANTS:
+                path = snapshot_dir(model_dir, dtype, quant)
+                if path.is_dir():
+                    snapshots[path.name] = find_snapshot(model_dir, dtype, quant) is not None
+        _emit({"event": "done", "status": "ok", "model_dir": str(model_dir), "snapshots": snapshots})
+        return 0
+
+    _emit({"event": "start", "model_dir": str(model_dir), "dtype": args.dtype, "quant": args.quant})
+    try:
+        result = prepare(model_dir, args.dtype, args.quant, _emit, force=args.force)
+    except Exception as exc:
+        _emit({"event": "error", "message": str(exc)})
+        return 1
+    _emit({"event": "done", **result})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 from pathlib import Path
+from typing import Any, Optional
+
+MANIFEST_VERSION = 1
+# 权重文件按此优先级排列；同一目录下有多种格式时只计其中一种。
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth", ".ckpt", ".onnx")
 
 
 def _normalize_root(path_text: str) -> Path:
@@ -39,3 +46,131 @@ def flux_klein_dir() -> Path:
 def sovits_dir() -> Path:
     return default_model_root() / "sheng yin" / "GPT-SoVITS-v2pro-20250604"
 
+
+def capability_profile_path() -> Path:
+    return default_data_root() / "daemon" / "capability-profile.json"
+
+
+def flux_timing_profile_path() -> Path:
+    return default_data_root() / "daemon" / "flux-timing.json"
+
+
+def compile_cache_dir() -> Path:
+    override = os.getenv("MIYA_COMPILE_CACHE_DIR", "").strip()
+    if override:
+        return Path(override)
+    return default_data_root() / "cache" / "compile"
+
+
+def result_cache_dir(name: str) -> Path:
+    override = os.getenv("MIYA_RESULT_CACHE_DIR", "").strip()
+    root = Path(override) if override else default_data_root() / "cache"
+    return root / name
+
+
+def tts_frontend_cache_path() -> Path:
+    return result_cache_dir("tts") / "frontend-cache.json"
+
+
+def zygote_socket_path() -> Path:
+    override = os.getenv("MIYA_ZYGOTE_SOCKET", "").strip()
+    if override:
+        return Path(override)
+    return default_data_root() / "daemon" / "python-zygote.sock"
+
+
+def _model_tag(model_dir: Path) -> str:
+    return hashlib.sha256(str(model_dir.resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_path(model_dir: Path) -> Path:
+    # 模型根目录可能只读，清单放在可写的数据目录下按模型路径分文件；也不会改动模型目录的 mtime。
+    return result_cache_dir("model-manifest") / f"{_model_tag(model_dir)}.json"
+
+
+def build_manifest(model_dir: Path) -> dict[str, Any]:
+    files: dict[str, list[int]] = {}
+    dirs: dict[str, int] = {}
+    root = str(model_dir)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, root).replace("\\", "/")
+        dirs[rel_dir] = os.stat(dirpath).st_mtime_ns
+        for name in sorted(filenames):
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            rel = name if rel_dir == "." else f"{rel_dir}/{name}"
+            files[rel] = [st.st_size, st.st_mtime_ns]
+    return {
+        "version": MANIFEST_VERSION,
+        "model_dir": str(model_dir),
+        "files": files,
+        "dirs": dirs,
+        "total_bytes": sum(size for size, _ in files.values()),
+    }
+
+
+def load_manifest(model_dir: Path) -> Optional[dict[str, Any]]:
+    path = manifest_path(model_dir)
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(raw, dict) or raw.get("version") != MANIFEST_VERSION:
+        return None
+    return raw
+
+
+def _write_manifest(model_dir: Path, manifest: dict[str, Any]) -> bool:
+    path = manifest_path(model_dir)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        return False
+
+
+def manifest_is_fresh(model_dir: Path, manifest: dict[str, Any], deep: bool = False) -> bool:
+    """Cheap validity check: the model root's mtime plus a stat of each weight file.
+
+    The root catches files or component folders added, removed or renamed at
+    the top level; the weight stats catch a checkpoint replaced in place under
+    the same name. ``deep`` stats every recorded directory and file as well,
+    for callers whose result depends on the exact bytes (the snapshot fingerprint).
+    """
+    dirs = manifest.get("dirs")
+    if not isinstance(dirs, dict) or "." not in dirs:
+        return False
+    try:
+        if os.stat(model_dir).st_mtime_ns != dirs["."]:
+            return False
+        if deep:
+            for rel_dir, mtime_ns in dirs.items():
+                if os.stat(model_dir / rel_dir).st_mtime_ns != mtime_ns:
+                    return False
+        for rel, (size, mtime_ns) in manifest.get("files", {}).items():
+            if not deep and os.path.splitext(rel)[1].lower() not in WEIGHT_SUFFIXES:
+                continue
+            st = os.stat(model_dir / rel)
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def ensure_manifest(model_dir: Path, deep: bool = False) -> Optional[dict[str, Any]]:
+    if not model_dir.is_dir():
+        return None
+    manifest = load_manifest(model_dir)
+    if manifest and manifest_is_fresh(model_dir, manifest, deep=deep):
+        return manifest
+    fresh = build_manifest(model_dir)
+    _write_manifest(model_dir, fresh)
+    return fresh
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+CACHE_VERSION = 1
+_META_SUFFIX = ".meta.json"
+_DIGEST_MEMO: dict[tuple[str, int, int], str] = {}
+_DIGEST_LOCK = threading.Lock()
+
+
+def cache_key(fields: dict[str, Any]) -> str:
+    payload = json.dumps({"v": CACHE_VERSION, **fields}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, memoised per (path, size, mtime) for the life of the process."""
+    st = os.stat(path)
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    with _DIGEST_LOCK:
+        cached = _DIGEST_MEMO.get(memo_key)
+    if cached:
+        return cached
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _DIGEST_LOCK:
+        _DIGEST_MEMO[memo_key] = digest
+    return digest
+
+
+def _copy_into(src: Path, dest: Path):
+    # 缓存条目与调用方的输出各自持有独立 inode：任何一方原地改写都不会波及另一方。
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class ResultCache:
+    """Content-addressed output files with LRU eviction by total size.
+
+    Each entry is ``<key><ext>`` plus ``<key>.meta.json``; the meta file's
+    mtime is the last-use time. Outputs are copied in and out, never linked.
+    Eviction works from an in-memory index built by one scan per process;
+    entries written by other processes are picked up on the next scan.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        # meta 路径 -> (条目路径, 字节数)，按最近使用排序（末尾最新）。
+        self._index: Optional[OrderedDict[Path, tuple[Path, int]]] = None
+        self._total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{_META_SUFFIX}"
+
+    def _scan(self) -> OrderedDict[Path, tuple[Path, int]]:
+        entries: list[tuple[int, Path, Path, int]] = []
+        for meta_path in self.root.glob(f"*/*{_META_SUFFIX}"):
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                entry = meta_path.parent / str(meta["file"])
+                size = entry.stat().st_size
+                used_ns = meta_path.stat().st_mtime_ns
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            entries.append((used_ns, meta_path, entry, size))
+        index: OrderedDict[Path, tuple[Path, int]] = OrderedDict()
+        for _, meta_path, entry, size in sorted(entries, key=lambda e: e[0]):
+            index[meta_path] = (entry, size)
+        self._total = sum(size for _, size in index.values())
+        return index
+
+    def _touch(self, meta_path: Path, entry: Path, size: int):
+        with self._lock:
+            if self._index is None:
+                return
+            previous = self._index.pop(meta_path, None)
+            if previous is not None:
+                self._total -= previous[1]
+            self._index[meta_path] = (entry, size)
+            self._total += size
+
+    def lookup(self, key: str) -> Optional[tuple[Path, dict[str, Any]]]:
+        meta_path = self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            entry = meta_path.parent / str(meta["file"])
+            if not entry.is_file():
+                return None
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self._touch(meta_path, entry, int(meta.get("bytes") or 0))
+        return entry, meta
+
+    def materialize(self, key: str, dest: Path) -> Optional[dict[str, Any]]:
+        """Copy a hit to ``dest``; returns its meta or None on miss."""
+        if not self.enabled:
+            return None
+        found = self.lookup(key)
+        if found is None:
+            return None
+        entry, meta = found
+        try:
+            _copy_into(entry, dest)
+        except OSError:
+            # 与淘汰并发时条目可能刚被删除，按未命中处理。
+            return None
+        return meta
+
+    def store(self, key: str, src: Path, meta: dict[str, Any]) -> bool:
+        if not self.enabled:
+            return False
+        entry = self.root / key[:2] / f"{key}{src.suffix}"
+        meta_path = self._meta_path(key)
+        try:
+            _copy_into(src, entry)
+            size = entry.stat().st_size
+            record = {**meta, "file": entry.name, "bytes": size}
+            tmp = meta_path.with_name(meta_path.name + ".tmp")
+            tmp.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, meta_path)
+        except OSError:
+            return False
+        self._touch(meta_path, entry, size)
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        with self._lock:
+            if self._index is None:
+                self._index = self._scan()
+            removed = 0
+            while self._total > self.max_bytes and self._index:
+                meta_path, (entry, size) = self._index.popitem(last=False)
+                for path in (meta_path, entry):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                self._total -= size
+                removed += 1
+            return removed
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from event_emitter import EventEmitter
+
+
+class _BlockingStream:
+    """File-backed stream whose write() waits on a gate, to hold the writer thread."""
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+
+    def write(self, data):
+        self.entered.set()
+        self.gate.wait(5)
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+class TestEventEmitter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "events.jsonl")
+        self.clock = 0.0
+
+    def _emitter(self, stream=None, **kwargs):
+        if stream is None:
+            stream = open(self.path, "wb")
+            self.addCleanup(stream.close)
+        kwargs.setdefault("coalesce_interval_s", 0.5)
+        return EventEmitter(stream=stream, clock=lambda: self.clock, **kwargs)
+
+    def _lines(self):
+        with open(self.path, "rb") as f:
+            return [json.loads(line) for line in f.read().splitlines()]
+
+    def test_writer_thread_keeps_order_and_batches(self):
+        emitter = self._emitter()
+        for i in range(100):
+            emitter.emit({"event": "log", "i": i})
+        emitter.emit({"event": "done"})
+        emitter.close()
+        lines = self._lines()
+        self.assertEqual([line.get("i") for line in lines[:-1]], list(range(100)))
+        self.assertEqual(lines[-1], {"event": "done"})
+        self.assertEqual(emitter.lines_written, 101)
+        self.assertLess(emitter.writes, 101)
+
+    def test_progress_burst_is_coalesced_to_latest(self):
+        emitter = self._emitter()
+        # 时钟冻结在同一时刻：首条立即发出，其余合并为一条，由 done 之前的冲刷带出最新值。
+        for step in range(200):
+            emitter.emit({"event": "progress", "step": step})
+            emitter.emit({"event": "gpu", "step": step})
+        emitter.emit({"event": "done"})
+        emitter.close()
+        lines = self._lines()
+        progress = [line["step"] for line in lines if line["event"] == "progress"]
+        gpu = [line["step"] for line in lines if line["event"] == "gpu"]
+        self.assertEqual(progress, [0, 199])
+        self.assertEqual(gpu, [0, 199])
+        self.assertEqual(lines[-1], {"event": "done"})
+
+    def test_coalesced_rate_follows_interval(self):
+        emitter = self._emitter()
+        # 每 0.1s 一条进度、合并间隔 0.5s：100 条进度至多约 10s / 0.5s 条上线。
+        for step in range(100):
+            self.clock = step * 0.1
+            emitter.emit({"event": "progress", "step": step})
+        emitter.emit({"event": "done"})
+        emitter.close()
+        progress = [line["step"] for line in self._lines() if line["event"] == "progress"]
+        self.assertLessEqual(len(progress), 21)
+        self.assertEqual(progress[0], 0)
+        self.assertEqual(progress[-1], 99)
+
+    def test_terminal_events_are_never_dropped(self):
+        for terminal in ("done", "error", "canceled"):
+            with self.subTest(terminal=terminal):
+                emitter = self._emitter(max_queue=1)
+                for step in range(50):
+                    emitter.emit({"event": "progress", "step": step})
+                    emitter.emit({"event": "log", "step": step})
+                emitter.emit({"event": terminal, "id": "a"})
+                # 终止事件返回时已经写出，不依赖 close。
+                lines = self._lines()
+                self.assertEqual(lines[-1], {"event": terminal, "id": "a"})
+                self.assertEqual(lines[-2], {"event": "progress", "step": 49})
+                self.assertEqual(sum(1 for line in lines if line["event"] == "log"), 50)
+                emitter.close()
+
+    def test_full_queue_blocks_producer_until_writer_drains(self):
+        stream = _BlockingStream(self.path)
+        self.addCleanup(stream.close)
+        emitter = self._emitter(stream=stream, max_queue=2)
+        emitter.emit({"event": "log", "i": 0})
+        self.assertTrue(stream.entered.wait(5))
+        emitter.emit({"event": "log", "i": 1})
+        producer = threading.Thread(target=emitter.emit, args=({"event": "log", "i": 2},))
+        producer.start()
+        producer.join(0.2)
+        self.assertTrue(producer.is_alive())
+        stream.gate.set()
+        producer.join(5)
+        self.assertFalse(producer.is_alive())
+        emitter.close()
+        self.assertEqual([line["i"] for line in self._lines()], [0, 1, 2])
+
+    def test_reentrant_emit_writes_to_fd(self):
+        stream = _BlockingStream(self.path)
+        self.addCleanup(stream.close)
+        emitter = self._emitter(stream=stream)
+        # 写线程尚未启动时直接 os.write 到 fd，不经过缓冲流（其锁可能正被打断的写入持有）。
+        emitter.emit_reentrant({"event": "signal", "signal": 15})
+        self.assertFalse(stream.entered.is_set())
+        self.assertEqual(self._lines(), [{"event": "signal", "signal": 15}])
+
+    def test_broken_pipe_stops_and_raises(self):
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(write_fd, "wb")
+        self.addCleanup(stream.close)
+        os.close(read_fd)
+        stopped = threading.Event()
+        emitter = self._emitter(stream=stream, on_broken_pipe=stopped.set)
+        emitter.emit_reentrant({"event": "signal", "signal": 2})
+        self.assertTrue(emitter.broken)
+        self.assertTrue(stopped.is_set())
+        with self.assertRaises(BrokenPipeError):
+            emitter.emit({"event": "done"})
+
+
+if __name__ == "__main__":
+    unittest.main()
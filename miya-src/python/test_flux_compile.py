@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+import flux_compile
+
+HERE = Path(__file__).resolve().parent
+
+# 子进程中先配置缓存再导入 torch，与 infer_flux.main 的顺序一致。
+TOY_COMPILE = textwrap.dedent(
+    """
+    import json
+    from flux_compile import CompiledDenoiser, configure_cache
+
+    configure_cache()
+    import torch
+
+    class ToyPipe:
+        def __init__(self):
+            self.transformer = torch.nn.Sequential(torch.nn.Linear(8, 16), torch.nn.GELU(), torch.nn.Linear(16, 8))
+
+        def __call__(self, prompt, num_inference_steps, width, height, output_type):
+            return self.transformer(torch.ones(1, width // 64, 8))
+
+    events = []
+    pipe = ToyPipe()
+    denoiser = CompiledDenoiser(torch, pipe, [(128, 128)], events.append)
+    assert denoiser.enable(), events
+    denoiser.warmup(pipe)
+    print(json.dumps(events))
+    """
+)
+
+
+class TestConfigureCache(unittest.TestCase):
+    def test_defaults_to_compile_cache_dir_and_keeps_explicit_env(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {"MIYA_COMPILE_CACHE_DIR": tmpdir, "TRITON_CACHE_DIR": "/explicit/triton"}
+            with mock.patch.dict(os.environ, env, clear=False):
+                for name in ("TORCHINDUCTOR_CACHE_DIR", "TORCHINDUCTOR_FX_GRAPH_CACHE"):
+                    os.environ.pop(name, None)
+                self.assertEqual(flux_compile.configure_cache(), tmpdir)
+                self.assertEqual(os.environ["TORCHINDUCTOR_CACHE_DIR"], str(Path(tmpdir) / "inductor"))
+                self.assertEqual(os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"], "1")
+                self.assertEqual(os.environ["TRITON_CACHE_DIR"], "/explicit/triton")
+
+    def test_parse_buckets(self):
+        self.assertEqual(flux_compile.parse_buckets("512, 768x512,512"), [(512, 512), (768, 512)])
+
+
+@unittest.skipUnless(importlib.util.find_spec("torch"), "torch not installed")
+class TestToyCompile(unittest.TestCase):
+    def test_compiles_on_cpu_into_the_given_cache_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {k: v for k, v in os.environ.items() if not k.startswith(("TORCHINDUCTOR_", "TRITON_"))}
+            env.update({"MIYA_COMPILE_CACHE_DIR": tmpdir, "CUDA_VISIBLE_DEVICES": "", "PYTHONPATH": str(HERE)})
+            proc = subprocess.run(
+                [sys.executable, "-c", TOY_COMPILE], env=env, capture_output=True, text=True, timeout=600
+            )
+            self.assertEqual(proc.returncode, 0, proc.stderr)
+            self.assertIn('"event": "compile"', proc.stdout)
+            self.assertNotIn("compile_failed", proc.stdout)
+            inductor = Path(tmpdir) / "inductor"
+            self.assertTrue(inductor.is_dir() and any(inductor.iterdir()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import flux_planner
+from flux_planner import ModelChoice, model_family, plan
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        root = Path(self._tmp.name)
+        self.big_dir = root / "big"
+        self.small_dir = root / "small"
+        self.other_dir = root / "other"
+        for path in (self.big_dir, self.small_dir, self.other_dir):
+            path.mkdir()
+        self.choices = (
+            ModelChoice("big", lambda: self.big_dir, (8, 4), "a", 3.5, 1000.0, 100.0, 5000.0),
+            ModelChoice("small", lambda: self.small_dir, (2,), "a", 0.0, 200.0, 50.0, 1000.0),
+            ModelChoice("other", lambda: self.other_dir, (1,), "b", 1.0, 10.0, 10.0, 10.0),
+        )
+        patcher = mock.patch.object(flux_planner, "_gpu_scale", return_value=1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_estimate_is_load_plus_overhead_plus_pixel_scaled_steps(self):
+        profile = {"models": {"big": {"step_ms": 400.0, "overhead_ms": 300.0, "load_ms": 2000.0}}}
+        chosen = plan(1e9, 512, 512, profile=profile, choices=self.choices)
+        # 512x512 是参考像素数的 1/4：2000 + 300 + 8 * 400 * 0.25。
+        self.assertEqual((chosen["model"], chosen["steps"]), ("big", 8))
+        self.assertEqual(chosen["estimate_ms"], 3100.0)
+        self.assertEqual(chosen["source"], "measured")
+
+        warm = plan(1e9, 512, 512, loaded_model_dir=str(self.big_dir), profile=profile, choices=self.choices)
+        self.assertEqual(warm["estimate_ms"], 1100.0)
+
+    def test_prior_scales_with_gpu(self):
+        with mock.patch.object(flux_planner, "_gpu_scale", return_value=2.0):
+            chosen = plan(1e9, 1024, 1024, profile={"models": {}}, choices=self.choices)
+        # 先验的单步与固定开销按 gpu 系数放大，装载耗时不放大：5000 + 200 + 8 * 2000。
+        self.assertEqual(chosen["estimate_ms"], 21200.0)
+        self.assertEqual(chosen["source"], "prior")
+
+    def test_ladder_tries_models_before_downscaling(self):
+        profile = {"models": {}}
+        # big@1024: 8 步 13100、4 步 9100；small@1024: 1450；big@768 4 步约 7350。
+        cases = [
+            (20000.0, ("big", 8, 1024)),
+            (9500.0, ("big", 4, 1024)),
+            (9000.0, ("small", 2, 1024)),
+            (1400.0, ("small", 2, 768)),
+        ]
+        for budget, expected in cases:
+            with self.subTest(budget=budget):
+                chosen = plan(budget, 1024, 1024, profile=profile, choices=self.choices[:2])
+                self.assertEqual((chosen["model"], chosen["steps"], chosen["width"]), expected)
+                self.assertFalse(chosen["over_budget"])
+
+        cheapest = plan(1.0, 1024, 1024, profile=profile, choices=self.choices[:2])
+        self.assertEqual((cheapest["model"], cheapest["width"]), ("small", 512))
+        self.assertTrue(cheapest["over_budget"])
+
+    def test_family_restricts_candidates_and_reports_guidance(self):
+        chosen = plan(1.0, 1024, 1024, profile={"models": {}}, choices=self.choices)
+        self.assertEqual((chosen["model"], chosen["guidance_scale"]), ("other", 1.0))
+        chosen = plan(1.0, 1024, 1024, profile={"models": {}}, choices=self.choices, family="a")
+        self.assertEqual((chosen["model"], chosen["guidance_scale"]), ("small", 0.0))
+
+    def test_model_family(self):
+        self.assertEqual(model_family(str(self.other_dir), self.choices), "b")
+        self.assertEqual(model_family("/models/FLUX.1-schnell", flux_planner.MODEL_CHOICES), "flux1")
+        self.assertEqual(model_family("/models/FLUX.2-klein-4B", flux_planner.MODEL_CHOICES), "flux2")
+        self.assertIsNone(model_family("/models/sdxl", flux_planner.MODEL_CHOICES))
+
+
+if __name__ == "__main__":
+    unittest.main()
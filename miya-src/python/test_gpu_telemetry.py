@@ -0,0 +1,105 @@
+import threading
+import time
+import unittest
+from gpu_telemetry import TelemetrySampler
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self):
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return {"total_mb": 8192.0, "used_mb": 1000.0 + self.reads, "free_mb": 7192.0 - self.reads, "util_pct": 50.0}
+
+
+class FakeProbe:
+    def read(self):
+        return {"rss_mb": 256.0, "cpu_pct": 12.5}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+def make_sampler(backend, events, capacity=600):
+    return TelemetrySampler(
+        events.append,
+        threading.Event(),
+        backend=backend,
+        capacity=capacity,
+        process_probe=FakeProbe(),
+        clock=FakeClock(),
+    )
+
+
+class TestTelemetrySampler(unittest.TestCase):
+    def test_ring_buffer_keeps_latest_samples_and_window(self):
+        events = []
+        sampler = make_sampler(FakeBackend(), events, capacity=3)
+        for _ in range(2):
+            sampler.sample_once()
+        sampler.flush_window()
+        for _ in range(3):
+            sampler.sample_once()
+
+        self.assertEqual(len(sampler.samples), 3)
+        self.assertEqual([s.used_mb for s in sampler.samples], [1003.0, 1004.0, 1005.0])
+        payload = sampler.flush_window()
+        # 已上报过的样本即使仍在环形缓冲区里，也不会进入下一个窗口。
+        self.assertEqual(payload["samples"], 3)
+        self.assertIsNone(sampler.flush_window())
+
+    def test_event_shape(self):
+        events = []
+        sampler = make_sampler(FakeBackend(), events)
+        for _ in range(3):
+            sampler.sample_once()
+        sampler.flush_window()
+
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual(event["event"], "gpu")
+        self.assertEqual(event["backend"], "fake")
+        self.assertEqual(event["samples"], 3)
+        self.assertEqual(event["window_s"], 2.0)
+        self.assertEqual(
+            event["latest"],
+            {"total_mb": 8192.0, "used_mb": 1003.0, "free_mb": 7189.0, "util_pct": 50.0, "rss_mb": 256.0, "cpu_pct": 12.5},
+        )
+        self.assertEqual(event["metrics"]["used_mb"], {"min": 1001.0, "avg": 1002.0, "max": 1003.0})
+        self.assertEqual(event["metrics"]["rss_mb"], {"min": 256.0, "avg": 256.0, "max": 256.0})
+
+    def test_samples_process_metrics_without_gpu_backend(self):
+        events = []
+        stop = threading.Event()
+        sampler = TelemetrySampler(
+            events.append,
+            stop,
+            sample_interval_s=0.05,
+            emit_interval_s=0.05,
+            process_probe=FakeProbe(),
+        )
+        thread = sampler.start()
+        for _ in range(100):
+            if events:
+                break
+            time.sleep(0.02)
+        stop.set()
+        thread.join(2.0)
+
+        self.assertTrue(events)
+        self.assertEqual(events[0]["backend"], "none")
+        self.assertEqual(set(events[0]["latest"]), {"rss_mb", "cpu_pct"})
+        self.assertNotIn("used_mb", events[0]["metrics"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,298 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+import infer_flux
+from result_cache import ResultCache
+
+
+class _Events:
+    def __init__(self, on_emit=None):
+        self.items = []
+        self.on_emit = on_emit
+
+    def emit(self, payload):
+        self.items.append(payload)
+        if self.on_emit is not None:
+            self.on_emit(payload)
+
+    def names(self):
+        return [item.get("event") for item in self.items]
+
+
+class TestWorkerInputEof(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(infer_flux.STOP_EVENT.clear)
+        self.addCleanup(infer_flux.JOB_CANCEL.clear)
+        self.events = _Events()
+        patcher = mock.patch.object(infer_flux, "EMITTER", self.events)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _args(self):
+        return infer_flux.build_parser().parse_args(
+            ["--worker", "--no-cache", "--model-dir", self.tmp.name, "--steps", "4", "--seed", "0"]
+        )
+
+    def test_stream_closed_mid_job_cancels_it(self):
+        started = threading.Event()
+
+        def render(_cache, job, _width, _height, _refine=None):
+            started.set()
+            for step in range(200):
+                if infer_flux._cancel_requested():
+                    raise infer_flux._Canceled(step)
+                threading.Event().wait(0.01)
+            self.fail("job kept running after stdin closed")
+
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(read_fd, "r", encoding="utf-8")
+        self.addCleanup(stream.close)
+        writer = os.fdopen(write_fd, "w", encoding="utf-8")
+        output = Path(self.tmp.name) / "a.png"
+        writer.write(f'{{"id": "a", "prompt": "cat", "output_path": "{output.as_posix()}", "size": "256x256"}}\n')
+        writer.flush()
+        # 任务开始后关闭写端，模拟父进程在去噪途中退出。
+        threading.Thread(target=lambda: started.wait(5) and writer.close(), daemon=True).start()
+
+        with mock.patch.object(infer_flux, "_render", side_effect=render):
+            code = infer_flux.run_worker(self._args(), stream)
+
+        self.assertEqual(code, 130)
+        self.assertTrue(infer_flux.STOP_EVENT.is_set())
+        self.assertEqual(self.events.names()[-1], "canceled")
+        self.assertEqual(self.events.items[-1]["id"], "a")
+
+    def test_stream_closed_while_idle_ends_worker(self):
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        with os.fdopen(read_fd, "r", encoding="utf-8") as stream:
+            code = infer_flux.run_worker(self._args(), stream)
+        self.assertEqual(code, 0)
+        self.assertEqual(self.events.names(), ["ready", "done"])
+
+
+class TestResultKey(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+        patcher = mock.patch.dict(
+            os.environ, {"MIYA_RESULT_CACHE_DIR": str(self.tmp / "cache"), "MIYA_MODEL_SNAPSHOTS": "0"}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = self.tmp / "models" / "FLUX.1 schnell"
+        (self.model / "transformer").mkdir(parents=True)
+        (self.model / "transformer" / "w.safetensors").write_bytes(b"\0" * 16)
+        self.lora = self.tmp / "style.safetensors"
+        self.lora.write_bytes(b"lora-a")
+
+    def _args(self, *extra):
+        return infer_flux.build_parser().parse_args(
+            [
+                "--model-dir",
+                str(self.model),
+                "--lora-path",
+                str(self.lora),
+                "--prompt",
+                "cat",
+                "--output-path",
+                str(self.tmp / "out.png"),
+                "--seed",
+                "7",
+                "--steps",
+                "4",
+                *extra,
+            ]
+        )
+
+    def test_key_tracks_model_fingerprint_and_lora_digest(self):
+        base = infer_flux._generation_key(self._args())
+        self.assertIsNotNone(base)
+        self.assertEqual(infer_flux._generation_key(self._args()), base)
+        self.assertNotEqual(infer_flux._generation_key(self._args("--seed", "8")), base)
+        self.lora.write_bytes(b"lora-b")
+        lora_changed = infer_flux._generation_key(self._args())
+        self.assertNotEqual(lora_changed, base)
+        # 同名权重原地替换也必须换键，不能把旧模型的图当命中。
+        (self.model / "transformer" / "w.safetensors").write_bytes(b"\1" * 32)
+        self.assertNotEqual(infer_flux._generation_key(self._args()), lora_changed)
+
+    def test_lookup_misses_then_hits_after_store(self):
+        cache = ResultCache(self.tmp / "cache" / "flux", 1 << 20)
+        args = self._args()
+        output = Path(args.output_path)
+        key, hit = infer_flux._lookup_result(cache, args, output)
+        self.assertIsNone(hit)
+        output.write_bytes(b"image")
+        self.assertEqual(infer_flux._store_result(cache, key, output, args), "miss")
+        output.unlink()
+        key_again, hit = infer_flux._lookup_result(cache, args, output)
+        self.assertEqual(key_again, key)
+        self.assertEqual(hit["cache"], "hit")
+        self.assertEqual(hit["seed"], 7)
+        self.assertEqual(output.read_bytes(), b"image")
+
+    def test_worker_never_caches_random_seed_jobs(self):
+        done = threading.Event()
+        events = _Events(on_emit=lambda p: p.get("event") == "result" and p.get("id") == "b" and done.set())
+        patcher = mock.patch.object(infer_flux, "EMITTER", events)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(infer_flux.STOP_EVENT.clear)
+        self.addCleanup(infer_flux.JOB_CANCEL.clear)
+
+        def stream():
+            for job_id, seed in (("a", 0), ("b", 5)):
+                output = (self.tmp / f"{job_id}.png").as_posix()
+                yield f'{{"id": "{job_id}", "prompt": "cat", "seed": {seed}, "output_path": "{output}"}}\n'
+            # 两个任务都出结果后再 EOF，否则 EOF 会提前结束 worker。
+            done.wait(10)
+
+        args = infer_flux.build_parser().parse_args(["--worker", "--model-dir", str(self.model), "--steps", "4"])
+        with mock.patch.object(infer_flux, "_render", return_value=(None, None)), mock.patch.object(
+            infer_flux, "_lookup_result", wraps=infer_flux._lookup_result
+        ) as lookup:
+            self.assertEqual(infer_flux.run_worker(args, stream()), 0)
+        caches = [call.args[0] for call in lookup.call_args_list]
+        self.assertEqual(len(caches), 2)
+        self.assertIsNone(caches[0])
+        self.assertIsInstance(caches[1], ResultCache)
+
+
+class _FakeTensor:
+    """Scalar stand-in for a latent tensor: enough arithmetic for the refine noising."""
+
+    def __init__(self, value: float, shape=(1, 16, 64)):
+        self.value = value
+        self.shape = shape
+        self.device = "cpu"
+        self.dtype = "fp32"
+
+    def __mul__(self, other):
+        return _FakeTensor(self.value * other, self.shape)
+
+    __rmul__ = __mul__
+
+    def __add__(self, other):
+        return _FakeTensor(self.value + other.value, self.shape)
+
+
+class _FakeTorch:
+    def __init__(self):
+        self.randn_calls = []
+
+    def randn(self, shape, generator=None, device=None, dtype=None):
+        self.randn_calls.append((shape, generator, device, dtype))
+        return _FakeTensor(1.0, shape)
+
+
+class _FakeScheduler:
+    """Flow-match scheduler with a static shift, like FluxPipeline's without dynamic shifting."""
+
+    def __init__(self, shift: float = 3.0):
+        self.config = {"use_dynamic_shifting": False}
+        self.shift = shift
+        self.sigmas = None
+
+    def set_timesteps(self, sigmas, device=None, mu=None):
+        self.sigmas = [self.shift * s / (1 + (self.shift - 1) * s) for s in sigmas]
+
+
+class _FakePipe:
+    def __init__(self):
+        self.scheduler = _FakeScheduler()
+
+    def __call__(self, prompt, latents=None, sigmas=None, num_inference_steps=4):
+        raise AssertionError("not called by _refine_kwargs")
+
+
+class _NoSigmasPipe(_FakePipe):
+    def __call__(self, prompt, latents=None, num_inference_steps=4):
+        raise AssertionError("not called by _refine_kwargs")
+
+
+class TestRefineKwargs(unittest.TestCase):
+    def test_runs_strength_tail_of_schedule(self):
+        torch, pipe = _FakeTorch(), _FakePipe()
+        kwargs = infer_flux._refine_kwargs(torch, pipe, _FakeTensor(2.0), 0.5, 4, generator="g")
+        self.assertEqual(kwargs["num_inference_steps"], 2)
+        self.assertEqual(kwargs["sigmas"], [0.5, 0.25])
+        # 起点取移位后的首个 sigma：3 * 0.5 / (1 + 2 * 0.5) = 0.75。
+        self.assertAlmostEqual(kwargs["latents"].value, 0.75 * 1.0 + 0.25 * 2.0)
+        self.assertEqual(torch.randn_calls, [((1, 16, 64), "g", "cpu", "fp32")])
+        self.assertIsNone(pipe.scheduler.sigmas)
+
+    def test_step_count_is_clamped(self):
+        for strength, steps, run, first in ((0.01, 4, 1, 0.25), (1.0, 4, 4, 1.0), (0.5, 1, 1, 1.0), (0.6, 10, 6, 0.6)):
+            with self.subTest(strength=strength, steps=steps):
+                kwargs = infer_flux._refine_kwargs(_FakeTorch(), _FakePipe(), _FakeTensor(0.0), strength, steps, None)
+                self.assertEqual(kwargs["num_inference_steps"], run)
+                self.assertEqual(len(kwargs["sigmas"]), run)
+                self.assertAlmostEqual(kwargs["sigmas"][0], first)
+                self.assertAlmostEqual(kwargs["sigmas"][-1], 1.0 / steps)
+
+    def test_full_strength_starts_from_pure_noise(self):
+        kwargs = infer_flux._refine_kwargs(_FakeTorch(), _FakePipe(), _FakeTensor(5.0), 1.0, 4, None)
+        self.assertAlmostEqual(kwargs["latents"].value, 1.0)
+
+    def test_rejects_pipelines_without_sigmas(self):
+        with self.assertRaisesRegex(ValueError, "refine_unsupported_by_pipeline"):
+            infer_flux._refine_kwargs(_FakeTorch(), _NoSigmasPipe(), _FakeTensor(0.0), 0.5, 4, None)
+
+
+class TestLatentCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+
+    def _entry(self, prompt: str, latents=object()):
+        return infer_flux._LatentEntry(latents, "/models/flux", None, "512x512", prompt, 1)
+
+    def test_addressable_by_job_id_and_output_path(self):
+        cache = infer_flux._LatentCache(2)
+        entry = self._entry("cat")
+        cache.put(self.tmp / "a.png", "job-a", entry)
+        self.assertIs(cache.get("job-a"), entry)
+        self.assertIs(cache.get(str(self.tmp / "a.png")), entry)
+        self.assertIs(cache.get(str(self.tmp / "sub" / ".." / "a.png")), entry)
+        self.assertIsNone(cache.get("job-b"))
+
+    def test_same_output_replaces_entry_and_keeps_both_aliases(self):
+        cache = infer_flux._LatentCache(2)
+        cache.put(self.tmp / "a.png", "first", self._entry("cat"))
+        newer = self._entry("dog")
+        cache.put(self.tmp / "a.png", "second", newer)
+        self.assertEqual(len(cache.entries), 1)
+        self.assertIs(cache.get("first"), newer)
+        self.assertIs(cache.get("second"), newer)
+
+    def test_evicts_least_recently_used_with_its_aliases(self):
+        cache = infer_flux._LatentCache(2)
+        cache.put(self.tmp / "a.png", "a", self._entry("a"))
+        cache.put(self.tmp / "b.png", "b", self._entry("b"))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put(self.tmp / "c.png", "c", self._entry("c"))
+        self.assertIsNone(cache.get("b"))
+        self.assertNotIn("b", cache.aliases)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_zero_capacity_and_missing_latents_store_nothing(self):
+        off = infer_flux._LatentCache(0)
+        off.put(self.tmp / "a.png", "a", self._entry("a"))
+        self.assertIsNone(off.get("a"))
+        cache = infer_flux._LatentCache(2)
+        cache.put(self.tmp / "a.png", "a", self._entry("a", latents=None))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.aliases, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
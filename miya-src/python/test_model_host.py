@@ -0,0 +1,56 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import model_host
+from model_host import ModelHost, estimate_footprint_mb
+
+
+def write_safetensors(path: Path, tensors: dict):
+    header = {name: {"dtype": dtype, "shape": shape, "data_offsets": [0, 0]} for name, (dtype, shape) in tensors.items()}
+    raw = json.dumps(header).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(struct.pack("<Q", len(raw)) + raw)
+
+
+class TestEstimateFootprint(unittest.TestCase):
+    def test_one_format_per_dir_skips_root_checkpoint_and_scales_by_dtype(self):
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch.dict(
+            os.environ, {"MIYA_RESULT_CACHE_DIR": str(Path(tmpdir) / "cache")}
+        ):
+            model = Path(tmpdir) / "model"
+            # 1Mi 个 fp32 参数：按 fp16 装载为 2 MiB，按 fp32 为 4 MiB。
+            write_safetensors(model / "transformer" / "w.safetensors", {"w": ("F32", [1024, 1024])})
+            (model / "transformer" / "w.bin").write_bytes(b"\0" * 4096)
+            (model / "flux1.safetensors").write_bytes(b"\0" * 8192)
+            (model / "vae").mkdir()
+            (model / "vae" / "v.bin").write_bytes(b"\0" * (1024 * 1024))
+
+            self.assertEqual(estimate_footprint_mb(model, "fp16"), 3.0)
+            self.assertEqual(estimate_footprint_mb(model, "fp32"), 5.0)
+
+
+class TestModelHostBudget(unittest.TestCase):
+    def test_loads_despite_high_estimate_and_rolls_back_when_measured_too_big(self):
+        sizes = {"small": 40, "big": 80}
+        host = ModelHost(
+            50,
+            0,
+            lambda _event: None,
+            loaders={"x": lambda model_dir, device, options: model_dir},
+            cuda_available=True,
+        )
+        with mock.patch.object(model_host, "module_bytes", lambda m: sizes[m] * 1024 * 1024):
+            entry, status = host.load("a", "x", "small", options={"footprint_mb": 500})
+            self.assertEqual((status, entry.footprint_mb), ("loaded", 40.0))
+            with self.assertRaises(RuntimeError):
+                host.load("b", "x", "big", options={"footprint_mb": 10})
+        self.assertNotIn("b", host.models)
+        self.assertLessEqual(host.used_mb("cuda"), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
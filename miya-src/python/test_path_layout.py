@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import path_layout
+from path_layout import ensure_manifest, manifest_is_fresh, manifest_path
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        patcher = mock.patch.dict(os.environ, {"MIYA_RESULT_CACHE_DIR": str(self.tmp / "cache")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+        self.model = self.tmp / "models" / "flux"
+        (self.model / "transformer").mkdir(parents=True)
+        (self.model / "transformer" / "w.bin").write_bytes(b"\0" * 16)
+
+    def test_stored_under_data_root_and_reused_without_walking(self):
+        first = ensure_manifest(self.model)
+        self.assertTrue(manifest_path(self.model).is_file())
+        self.assertFalse(manifest_path(self.model).is_relative_to(self.model.parent))
+        with mock.patch.object(path_layout, "build_manifest", side_effect=AssertionError("walked")):
+            self.assertEqual(ensure_manifest(self.model), first)
+
+    def test_shallow_checks_root_and_weights_deep_checks_all_files(self):
+        (self.model / "transformer" / "config.json").write_text("{}")
+        manifest = ensure_manifest(self.model)
+        (self.model / "transformer" / "config.json").write_text('{"a": 1}')
+        self.assertTrue(manifest_is_fresh(self.model, manifest))
+        self.assertFalse(manifest_is_fresh(self.model, manifest, deep=True))
+        (self.model / "vae").mkdir()
+        self.assertFalse(manifest_is_fresh(self.model, manifest))
+
+    def test_shallow_check_sees_weight_replaced_in_place(self):
+        manifest = ensure_manifest(self.model)
+        weight = self.model / "transformer" / "w.bin"
+        weight.write_bytes(b"\1" * 16)
+        os.utime(weight, ns=(0, manifest["files"]["transformer/w.bin"][1] + 1))
+        self.assertFalse(manifest_is_fresh(self.model, manifest))
+
+
+if __name__ == "__main__":
+    unittest.main()
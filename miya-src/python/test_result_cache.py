@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from result_cache import ResultCache, cache_key, file_digest
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_stable_and_order_independent(self):
+        self.assertEqual(cache_key({"a": 1, "b": "x"}), cache_key({"b": "x", "a": 1}))
+        self.assertNotEqual(cache_key({"a": 1}), cache_key({"a": 2}))
+
+    def test_file_digest_follows_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lora.safetensors"
+            path.write_bytes(b"one")
+            first = file_digest(path)
+            self.assertEqual(file_digest(path), first)
+            path.write_bytes(b"other")
+            self.assertNotEqual(file_digest(path), first)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+
+    def _output(self, name: str, size: int) -> Path:
+        path = self.tmp / "out" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(name.encode("utf-8")[:1] * size)
+        return path
+
+    def test_miss_store_hit_round_trip(self):
+        cache = ResultCache(self.tmp / "cache", 1024)
+        key = cache_key({"prompt": "cat", "seed": 1})
+        dest = self.tmp / "served" / "a.png"
+        self.assertIsNone(cache.materialize(key, dest))
+        self.assertTrue(cache.store(key, self._output("a.png", 10), {"format": "png", "seed": 1}))
+        meta = cache.materialize(key, dest)
+        self.assertEqual(meta["format"], "png")
+        self.assertEqual(meta["bytes"], 10)
+        self.assertEqual(dest.read_bytes(), b"a" * 10)
+        # 命中时复制而不是链接：改写交付的文件不影响缓存条目。
+        dest.write_bytes(b"changed")
+        self.assertEqual(cache.materialize(key, self.tmp / "again.png")["bytes"], 10)
+        self.assertEqual((self.tmp / "again.png").read_bytes(), b"a" * 10)
+
+    def test_evicts_least_recently_used_first(self):
+        cache = ResultCache(self.tmp / "cache", 25)
+        keys = [cache_key({"n": n}) for n in range(3)]
+        cache.store(keys[0], self._output("a.png", 10), {})
+        cache.store(keys[1], self._output("b.png", 10), {})
+        self.assertIsNotNone(cache.lookup(keys[0]))
+        cache.store(keys[2], self._output("c.png", 10), {})
+        self.assertIsNotNone(cache.lookup(keys[0]))
+        self.assertIsNone(cache.lookup(keys[1]))
+        self.assertIsNotNone(cache.lookup(keys[2]))
+
+    def test_rescan_orders_by_last_use(self):
+        root = self.tmp / "cache"
+        writer = ResultCache(root, 1024)
+        keys = [cache_key({"n": n}) for n in range(3)]
+        for n, key in enumerate(keys):
+            writer.store(key, self._output(f"{n}.png", 10), {})
+            meta_path = root / key[:2] / f"{key}.meta.json"
+            os.utime(meta_path, ns=(n * 10**9, n * 10**9))
+        # 另一个进程以更小的上限打开同一目录：按 meta 的 mtime 从最旧开始淘汰。
+        reader = ResultCache(root, 15)
+        self.assertEqual(reader.evict(), 2)
+        self.assertIsNone(reader.lookup(keys[0]))
+        self.assertIsNone(reader.lookup(keys[1]))
+        self.assertIsNotNone(reader.lookup(keys[2]))
+
+    def test_disabled_cache_never_stores(self):
+        cache = ResultCache(self.tmp / "cache", 0)
+        key = cache_key({"n": 0})
+        self.assertFalse(cache.store(key, self._output("a.png", 10), {}))
+        self.assertIsNone(cache.materialize(key, self.tmp / "a.png"))
+        self.assertFalse((self.tmp / "cache").exists())
+
+    def test_meta_records_file_and_size(self):
+        cache = ResultCache(self.tmp / "cache", 1024)
+        key = cache_key({"n": 1})
+        cache.store(key, self._output("a.webp", 7), {"format": "webp"})
+        meta = json.loads((self.tmp / "cache" / key[:2] / f"{key}.meta.json").read_text(encoding="utf-8"))
+        self.assertEqual(meta, {"format": "webp", "file": f"{key}.webp", "bytes": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from tts_frontend import (
+    FRONTEND_VERSION,
+    FrontendCache,
+    SymbolTable,
+    _split_syllable,
+    int_to_en,
+    int_to_zh,
+    load_sovits_symbols,
+    normalize,
+)
+
+
+class TestNumbers(unittest.TestCase):
+    def test_int_to_zh(self):
+        cases = [
+            (0, "零"),
+            (7, "七"),
+            (10, "十"),
+            (15, "十五"),
+            (20, "二十"),
+            (105, "一百零五"),
+            (1000, "一千"),
+            (1010, "一千零一十"),
+            (10005, "一万零五"),
+            (100000, "十万"),
+            (120034, "十二万零三十四"),
+            (100000000, "一亿"),
+        ]
+        for n, expected in cases:
+            with self.subTest(n=n):
+                self.assertEqual(int_to_zh(n), expected)
+
+    def test_int_to_en(self):
+        cases = [
+            (0, "zero"),
+            (13, "thirteen"),
+            (24, "twenty four"),
+            (100, "one hundred"),
+            (1000, "one thousand"),
+            (1005, "one thousand five"),
+            (2024, "two thousand twenty four"),
+            (1000000, "one million"),
+        ]
+        for n, expected in cases:
+            with self.subTest(n=n):
+                self.assertEqual(int_to_en(n), expected)
+
+
+class TestNormalize(unittest.TestCase):
+    def test_table(self):
+        cases = [
+            ("价格是1,000元", "价格是一千元"),
+            ("1,000 apples", "one thousand apples"),
+            ("12,345.5%", "twelve thousand three hundred forty five point five percent"),
+            ("1,2,3", "one , two , three"),
+            ("会议10:30开始", "会议十点三十分开始"),
+            ("现在是2:00", "现在是两点"),
+            ("会议10:05开始", "会议十点零五分开始"),
+            ("10:30", "ten thirty"),
+            ("at 9:05", "at nine oh five"),
+            ("2:00 pm", "two o'clock pm"),
+            ("2024年", "二零二四年"),
+            ("零下-5度", "零下负五度"),
+            ("温度-5.5", "温度负五点五"),
+            ("model a-1", "model a one"),
+            ("你好！世界。", "你好!世界."),
+            ("Hello…World", "hello…world"),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(normalize(text), expected)
+
+
+class TestFrontendCache(unittest.TestCase):
+    def test_lru_eviction_and_stats(self):
+        cache = FrontendCache(2)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        self.assertEqual(cache.get("a"), [1])
+        cache.put("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_save_merges_and_namespace_isolates(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "frontend.json"
+            first = FrontendCache(8, path, backend="pypinyin")
+            first.put("a", [1])
+            self.assertTrue(first.save())
+            other = FrontendCache(8, path, backend="pypinyin")
+            other.put("b", [2])
+            self.assertTrue(other.save())
+            # 未修改时不重写文件。
+            self.assertFalse(other.save())
+
+            reloaded = FrontendCache(8, path, backend="pypinyin")
+            self.assertEqual(reloaded.load(), 2)
+            self.assertEqual(reloaded.get("a"), [1])
+
+            fallback = FrontendCache(8, path, backend="fallback")
+            self.assertEqual(fallback.load(), 0)
+
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            self.assertEqual(raw["version"], FRONTEND_VERSION)
+
+    def test_zero_capacity_loads_nothing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "frontend.json"
+            full = FrontendCache(8, path)
+            full.put("a", [1])
+            full.put("b", [2])
+            full.save()
+            empty = FrontendCache(0, path)
+            self.assertEqual(empty.load(), 0)
+            self.assertEqual(len(empty.entries), 0)
+
+
+class TestSymbols(unittest.TestCase):
+    def test_syllables_use_gpt_sovits_spelling(self):
+        cases = [
+            ("zhi1", ["zh", "ir1"]),
+            ("si4", ["s", "i04"]),
+            ("ju4", ["j", "v4"]),
+            ("yue4", ["y", "ve4"]),
+            ("liu2", ["l", "iou2"]),
+            ("gui4", ["g", "uei4"]),
+            ("ai4", ["AA", "ai4"]),
+            ("er2", ["EE", "er2"]),
+            ("hao", ["h", "ao5"]),
+        ]
+        for syllable, expected in cases:
+            with self.subTest(syllable=syllable):
+                self.assertEqual(_split_syllable(syllable), expected)
+
+    def test_ids_follow_the_model_table(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text_dir = Path(tmpdir) / "GPT_SoVITS" / "text"
+            text_dir.mkdir(parents=True)
+            (text_dir / "symbols2.py").write_text(
+                'symbols = ["_", ",", "SP", "UNK", "h", "ao3"]\n', encoding="utf-8"
+            )
+            table = load_sovits_symbols(Path(tmpdir))
+            self.assertIsNotNone(table)
+            self.assertEqual(table.source, "gpt-sovits:symbols2.py")
+            # 空格与分号按别名映射到 SP 与逗号，表中没有的符号记为 UNK。
+            self.assertEqual(table.ids(["h", "ao3", " ", ";", "zh"]), [4, 5, 2, 1, 3])
+            self.assertIsNone(load_sovits_symbols(Path(tmpdir) / "missing"))
+
+    def test_cache_namespace_follows_table(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "frontend.json"
+            first = FrontendCache(8, path, table=SymbolTable(["_", "a1"], "x"))
+            first.put("a", [1])
+            first.save()
+            other = FrontendCache(8, path, table=SymbolTable(["_", "a1", "b"], "y"))
+            self.assertEqual(other.load(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
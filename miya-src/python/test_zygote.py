@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+import zygote
+
+HERE = Path(__file__).resolve().parent
+
+# 子进程打印自己看到的环境与父进程，并在环境里留下标记，检查它不会漏到下一个子进程。
+CHILD_SCRIPT = textwrap.dedent(
+    """
+    import json, os, sys
+    print(json.dumps({
+        "argv": sys.argv[1:],
+        "job": os.environ.get("MIYA_TEST_JOB"),
+        "leaked": os.environ.get("MIYA_TEST_LEAK"),
+        "ppid": os.getppid(),
+        "cwd": os.getcwd(),
+    }))
+    os.environ["MIYA_TEST_LEAK"] = os.environ.get("MIYA_TEST_JOB", "")
+    sys.exit(int(sys.argv[1]))
+    """
+)
+
+
+@unittest.skipUnless(zygote.supported(), "zygote needs Linux fork and SCM_RIGHTS")
+class TestZygoteServeRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.socket = root / "zygote.sock"
+        self.script = root / "child.py"
+        self.script.write_text(CHILD_SCRIPT)
+        self.server = subprocess.Popen(
+            [
+                sys.executable,
+                str(HERE / "zygote.py"),
+                "--socket",
+                str(self.socket),
+                "serve",
+                "--preload",
+                "json",
+                "--allow-any-script",
+                "--exit-with-parent",
+            ],
+            cwd=HERE,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.addCleanup(self._stop_server)
+        self.ready = json.loads(self.server.stdout.readline())
+
+    def _stop_server(self):
+        self.server.stdin.close()
+        try:
+            self.server.wait(10)
+        except subprocess.TimeoutExpired:
+            self.server.kill()
+            self.server.wait()
+        self.server.stdout.close()
+
+    def _run(self, job: str, code: int):
+        env = {**os.environ, "MIYA_TEST_JOB": job}
+        env.pop("MIYA_TEST_LEAK", None)
+        proc = subprocess.run(
+            [sys.executable, str(HERE / "zygote.py"), "--socket", str(self.socket), "run", str(self.script), str(code)],
+            cwd=self.tmp.name,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        return proc.returncode, json.loads(proc.stdout)
+
+    def test_run_forks_children_with_their_own_env(self):
+        self.assertEqual(self.ready["event"], "ready")
+        self.assertIn("json", self.ready["loaded"])
+
+        first_code, first = self._run("one", 0)
+        second_code, second = self._run("two", 7)
+
+        self.assertEqual((first_code, second_code), (0, 7))
+        # 两个子进程都由常驻服务端 fork，而不是 run 回退为直接执行脚本。
+        self.assertEqual(first["ppid"], self.ready["pid"])
+        self.assertEqual(second["ppid"], self.ready["pid"])
+        self.assertEqual(first["argv"], ["0"])
+        self.assertEqual(second["argv"], ["7"])
+        self.assertEqual(Path(first["cwd"]).resolve(), Path(self.tmp.name).resolve())
+        self.assertEqual((first["job"], second["job"]), ("one", "two"))
+        self.assertIsNone(first["leaked"])
+        self.assertIsNone(second["leaked"])
+
+    def test_server_exits_with_parent_and_reports_launches(self):
+        self._run("one", 0)
+        self.server.stdin.close()
+        self.assertEqual(self.server.wait(10), 0)
+        done = json.loads(self.server.stdout.readline())
+        self.assertEqual(done, {"event": "done", "status": "ok", "launched": 1})
+        self.assertFalse(self.socket.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,18 +6,22 @@ import signal
 import sys
 import threading
 import time
-from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
+from gpu_telemetry import start_gpu_telemetry
+from event_emitter import create_emitter
 from path_layout import flux_schnell_dir
 
 
 STOP_EVENT = threading.Event()
 
 
+EMITTER = create_emitter(STOP_EVENT)
+
+
 def _emit(payload: dict):
     try:
-        print(json.dumps(payload), flush=True)
+        EMITTER.emit(payload)
     except BrokenPipeError:
         STOP_EVENT.set()
         raise SystemExit(86)
@@ -25,7 +29,7 @@ def _emit(payload: dict):
 
 def _on_signal(signum, _frame):
     STOP_EVENT.set()
-    _emit({"event": "signal", "signal": int(signum), "message": "interrupt_requested"})
+    EMITTER.emit_reentrant({"event": "signal", "signal": int(signum), "message": "interrupt_requested"})
 
 
 signal.signal(signal.SIGINT, _on_signal)
@@ -60,43 +64,6 @@ def _parse_size(value: str) -> tuple[int, int]:
     return w, h
 
 
-@dataclass
-class GpuSnapshot:
-    total_mb: float
-    used_mb: float
-    free_mb: float
-
-
-def _read_gpu_memory() -> Optional[GpuSnapshot]:
-    try:
-        import torch  # type: ignore
-
-        if not torch.cuda.is_available():
-            return None
-        free_b, total_b = torch.cuda.mem_get_info()
-        free_mb = free_b / 1024 / 1024
-        total_mb = total_b / 1024 / 1024
-        used_mb = total_mb - free_mb
-        return GpuSnapshot(total_mb=total_mb, used_mb=used_mb, free_mb=free_mb)
-    except Exception:
-        return None
-
-
-def _gpu_watchdog(interval_s: float):
-    while not STOP_EVENT.is_set():
-        snap = _read_gpu_memory()
-        if snap:
-            _emit(
-                {
-                    "event": "gpu",
-                    "total_mb": round(snap.total_mb, 2),
-                    "used_mb": round(snap.used_mb, 2),
-                    "free_mb": round(snap.free_mb, 2),
-                }
-            )
-        STOP_EVENT.wait(interval_s)
-
-
 def _train_with_diffusers(args: argparse.Namespace, output_lora_path: Path) -> bool:
     try:
         import torch  # type: ignore
@@ -175,6 +142,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--vram-limit-mb", type=int, default=int(_env("MIYA_VRAM_LIMIT_MB", "8192")))
     p.add_argument("--checkpoint-interval", type=int, default=int(_env("MIYA_CHECKPOINT_INTERVAL", "50")))
     p.add_argument("--gpu-log-interval", type=float, default=float(_env("MIYA_GPU_LOG_INTERVAL", "5")))
+    p.add_argument("--gpu-sample-interval", type=float, default=float(_env("MIYA_GPU_SAMPLE_INTERVAL", "1")))
     p.add_argument("--dry-run", action="store_true")
     return p
 
@@ -205,8 +173,7 @@ def main() -> int:
         return 2
 
     output_lora_path = Path(args.output_path)
-    gpu_thread = threading.Thread(target=_gpu_watchdog, args=(max(1.0, args.gpu_log_interval),), daemon=True)
-    gpu_thread.start()
+    start_gpu_telemetry(_emit, STOP_EVENT, max(1.0, args.gpu_log_interval), args.gpu_sample_interval)
 
     _emit(
         {
@@ -9,15 +9,20 @@ import threading
 import time
 from pathlib import Path
 from typing import Optional
+from gpu_telemetry import start_gpu_telemetry
+from event_emitter import create_emitter
 from path_layout import sovits_dir
 
 
 STOP_EVENT = threading.Event()
 
 
+EMITTER = create_emitter(STOP_EVENT)
+
+
 def _emit(payload: dict):
     try:
-        print(json.dumps(payload), flush=True)
+        EMITTER.emit(payload)
     except BrokenPipeError:
         STOP_EVENT.set()
         raise SystemExit(86)
@@ -25,7 +30,7 @@ def _emit(payload: dict):
 
 def _on_signal(signum, _frame):
     STOP_EVENT.set()
-    _emit({"event": "signal", "signal": int(signum), "message": "interrupt_requested"})
+    EMITTER.emit_reentrant({"event": "signal", "signal": int(signum), "message": "interrupt_requested"})
 
 
 signal.signal(signal.SIGINT, _on_signal)
@@ -49,27 +54,6 @@ def _env(name: str, default: Optional[str] = None) -> Optional[str]:
     return value
 
 
-def _gpu_monitor(interval_s: float):
-    try:
-        import torch  # type: ignore
-    except Exception:
-        torch = None
-    while not STOP_EVENT.is_set():
-        if torch and torch.cuda.is_available():
-            free_b, total_b = torch.cuda.mem_get_info()
-            free_mb = free_b / 1024 / 1024
-            total_mb = total_b / 1024 / 1024
-            _emit(
-                {
-                    "event": "gpu",
-                    "total_mb": round(total_mb, 2),
-                    "used_mb": round(total_mb - free_mb, 2),
-                    "free_mb": round(free_mb, 2),
-                }
-            )
-        STOP_EVENT.wait(interval_s)
-
-
 def _read_manifest(manifest: Path) -> list[tuple[str, str]]:
     rows: list[tuple[str, str]] = []
     with manifest.open("r", encoding="utf-8") as f:
@@ -120,6 +104,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--learning-rate", type=float, default=float(_env("MIYA_LR", "5e-5")))
     p.add_argument("--checkpoint-interval", type=int, default=int(_env("MIYA_CHECKPOINT_INTERVAL", "100")))
     p.add_argument("--gpu-log-interval", type=float, default=float(_env("MIYA_GPU_LOG_INTERVAL", "5")))
+    p.add_argument("--gpu-sample-interval", type=float, default=float(_env("MIYA_GPU_SAMPLE_INTERVAL", "1")))
     p.add_argument("--dry-run", action="store_true")
     return p
 
@@ -178,8 +163,7 @@ def main() -> int:
     output_path = Path(args.output_path)
     checkpoint_path = Path(args.checkpoint_path) if args.checkpoint_path else None
 
-    monitor = threading.Thread(target=_gpu_monitor, args=(max(1.0, args.gpu_log_interval),), daemon=True)
-    monitor.start()
+    start_gpu_telemetry(_emit, STOP_EVENT, max(1.0, args.gpu_log_interval), args.gpu_sample_interval)
 
     _emit(
         {
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import os
 import sys
 import wave
 from pathlib import Path
 from typing import Optional
-from path_layout import sovits_dir
+from event_emitter import create_emitter
+from path_layout import sovits_dir, tts_frontend_cache_path
+from tts_frontend import BUILTIN_SYMBOLS, G2P, FrontendCache, FrontendSegment, TextFrontend, load_sovits_symbols
+
+
+EMITTER = create_emitter()
+
+
+def _emit(payload: dict):
+    try:
+        EMITTER.emit(payload)
+    except BrokenPipeError:
+        raise SystemExit(86)
 
 
 def _env(name: str, default: Optional[str] = None) -> Optional[str]:
@@ -58,16 +69,46 @@ def build_parser() -> argparse.ArgumentParser:
     )
     p.add_argument("--input-audio", help="voice conversion input audio path")
     p.add_argument("--sample-rate", type=int, default=int(_env("MIYA_SOVITS_SAMPLE_RATE", "22050")))
+    p.add_argument(
+        "--frontend-cache",
+        default=_env("MIYA_TTS_FRONTEND_CACHE", str(tts_frontend_cache_path())),
+        help="persisted G2P cache file; empty string keeps the cache in memory only",
+    )
+    p.add_argument(
+        "--frontend-cache-size",
+        type=int,
+        default=int(_env("MIYA_TTS_FRONTEND_CACHE_SIZE", "4096")),
+    )
     p.add_argument("--dry-run", action="store_true")
     return p
 
 
-def _try_sovits_tts(args: argparse.Namespace, wav_out: Path) -> bool:
-    # 给后续接入真实GPT-SoVITS保留稳定调用位置。
+def _run_frontend(args: argparse.Namespace) -> tuple[list[FrontendSegment], dict]:
+    # 文本前端（规范化、分句、G2P）单独成段，按句缓存，重复短语不再重复做 G2P。
+    # 音素 ID 取自模型目录里 GPT-SoVITS 的 symbols，才能直接交给其文本嵌入。
+    table = load_sovits_symbols(Path(args.model_dir))
+    if table is None:
+        table = BUILTIN_SYMBOLS
+        _emit({"event": "warn", "message": f"sovits_symbols_unavailable:{args.model_dir}"})
+    g2p = G2P(table)
+    for warning in g2p.warnings:
+        _emit({"event": "warn", "message": warning})
+    cache_path = Path(args.frontend_cache) if args.frontend_cache else None
+    cache = FrontendCache(args.frontend_cache_size, cache_path, backend=g2p.backend, table=table)
+    cache.load()
+    frontend = TextFrontend(cache, g2p)
+    segments = frontend.process(args.text)
+    cache.save()
+    return segments, {**frontend.stats(), "segments": len(segments), "symbols": table.source}
+
+
+def _try_sovits_tts(args: argparse.Namespace, wav_out: Path, segments: list[FrontendSegment]) -> bool:
+    # 给后续接入真实GPT-SoVITS保留稳定调用位置；segments 已是该模型符号表下的音素 ID。
     try:
         _ = args.model_dir
         _ = args.voice
         _ = args.speaker_embed
+        _ = segments
         # 若本地已接入真实推理实现，可在此替换为实际加载与推理。
         return False
     except Exception:
@@ -77,28 +118,25 @@ def _try_sovits_tts(args: argparse.Namespace, wav_out: Path) -> bool:
 def main() -> int:
     args = build_parser().parse_args()
     if not args.output_path:
-        print(json.dumps({"event": "error", "message": "output_path_required"}), flush=True)
+        _emit({"event": "error", "message": "output_path_required"})
         return 2
     if args.mode == "tts" and not args.text.strip():
-        print(json.dumps({"event": "error", "message": "text_required_for_tts"}), flush=True)
+        _emit({"event": "error", "message": "text_required_for_tts"})
         return 2
     if args.mode == "vc" and not args.input_audio:
-        print(json.dumps({"event": "error", "message": "input_audio_required_for_vc"}), flush=True)
+        _emit({"event": "error", "message": "input_audio_required_for_vc"})
         return 2
 
     out = Path(args.output_path)
     wav_out = out if out.suffix.lower() == ".wav" else out.with_suffix(".wav")
-    print(
-        json.dumps(
-            {
-                "event": "start",
-                "mode": args.mode,
-                "voice": args.voice,
-                "format": args.format,
-                "output_path": str(out),
-            }
-        ),
-        flush=True,
+    _emit(
+        {
+            "event": "start",
+            "mode": args.mode,
+            "voice": args.voice,
+            "format": args.format,
+            "output_path": str(out),
+        }
     )
 
     if args.dry_run:
@@ -108,11 +146,15 @@ def main() -> int:
             out.parent.mkdir(parents=True, exist_ok=True)
             final.replace(out)
             final = out
-        print(json.dumps({"event": "done", "status": "dry_run", "output_path": str(final)}), flush=True)
+        _emit({"event": "done", "status": "dry_run", "output_path": str(final)})
         return 0
 
     try:
-        ok = _try_sovits_tts(args, wav_out)
+        segments: list[FrontendSegment] = []
+        frontend_stats = None
+        if args.mode == "tts":
+            segments, frontend_stats = _run_frontend(args)
+        ok = _try_sovits_tts(args, wav_out, segments)
         if not ok:
             _write_silent_wav(wav_out, ms=max(600, min(7000, len(args.text) * 55)), sample_rate=args.sample_rate)
 
@@ -121,10 +163,13 @@ def main() -> int:
             out.parent.mkdir(parents=True, exist_ok=True)
             final.replace(out)
             final = out
-        print(json.dumps({"event": "done", "status": "ok", "output_path": str(final)}), flush=True)
+        done = {"event": "done", "status": "ok", "output_path": str(final)}
+        if frontend_stats is not None:
+            done["frontend"] = frontend_stats
+        _emit(done)
         return 0
     except Exception as exc:
-        print(json.dumps({"event": "error", "message": str(exc)}), flush=True)
+        _emit({"event": "error", "message": str(exc)})
         return 1
 
 
@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import runpy
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+FRONTEND_VERSION = 2
+MAX_SEGMENT_CHARS = 48
+
+_PUNCT = (",", ".", "!", "?", ";", ":", "-", "…")
+_INITIALS = (
+    "zh", "ch", "sh", "b", "p", "m", "f", "d", "t", "n", "l", "g", "k", "h",
+    "j", "q", "x", "r", "z", "c", "s", "y", "w",
+)
+# 零声母音节按 GPT-SoVITS（opencpop-strict）的写法补一个 AA/EE/OO 占位声母。
+_ZERO_INITIALS = {"a": "AA", "e": "EE", "o": "OO"}
+_FINALS = (
+    "a", "o", "e", "i", "u", "v", "ai", "ei", "ao", "ou", "an", "en", "ang", "eng", "ong", "er",
+    "ia", "ie", "iao", "iu", "ian", "in", "iang", "ing", "iong", "ua", "uo", "uai", "ui", "uan",
+    "un", "uang", "ueng", "ue", "ve", "van", "vn", "n", "ng", "ir", "i0", "iou", "uei", "uen",
+)
+_ARPABET_VOWELS = ("AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW")
+_ARPABET_CONSONANTS = (
+    "B", "CH", "D", "DH", "F", "G", "HH", "JH", "K", "L", "M", "N", "NG", "P", "R", "S", "SH",
+    "T", "TH", "V", "W", "Y", "Z", "ZH",
+)
+
+
+def _build_symbols() -> tuple[str, ...]:
+    # 固定符号表：ID 只由代码决定，持久化的缓存在重启后仍然有效。
+    symbols = ["_pad", "_unk", " ", *_PUNCT, *_INITIALS, *_ZERO_INITIALS.values()]
+    symbols += [f"{final}{tone}" for final in _FINALS for tone in range(1, 6)]
+    symbols += [f"{vowel}{stress}" for vowel in _ARPABET_VOWELS for stress in range(3)]
+    symbols += list(_ARPABET_CONSONANTS)
+    symbols += [f"EN_{ch}" for ch in "abcdefghijklmnopqrstuvwxyz"]
+    return tuple(symbols)
+
+
+SYMBOLS = _build_symbols()
+# GPT-SoVITS 的符号表里没有的写法按此改名后再查；仍查不到的记为 UNK。
+_SYMBOL_ALIASES = {"_unk": "UNK", "_pad": "_", " ": "SP", ";": ",", ":": ","}
+
+
+class SymbolTable:
+    """Phoneme symbol -> ID, where an ID is the symbol's position in ``symbols``."""
+
+    def __init__(self, symbols, source: str):
+        self.symbols = tuple(symbols)
+        self.source = source
+        self._ids = {s: i for i, s in enumerate(self.symbols)}
+        self.unk_id = next((self._ids[s] for s in ("_unk", "UNK") if s in self._ids), 0)
+        self.digest = hashlib.sha256("\n".join(self.symbols).encode("utf-8")).hexdigest()[:16]
+
+    def id(self, symbol: str) -> int:
+        found = self._ids.get(symbol)
+        if found is None:
+            found = self._ids.get(_SYMBOL_ALIASES.get(symbol, ""), self.unk_id)
+        return found
+
+    def ids(self, symbols: list[str]) -> list[int]:
+        return [self.id(s) for s in symbols]
+
+
+BUILTIN_SYMBOLS = SymbolTable(SYMBOLS, "builtin")
+
+
+def load_sovits_symbols(model_dir: Path) -> Optional[SymbolTable]:
+    """The ``symbols`` list of a GPT-SoVITS checkout (v2 table first), so IDs match its text embedding."""
+    for name in ("symbols2.py", "symbols.py"):
+        path = model_dir / "GPT_SoVITS" / "text" / name
+        if not path.is_file():
+            continue
+        try:
+            symbols = runpy.run_path(str(path)).get("symbols")
+        except Exception:
+            continue
+        if isinstance(symbols, (list, tuple)) and symbols:
+            return SymbolTable([str(s) for s in symbols], f"gpt-sovits:{name}")
+    return None
+
+_PUNCT_MAP = {
+    "。": ".", "．": ".", "！": "!", "？": "?", "，": ",", "、": ",", "；": ";", "：": ":",
+    "～": "-", "~": "-", "—": "-", "–": "-", "·": " ", "⋯": "…",
+}
+_DROP = set("\"'“”‘’「」『』《》〈〉（）()[]【】{}<>*#_`|\\/^")
+_ZH_DIGITS = "零一二三四五六七八九"
+_EN_DIGITS = ("zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine")
+_EN_TEENS = ("ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen")
+_EN_TENS = ("", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety")
+_EN_SCALES = ("", "thousand", "million", "billion")
+# 负号只认不紧跟字母数字的 "-"；紧跟字母的 "-" 是连字符（如 a-1），与数字一起吃掉，不留停顿。
+# 整数部分允许千分位逗号（1,000）；逗号后不是恰好三位数字时仍按停顿处理。
+_NUMBER_RE = re.compile(
+    r"(?:((?<![0-9A-Za-z])-)|(?<=[A-Za-z])-)?(\d{1,3}(?:,\d{3})+(?!\d)|\d+)(\.\d+)?(%?)(年?)"
+)
+_TIME_RE = re.compile(r"(?<![\d:])([01]?\d|2[0-3]):([0-5]\d)(?::([0-5]\d))?(?![\d:])")
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_RUN_RE = re.compile(r"([㐀-䶿一-鿿豈-﫿]+)|([a-z]+)|([,.!?;:\-…])|(\s+)")
+_SENTENCE_END = ".!?;…\n"
+
+
+def _four_digits_zh(n: int) -> str:
+    out = ""
+    pending_zero = False
+    for power, unit in ((3, "千"), (2, "百"), (1, "十"), (0, "")):
+        digit = n // 10**power % 10
+        if digit == 0:
+            pending_zero = bool(out)
+            continue
+        if pending_zero:
+            out += "零"
+            pending_zero = False
+        out += _ZH_DIGITS[digit] + unit
+    return out
+
+
+def int_to_zh(n: int) -> str:
+    if n == 0:
+        return "零"
+    if n >= 10**12:
+        return "".join(_ZH_DIGITS[int(d)] for d in str(n))
+    groups = []
+    while n:
+        groups.append(n % 10000)
+        n //= 10000
+    out = ""
+    pending_zero = False
+    for idx in range(len(groups) - 1, -1, -1):
+        group = groups[idx]
+        if group == 0:
+            pending_zero = bool(out)
+            continue
+        if out and (pending_zero or group < 1000):
+            out += "零"
+        out += _four_digits_zh(group) + ("", "万", "亿")[idx]
+        pending_zero = False
+    # 10~19 读作“十X”而不是“一十X”。
+    return out[1:] if out.startswith("一十") else out
+
+
+def _three_digits_en(n: int) -> list[str]:
+    words = []
+    if n >= 100:
+        words += [_EN_DIGITS[n // 100], "hundred"]
+        n %= 100
+    if n >= 20:
+        words.append(_EN_TENS[n // 10])
+        n %= 10
+        if n:
+            words.append(_EN_DIGITS[n])
+    elif n >= 10:
+        words.append(_EN_TEENS[n - 10])
+    elif n:
+        words.append(_EN_DIGITS[n])
+    return words
+
+
+def int_to_en(n: int) -> str:
+    # 不写成 twenty-four：连字符在后面会被当作停顿标点。
+    if n == 0:
+        return "zero"
+    if n >= 10**12:
+        return " ".join(_EN_DIGITS[int(d)] for d in str(n))
+    words: list[str] = []
+    for idx in range(len(_EN_SCALES) - 1, -1, -1):
+        group = n // 1000**idx % 1000
+        if group:
+            words += _three_digits_en(group)
+            if idx:
+                words.append(_EN_SCALES[idx])
+    return " ".join(words)
+
+
+def _read_time(match: re.Match, zh: bool) -> str:
+    hour, minute, second = (int(g) if g else None for g in match.groups())
+    if zh:
+        text = ("两" if hour == 2 else int_to_zh(hour)) + "点"
+        if minute or second:
+            text += ("零" if minute < 10 else "") + int_to_zh(minute) + "分"
+        if second:
+            text += ("零" if second < 10 else "") + int_to_zh(second) + "秒"
+        return text
+    words = [int_to_en(hour)]
+    if minute == 0:
+        words.append("o'clock")
+    else:
+        words += (["oh"] if minute < 10 else []) + [int_to_en(minute)]
+    if second:
+        words += ["and", int_to_en(second), "second" if second == 1 else "seconds"]
+    return " " + " ".join(words) + " "
+
+
+def _read_number(match: re.Match, zh: bool) -> str:
+    sign, integer, fraction, percent, year = match.groups()
+    integer = integer.replace(",", "")
+    if not zh:
+        if len(integer) > 1 and integer[0] == "0":
+            words = [_EN_DIGITS[int(d)] for d in integer]
+        else:
+            words = [int_to_en(int(integer))]
+        if fraction:
+            words += ["point", *(_EN_DIGITS[int(d)] for d in fraction[1:])]
+        if percent:
+            words.append("percent")
+        return (" minus " if sign else " ") + " ".join(words) + " " + year
+    if (year and len(integer) == 4 and not fraction and not percent) or (len(integer) > 1 and integer[0] == "0"):
+        # 年份与前导零编号（如 2024年、007）逐位读。
+        text = "".join(_ZH_DIGITS[int(d)] for d in integer)
+    else:
+        text = int_to_zh(int(integer))
+    if fraction:
+        text += "点" + "".join(_ZH_DIGITS[int(d)] for d in fraction[1:])
+    if percent:
+        text = "百分之" + text
+    return ("负" if sign else "") + text + year
+
+
+def normalize(text: str) -> str:
+    """NFKC, canonical punctuation, numbers read out (Chinese when the text has CJK), lowercase Latin."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = "".join(_PUNCT_MAP.get(ch, ch) for ch in text)
+    text = "".join(" " if ch in _DROP else ch for ch in text)
+    text = text.replace("...", "…")
+    zh = bool(_CJK_RE.search(text))
+    text = _TIME_RE.sub(lambda m: _read_time(m, zh), text)
+    text = _NUMBER_RE.sub(lambda m: _read_number(m, zh), text)
+    text = re.sub(r"[ \t\r\f\v]+", " ", text.lower())
+    return text.strip()
+
+
+def segment(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> list[str]:
+    """Split normalized text at sentence ends, then cut long sentences at commas/spaces."""
+    sentences: list[str] = []
+    current = ""
+    for ch in text:
+        current += ch
+        if ch in _SENTENCE_END:
+            sentences.append(current)
+            current = ""
+    sentences.append(current)
+    out: list[str] = []
+    for sentence in sentences:
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = max(sentence.rfind(",", 0, max_chars), sentence.rfind(" ", 0, max_chars))
+            cut = cut + 1 if cut > 0 else max_chars
+            out.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            out.append(sentence)
+    return out
+
+
+def _split_syllable(syllable: str) -> list[str]:
+    """TONE3 pinyin -> [initial, toned final], spelled the way GPT-SoVITS' Chinese G2P spells them."""
+    tone = syllable[-1] if syllable[-1:].isdigit() else "5"
+    body = syllable[:-1] if syllable[-1:].isdigit() else syllable
+    for initial in _INITIALS:
+        if body.startswith(initial) and len(body) > len(initial):
+            final = body[len(initial):]
+            if final == "i" and initial in ("zh", "ch", "sh", "r"):
+                final = "ir"
+            elif final == "i" and initial in ("z", "c", "s"):
+                final = "i0"
+            elif initial in ("j", "q", "x", "y") and final.startswith("u"):
+                final = "v" + final[1:]
+            elif initial not in ("y", "w"):
+                final = {"iu": "iou", "ui": "uei", "un": "uen"}.get(final, final)
+            return [initial, f"{final}{tone}"]
+    return [_ZERO_INITIALS.get(body[:1], "AA"), f"{body}{tone}"]
+
+
+class G2P:
+    """Chinese via pypinyin (initial + toned final), English via g2p_en; both optional.
+
+    IDs come from ``table``: the GPT-SoVITS symbol list when the model checkout
+    provides one, otherwise the built-in table.
+    """
+
+    def __init__(self, table: SymbolTable = BUILTIN_SYMBOLS):
+        self.table = table
+        self.warnings: list[str] = []
+        backends = []
+        try:
+            from pypinyin import Style, lazy_pinyin  # type: ignore
+
+            self._pinyin: Optional[Callable[[str], list[str]]] = lambda run: lazy_pinyin(
+                run, style=Style.TONE3, neutral_tone_with_five=True, errors=lambda chars: ["_unk"] * len(chars)
+            )
+            backends.append("pypinyin")
+        except Exception as exc:
+            self._pinyin = None
+            self.warnings.append(f"pypinyin_unavailable:{exc}")
+        try:
+            from g2p_en import G2p  # type: ignore
+
+            self._english: Optional[Callable[[str], list[str]]] = G2p()
+            backends.append("g2p_en")
+        except Exception:
+            # 没有 g2p_en 时按字母拼读，仍保证每个词有稳定的符号序列。
+            self._english = None
+        # 缓存命名空间：装上 pypinyin 后，之前退化为 _unk 的缓存条目不能继续沿用。
+        self.backend = "+".join(backends) or "fallback"
+
+    def phonemes(self, text: str) -> list[str]:
+        out: list[str] = []
+        for cjk, latin, punct, space in _RUN_RE.findall(text):
+            if cjk:
+                if self._pinyin is None:
+                    out += ["_unk"] * len(cjk)
+                    continue
+                for syllable in self._pinyin(cjk):
+                    out += ["_unk"] if syllable == "_unk" else _split_syllable(syllable)
+            elif latin:
+                if self._english is not None:
+                    out += [p for p in self._english(latin) if p.strip()]
+                else:
+                    out += [f"EN_{ch}" for ch in latin]
+            elif punct:
+                out.append(punct)
+            elif space and out and out[-1] != " ":
+                out.append(" ")
+        return out
+
+    def __call__(self, text: str) -> list[int]:
+        return self.table.ids(self.phonemes(text))
+
+
+class FrontendCache:
+    """LRU of normalized segment -> phoneme IDs, persisted as JSON between runs.
+
+    Entries are only valid for the symbol table and G2P backends they were
+    produced with, so the file records both and is ignored when they differ.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        path: Optional[Path] = None,
+        backend: str = "",
+        table: SymbolTable = BUILTIN_SYMBOLS,
+    ):
+        self.capacity = max(0, capacity)
+        self.path = path
+        self.namespace = f"{table.digest}:{backend}"
+        self.entries: OrderedDict[str, list[int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def _read_file(self) -> list[tuple[str, list[int]]]:
+        if self.path is None:
+            return []
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return []
+        if not isinstance(raw, dict) or raw.get("version") != FRONTEND_VERSION:
+            return []
+        if raw.get("namespace") != self.namespace:
+            return []
+        return [(str(k), [int(i) for i in v]) for k, v in raw.get("entries", [])]
+
+    def load(self) -> int:
+        if self.capacity == 0:
+            return 0
+        with self._lock:
+            for key, ids in self._read_file()[-self.capacity:]:
+                self.entries[key] = ids
+            return len(self.entries)
+
+    def save(self) -> bool:
+        """Merge with whatever another process wrote meanwhile; our entries count as most recent."""
+        if self.path is None or not self.dirty or self.capacity == 0:
+            return False
+        with self._lock:
+            merged: OrderedDict[str, list[int]] = OrderedDict(self._read_file())
+            for key, ids in self.entries.items():
+                merged.pop(key, None)
+                merged[key] = ids
+            rows = list(merged.items())[-self.capacity:]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                tmp.write_text(
+                    json.dumps(
+                        {"version": FRONTEND_VERSION, "namespace": self.namespace, "entries": rows},
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    ),
+                    encoding="utf-8",
+                )
+                os.replace(tmp, self.path)
+            except OSError:
+                return False
+            self.dirty = False
+            return True
+
+    def get(self, key: str) -> Optional[list[int]]:
+        with self._lock:
+            ids = self.entries.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def put(self, key: str, ids: list[int]):
+        if self.capacity == 0:
+            return
+        with self._lock:
+            self.entries[key] = ids
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+@dataclass
+class FrontendSegment:
+    text: str
+    phoneme_ids: list[int]
+    cached: bool
+
+
+class TextFrontend:
+    """normalize -> segment -> G2P, with G2P results cached per normalized segment."""
+
+    def __init__(self, cache: FrontendCache, g2p: Callable[[str], list[int]]):
+        self.cache = cache
+        self.g2p = g2p
+        self.frontend_ms = 0.0
+
+    def process(self, text: str) -> list[FrontendSegment]:
+        t0 = time.perf_counter()
+        out: list[FrontendSegment] = []
+        for seg in segment(normalize(text)):
+            ids = self.cache.get(seg)
+            cached = ids is not None
+            if ids is None:
+                ids = self.g2p(seg)
+                self.cache.put(seg, ids)
+            out.append(FrontendSegment(seg, ids, cached))
+        self.frontend_ms += (time.perf_counter() - t0) * 1000.0
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.cache.stats(), "frontend_ms": round(self.frontend_ms, 2)}
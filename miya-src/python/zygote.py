@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+import argparse
+import atexit
+import importlib
+import json
+import os
+import runpy
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+from path_layout import zygote_socket_path
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+# 只预导入模块本身，绝不触碰 torch.cuda：父进程一旦初始化 CUDA，fork 出的子进程就无法再用 GPU。
+DEFAULT_PRELOAD = "torch,diffusers,transformers,peft,safetensors,numpy,PIL.Image"
+_HEADER = struct.Struct("!I")
+_MAX_REQUEST_BYTES = 4 * 1024 * 1024
+
+
+def _emit(payload: dict):
+    # 服务端不能用带写线程的 EventEmitter：fork 前进程里不应有其它线程。
+    try:
+        sys.stdout.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        raise SystemExit(86)
+
+
+def supported() -> bool:
+    return sys.platform.startswith("linux") and hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+
+def _resolve_script(script: str, allow_any: bool = False) -> Path:
+    path = Path(script)
+    if not path.is_absolute():
+        path = SCRIPT_DIR / path
+    path = path.resolve()
+    if not allow_any and path.parent != SCRIPT_DIR:
+        raise ValueError(f"script_outside_python_dir:{script}")
+    if not path.is_file():
+        raise ValueError(f"script_not_found:{script}")
+    return path
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = conn.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError("zygote_connection_closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_line(conn: socket.socket, payload: dict):
+    try:
+        conn.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+    except OSError:
+        pass
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def preload(modules: list[str]) -> dict[str, object]:
+    loaded: list[str] = []
+    failed: dict[str, str] = {}
+    t0 = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as exc:
+            failed[name] = str(exc)
+    return {"loaded": loaded, "failed": failed, "import_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+
+
+def _run_child(request: dict, fds: list[int]):
+    """Runs in the forked child; never returns."""
+    code = 1
+    try:
+        # 父进程（含预导入模块）注册的 atexit 回调属于父进程，子进程退出时不能再跑一遍。
+        atexit._clear()
+        os.setpgid(0, 0)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        for target, fd in zip((0, 1, 2), fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+        os.chdir(request.get("cwd") or "/")
+        os.environ.clear()
+        os.environ.update({str(k): str(v) for k, v in (request.get("env") or {}).items()})
+        script = request["script"]
+        sys.argv = [script, *[str(a) for a in request.get("argv") or []]]
+        sys.path[0] = str(Path(script).parent)
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            atexit._run_exitfuncs()
+        except Exception:
+            pass
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code & 0xFF)
+
+
+class ZygoteServer:
+    """Single-threaded accept/fork/reap loop (no threads, so fork stays safe)."""
+
+    def __init__(self, socket_path: Path, allow_any: bool = False, watch_stdin: bool = False):
+        self.socket_path = socket_path
+        self.allow_any = allow_any
+        self.watch_stdin = watch_stdin
+        self.selector = selectors.DefaultSelector()
+        self.children: dict[int, socket.socket] = {}
+        self.conn_child: dict[socket.socket, int] = {}
+        self.launched = 0
+        self._stop = False
+        self._listener: Optional[socket.socket] = None
+        self._wake_r, self._wake_w = socket.socketpair()
+
+    def _bind(self):
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(16)
+        self._listener = listener
+        self.selector.register(listener, selectors.EVENT_READ, "accept")
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        if self.watch_stdin:
+            # 启动方持有 stdin 管道：管道关闭即父进程已退出，常驻进程随之结束。
+            self.selector.register(sys.stdin.fileno(), selectors.EVENT_READ, "parent")
+        signal.set_wakeup_fd(self._wake_w.fileno())
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+    def _request_stop(self, *_):
+        self._stop = True
+
+    def _accept(self):
+        conn, _ = self._listener.accept()
+        fds: list[int] = []
+        try:
+            conn.settimeout(5.0)
+            data, fds, _, _ = socket.recv_fds(conn, _HEADER.size, 3)
+            if len(data) < _HEADER.size:
+                data += _recv_exact(conn, _HEADER.size - len(data))
+            (size,) = _HEADER.unpack(data)
+            if size > _MAX_REQUEST_BYTES or len(fds) != 3:
+                raise ValueError("invalid_request")
+            request = json.loads(_recv_exact(conn, size).decode("utf-8"))
+            request["script"] = str(_resolve_script(str(request.get("script", "")), self.allow_any))
+        except Exception as exc:
+            _send_line(conn, {"error": str(exc)})
+            conn.close()
+            for fd in fds:
+                os.close(fd)
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            signal.set_wakeup_fd(-1)
+            self.selector.close()
+            self._listener.close()
+            conn.close()
+            self._wake_r.close()
+            self._wake_w.close()
+            for other in list(self.conn_child):
+                other.close()
+            _run_child(request, fds)
+        for fd in fds:
+            os.close(fd)
+        conn.settimeout(None)
+        self.children[pid] = conn
+        self.conn_child[conn] = pid
+        self.launched += 1
+        self.selector.register(conn, selectors.EVENT_READ, "client")
+        _send_line(conn, {"pid": pid})
+
+    def _client_message(self, conn: socket.socket):
+        pid = self.conn_child.get(conn)
+        try:
+            data = conn.recv(4096)
+        except OSError:
+            data = b""
+        if not data:
+            # 客户端断开（父进程已不在），子进程也不应继续占用资源。
+            self.selector.unregister(conn)
+            if pid is not None:
+                self._signal_child(pid, signal.SIGTERM)
+            return
+        for line in data.splitlines():
+            try:
+                sig = int(json.loads(line).get("signal", 0))
+            except (ValueError, AttributeError):
+                continue
+            if pid is not None and sig > 0:
+                self._signal_child(pid, sig)
+
+    def _signal_child(self, pid: int, sig: int):
+        try:
+            os.killpg(pid, sig)
+        except OSError:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self.children.pop(pid, None)
+            if conn is None:
+                continue
+            self.conn_child.pop(conn, None)
+            _send_line(conn, {"exit_code": _exit_code(status)})
+            try:
+                self.selector.unregister(conn)
+            except (KeyError, ValueError):
+                pass
+            conn.close()
+
+    def serve_forever(self):
+        self._bind()
+        try:
+            while not self._stop:
+                for key, _ in self.selector.select(timeout=1.0):
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        try:
+                            while self._wake_r.recv(512):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif key.data == "client":
+                        self._client_message(key.fileobj)
+                    elif key.data == "parent":
+                        if not os.read(key.fd, 4096):
+                            self._stop = True
+                self._reap()
+        finally:
+            for pid in list(self.children):
+                self._signal_child(pid, signal.SIGTERM)
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _exec_direct(script: Path, argv: list[str]):
+    os.execv(sys.executable, [sys.executable, str(script), *argv])
+
+
+def run_client(socket_path: Path, script: str, argv: list[str]) -> int:
+    script_path = _resolve_script(script, allow_any=True)
+    if not supported():
+        _exec_direct(script_path, argv)
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(socket_path))
+    except OSError:
+        conn.close()
+        _exec_direct(script_path, argv)
+
+    payload = json.dumps(
+        {"script": str(script_path), "argv": argv, "env": dict(os.environ), "cwd": os.getcwd()}
+    ).encode("utf-8")
+    socket.send_fds(conn, [_HEADER.pack(len(payload))], [0, 1, 2])
+    conn.sendall(payload)
+
+    def relay(signum, _frame):
+        _send_line(conn, {"signal": int(signum)})
+
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, relay)
+
+    reader = conn.makefile("rb")
+    while True:
+        try:
+            line = reader.readline()
+        except InterruptedError:
+            continue
+        if not line:
+            print("zygote_connection_lost", file=sys.stderr)
+            return 1
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if "error" in msg:
+            print(f"zygote_rejected:{msg['error']}", file=sys.stderr)
+            return 2
+        if "exit_code" in msg:
+            return int(msg["exit_code"])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description=(
+            "Miya pre-forked Python job launcher (Linux): `serve` keeps heavy modules imported and "
+            "forks one child per job; `run` hands its argv/env/cwd/stdio to that child and exits "
+            "with its code, or runs the script directly when no server is listening."
+        )
+    )
+    p.add_argument("--socket", default=str(zygote_socket_path()))
+    sub = p.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="start the warm parent")
+    serve.add_argument("--preload", default=os.getenv("MIYA_ZYGOTE_PRELOAD", DEFAULT_PRELOAD))
+    serve.add_argument("--allow-any-script", action="store_true")
+    serve.add_argument("--exit-with-parent", action="store_true", help="stop when stdin reaches EOF")
+    run = sub.add_parser("run", help="run a script through the warm parent")
+    run.add_argument("script")
+    run.add_argument("args", nargs=argparse.REMAINDER)
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    socket_path = Path(args.socket)
+    if args.command == "run":
+        try:
+            return run_client(socket_path, args.script, args.args)
+        except ValueError as exc:
+            print(str(exc), file=sys.stderr)
+            return 2
+
+    if not supported():
+        _emit({"event": "error", "message": "zygote_requires_linux_fork_and_send_fds"})
+        return 2
+    stats = preload([m.strip() for m in args.preload.split(",") if m.strip()])
+    server = ZygoteServer(socket_path, allow_any=args.allow_any_script, watch_stdin=args.exit_with_parent)
+    _emit({"event": "ready", "socket": str(socket_path), "pid": os.getpid(), **stats})
+    server.serve_forever()
+    _emit({"event": "done", "status": "ok", "launched": server.launched})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,11 +35,13 @@ export class MiyaClient {
     profileDir: string;
     references: string[];
     size: string;
+    outputFormat?: 'png' | 'webp' | 'jpeg';
   }): Promise<{
     outputPath: string;
     tier: 'lora' | 'embedding' | 'reference';
     degraded: boolean;
     message: string;
+    format?: 'png' | 'webp' | 'jpeg';
   }> {
     return daemonInvoke(
       this.projectDir,
@@ -51,6 +53,7 @@ export class MiyaClient {
       tier: 'lora' | 'embedding' | 'reference';
       degraded: boolean;
       message: string;
+      format?: 'png' | 'webp' | 'jpeg';
     }>;
   }
 
@@ -148,6 +151,19 @@ export class MiyaClient {
     return daemonInvoke(this.projectDir, 'daemon.model.locks.get', {}, 15_000);
   }
 
+  async getFluxHostStats(): Promise<unknown> {
+    return daemonInvoke(this.projectDir, 'daemon.flux.host.stats', {}, 20_000);
+  }
+
+  async unloadFluxModel(modelDir?: string): Promise<unknown> {
+    return daemonInvoke(
+      this.projectDir,
+      'daemon.flux.host.unload',
+      modelDir ? { modelDir } : {},
+      20_000,
+    );
+  }
+
   async getModelUpdatePlan(target?: string): Promise<unknown> {
     return daemonInvoke(
       this.projectDir,
@@ -0,0 +1,80 @@
+import * as fs from 'node:fs';
+import * as os from 'node:os';
+import * as path from 'node:path';
+import { describe, expect, test } from 'vitest';
+import { FluxWorker } from './flux-worker';
+
+// 按 infer_flux.py --worker 的协议应答：任务行回 job_start + result，stats/unload 回对应事件。
+const FAKE_WORKER = `
+const readline = require('node:readline');
+const emit = (payload) => process.stdout.write(JSON.stringify(payload) + '\\n');
+emit({ event: 'ready' });
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  const req = JSON.parse(line);
+  if (req.cmd === 'stats') return emit({ event: 'stats', id: req.id, models: [], pid: process.pid });
+  if (req.cmd === 'unload') return emit({ event: 'unload_done', id: req.id, unloaded: 1 });
+  if (req.cmd === 'cancel') return;
+  if (req.prompt === 'crash') process.exit(3);
+  emit({ event: 'job_start', id: req.id });
+  emit({ event: 'result', id: req.id, status: 'ok', format: req.output_format });
+});
+`;
+
+function fakeWorker(): FluxWorker {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'miya-flux-worker-'));
+  const scriptPath = path.join(dir, 'worker.js');
+  fs.writeFileSync(scriptPath, FAKE_WORKER, 'utf-8');
+  return new FluxWorker({
+    pythonPath: process.execPath,
+    scriptPath,
+    cwd: dir,
+    env: {},
+  });
+}
+
+function job(id: string, prompt = 'cat') {
+  return {
+    id,
+    prompt,
+    outputPath: `/tmp/${id}.webp`,
+    size: '512x512',
+    outputFormat: 'webp' as const,
+    tier: 'lora',
+  };
+}
+
+describe('flux worker', () => {
+  test('serves several jobs from one process', async () => {
+    const worker = fakeWorker();
+    const seen: string[] = [];
+    const first = await worker.generate(job('a'), (event) =>
+      seen.push(String(event.event)),
+    );
+    const stats = await worker.stats();
+    const second = await worker.generate(job('b'));
+    const statsAgain = await worker.stats();
+    worker.stop();
+
+    expect(first).toMatchObject({ event: 'result', id: 'a', format: 'webp' });
+    expect(second).toMatchObject({ event: 'result', id: 'b' });
+    expect(seen).toEqual(['job_start', 'result']);
+    expect(stats?.pid).toBe(statsAgain?.pid);
+  });
+
+  test('rejects pending jobs when the process exits and restarts on demand', async () => {
+    const worker = fakeWorker();
+    await expect(worker.generate(job('x', 'crash'))).rejects.toThrow(
+      'flux_worker_exited:3',
+    );
+    expect(worker.running).toBe(false);
+    expect(await worker.stats()).toBeNull();
+    const again = await worker.generate(job('y'));
+    expect(again).toMatchObject({ event: 'result', id: 'y' });
+    expect(await worker.unload('/models/flux')).toMatchObject({
+      event: 'unload_done',
+      unloaded: 1,
+    });
+    worker.stop();
+    expect(worker.running).toBe(false);
+  });
+});
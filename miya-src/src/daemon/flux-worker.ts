@@ -0,0 +1,176 @@
+import { type ChildProcess, spawn } from 'node:child_process';
+
+export interface FluxWorkerEvent {
+  event?: string;
+  id?: string | number | null;
+  [key: string]: unknown;
+}
+
+export interface FluxWorkerJob {
+  id: string;
+  prompt: string;
+  outputPath: string;
+  size: string;
+  outputFormat: 'png' | 'webp' | 'jpeg';
+  tier: string;
+  loraPath?: string;
+}
+
+interface PendingRequest {
+  resolve: (event: FluxWorkerEvent) => void;
+  reject: (error: Error) => void;
+  onEvent?: (event: FluxWorkerEvent) => void;
+}
+
+// 带 id 的这些事件结束一次请求；其余带 id 的事件（如 job_start）只转给 onEvent。
+const TERMINAL_EVENTS = new Set([
+  'result',
+  'request_error',
+  'job_canceled',
+  'stats',
+  'unload_done',
+]);
+
+// 常驻的 infer_flux.py --worker 进程：管线在多次生成之间保持加载，
+// 由 worker 内的 ModelHost 按显存/内存预算做 LRU 淘汰。进程退出后下次请求自动重启。
+export class FluxWorker {
+  private child: ChildProcess | null = null;
+  private stdoutBuffer = '';
+  private stderrTail = '';
+  private readonly pending = new Map<string, PendingRequest>();
+  private nextControlID = 0;
+
+  constructor(
+    private readonly options: {
+      pythonPath: string;
+      scriptPath: string;
+      cwd: string;
+      env: Record<string, string>;
+    },
+  ) {}
+
+  get running(): boolean {
+    return this.child !== null;
+  }
+
+  private ensureStarted(): ChildProcess {
+    if (this.child) return this.child;
+    const child = spawn(
+      this.options.pythonPath,
+      [this.options.scriptPath, '--worker'],
+      {
+        cwd: this.options.cwd,
+        env: { ...process.env, ...this.options.env },
+        stdio: ['pipe', 'pipe', 'pipe'],
+      },
+    );
+    this.stdoutBuffer = '';
+    this.stderrTail = '';
+    child.stdout?.on('data', (chunk) => {
+      this.stdoutBuffer += chunk.toString();
+      const lines = this.stdoutBuffer.split(/\r?\n/);
+      this.stdoutBuffer = lines.pop() ?? '';
+      for (const line of lines) this.handleLine(line);
+    });
+    child.stderr?.on('data', (chunk) => {
+      this.stderrTail = `${this.stderrTail}${chunk.toString()}`.slice(-2000);
+    });
+    const onGone = (reason: string) => {
+      if (this.child !== child) return;
+      this.child = null;
+      this.rejectPending(
+        `flux_worker_exited:${reason}${this.stderrTail ? `:${this.stderrTail.trim()}` : ''}`,
+      );
+    };
+    child.on('error', (error) => onGone(error.message));
+    child.on('exit', (code, signal) => onGone(String(code ?? signal)));
+    // 父进程写入时 worker 已退出会触发 EPIPE；退出本身由 exit 事件处理。
+    child.stdin?.on('error', () => {});
+    this.child = child;
+    return child;
+  }
+
+  private rejectPending(message: string): void {
+    const error = new Error(message);
+    const pending = [...this.pending.values()];
+    this.pending.clear();
+    for (const request of pending) request.reject(error);
+  }
+
+  private handleLine(line: string): void {
+    let parsed: FluxWorkerEvent;
+    try {
+      parsed = JSON.parse(line) as FluxWorkerEvent;
+    } catch {
+      return;
+    }
+    if (!parsed || parsed.id === undefined || parsed.id === null) return;
+    const id = String(parsed.id);
+    const request = this.pending.get(id);
+    if (!request) return;
+    request.onEvent?.(parsed);
+    if (!TERMINAL_EVENTS.has(String(parsed.event ?? ''))) return;
+    this.pending.delete(id);
+    request.resolve(parsed);
+  }
+
+  private send(
+    id: string,
+    payload: Record<string, unknown>,
+    onEvent?: (event: FluxWorkerEvent) => void,
+  ): Promise<FluxWorkerEvent> {
+    const child = this.ensureStarted();
+    return new Promise<FluxWorkerEvent>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject, onEvent });
+      child.stdin?.write(`${JSON.stringify({ ...payload, id })}\n`);
+    });
+  }
+
+  generate(
+    job: FluxWorkerJob,
+    onEvent?: (event: FluxWorkerEvent) => void,
+  ): Promise<FluxWorkerEvent> {
+    return this.send(
+      job.id,
+      {
+        prompt: job.prompt,
+        output_path: job.outputPath,
+        size: job.size,
+        output_format: job.outputFormat,
+        tier: job.tier,
+        lora_path: job.loraPath,
+      },
+      onEvent,
+    );
+  }
+
+  cancel(id: string): void {
+    this.child?.stdin?.write(`${JSON.stringify({ cmd: 'cancel', id })}\n`);
+  }
+
+  async stats(): Promise<FluxWorkerEvent | null> {
+    if (!this.child) return null;
+    this.nextControlID += 1;
+    return this.send(`stats-${this.nextControlID}`, { cmd: 'stats' });
+  }
+
+  async unload(modelDir: string): Promise<FluxWorkerEvent | null> {
+    if (!this.child) return null;
+    this.nextControlID += 1;
+    return this.send(`unload-${this.nextControlID}`, {
+      cmd: 'unload',
+      model_dir: modelDir,
+    });
+  }
+
+  stop(): void {
+    const child = this.child;
+    if (!child) return;
+    // 立即脱钩，之后的请求会另起新进程，不会写进正在退出的旧进程。
+    this.child = null;
+    this.rejectPending('flux_worker_stopped');
+    // stdin EOF 让 worker 中止当前任务并释放显存；SIGTERM 兜底。
+    child.stdin?.end();
+    child.kill('SIGTERM');
+  }
+}
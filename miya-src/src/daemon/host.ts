@@ -865,6 +865,48 @@ const server = serveWithNode({
         return;
       }
 
+      if (
+        frame.method === 'daemon.flux.host.stats' ||
+        frame.method === 'daemon.flux.host.unload'
+      ) {
+        try {
+          const result =
+            frame.method === 'daemon.flux.host.stats'
+              ? await daemonService.getFluxHostStats()
+              : await daemonService.unloadFluxModel(
+                  typeof params.modelDir === 'string' && params.modelDir.trim()
+                    ? params.modelDir.trim()
+                    : undefined,
+                );
+          ws.send(
+            JSON.stringify(
+              DaemonResponseFrameSchema.parse({
+                type: 'response',
+                id: frame.id,
+                ok: true,
+                result,
+              }),
+            ),
+          );
+        } catch (error) {
+          ws.send(
+            JSON.stringify(
+              DaemonResponseFrameSchema.parse({
+                type: 'response',
+                id: frame.id,
+                ok: false,
+                error: {
+                  code: 'flux_host_failed',
+                  message:
+                    error instanceof Error ? error.message : String(error),
+                },
+              }),
+            ),
+          );
+        }
+        return;
+      }
+
       if (frame.method === 'daemon.flux.generate') {
         try {
           const result = await daemonService.runFluxImageGenerate({
@@ -875,6 +917,10 @@ const server = serveWithNode({
               ? params.references.map(String)
               : [],
             size: String(params.size ?? '1024x1024'),
+            outputFormat:
+              params.outputFormat === 'webp' || params.outputFormat === 'jpeg'
+                ? params.outputFormat
+                : 'png',
           });
           ws.send(
             JSON.stringify(
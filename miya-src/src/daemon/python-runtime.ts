@@ -43,6 +43,19 @@ export interface PythonRuntimeBootstrapState {
   lastError?: string;
 }
 
+export interface CapabilityProfile {
+  version: number;
+  measuredAt: string;
+  gpu_matmul?: { gflops?: number; error?: string } | null;
+  vram_total_mb?: number | null;
+  timeout_scale?: {
+    gpu?: number | null;
+  };
+}
+
+// 与 check_env.py run_bench 写出的 version 一致；版本不符时重新测。
+const CAPABILITY_PROFILE_VERSION = 1;
+
 export interface PythonRuntimeStatus {
   ready: boolean;
   venvPath: string;
@@ -66,6 +79,10 @@ function statusFile(projectDir: string): string {
   return path.join(daemonDir(projectDir), 'python-runtime.json');
 }
 
+function capabilityProfileFile(projectDir: string): string {
+  return path.join(daemonDir(projectDir), 'capability-profile.json');
+}
+
 function writeStatus(projectDir: string, status: PythonRuntimeStatus): void {
   fs.mkdirSync(path.dirname(statusFile(projectDir)), { recursive: true });
   fs.writeFileSync(
@@ -201,7 +218,13 @@ function runCheckEnv(
   if (!fs.existsSync(script)) {
     return { ok: false, issues: ['check_env_script_missing'] };
   }
-  const result = run(pythonPath, [script], projectDir, 120_000);
+  // 能力档案由这里在引导阶段生成：缺失或版本过旧时顺带跑一次 --bench，多给测速留时间。
+  const bench =
+    readCapabilityProfile(projectDir)?.version !== CAPABILITY_PROFILE_VERSION;
+  const args = bench
+    ? [script, '--bench', '--bench-output', capabilityProfileFile(projectDir)]
+    : [script];
+  const result = run(pythonPath, args, projectDir, bench ? 300_000 : 120_000);
   if (!result.ok) {
     return { ok: false, issues: ['check_env_run_failed'] };
   }
@@ -361,6 +384,34 @@ export function readPythonRuntimeStatus(
   return readStatus(projectDir);
 }
 
+export function readCapabilityProfile(
+  projectDir: string,
+): CapabilityProfile | null {
+  const file = capabilityProfileFile(projectDir);
+  if (!fs.existsSync(file)) return null;
+  try {
+    const parsed = JSON.parse(
+      fs.readFileSync(file, 'utf-8'),
+    ) as CapabilityProfile;
+    if (!parsed || typeof parsed !== 'object') return null;
+    return parsed;
+  } catch {
+    return null;
+  }
+}
+
+export function scaleTimeoutByCapability(
+  projectDir: string,
+  baseMs: number,
+  resource: 'gpu',
+): number {
+  const scale = Number(
+    readCapabilityProfile(projectDir)?.timeout_scale?.[resource],
+  );
+  if (!Number.isFinite(scale) || scale <= 1) return baseMs;
+  return Math.ceil(baseMs * Math.min(scale, 16));
+}
+
 function initBootstrap(): PythonRuntimeBootstrapState {
   return {
     state: 'running',
@@ -14,6 +14,7 @@ import { getResourceScheduler } from '../resource-scheduler';
 import { setSessionRecoveryReason } from '../sessions';
 import { getMiyaRuntimeDir } from '../workflow';
 import { AudioFillerController } from './audio-filler';
+import { FluxWorker, type FluxWorkerJob } from './flux-worker';
 import {
   type PsycheConsultRequest,
   type PsycheConsultResult,
@@ -24,7 +25,9 @@ import {
 import {
   ensurePythonRuntime,
   type PythonRuntimeStatus,
+  readCapabilityProfile,
   readPythonRuntimeStatus,
+  scaleTimeoutByCapability,
 } from './python-runtime';
 import {
   appendDaemonJob,
@@ -78,6 +81,11 @@ const VRAM_LEDGER_TASK_MB: Partial<Record<ResourceTaskKind, number>> = {
 
 type ModelTier = 'lora' | 'embedding' | 'reference';
 
+const FLUX_MODEL_ID = 'local:flux.1-schnell';
+
+// 实测 GPU 比参考机慢这么多倍时，不再选最重的档位。
+const SLOW_GPU_TIMEOUT_SCALE = 4;
+
 interface ModelProcessResult {
   executed: boolean;
   exitCode: number | null;
@@ -143,6 +151,28 @@ function delay(ms: number): Promise<void> {
   return new Promise((resolve) => setTimeout(resolve, ms));
 }
 
+type FluxOutputFormat = 'png' | 'webp' | 'jpeg';
+
+// 以脚本 done（常驻 worker 为 result）事件上报的格式为准：无 PIL 的占位图即使扩展名是 webp/jpg 也是 PNG。
+function readFluxOutputFormat(stdout: string): FluxOutputFormat | undefined {
+  const lines = stdout.split(/\r?\n/);
+  for (let i = lines.length - 1; i >= 0; i -= 1) {
+    try {
+      const parsed = JSON.parse(lines[i]) as {
+        event?: string;
+        format?: string;
+      };
+      if (parsed.event !== 'done' && parsed.event !== 'result') continue;
+      return parsed.format === 'png' ||
+        parsed.format === 'webp' ||
+        parsed.format === 'jpeg'
+        ? parsed.format
+        : undefined;
+    } catch {}
+  }
+  return undefined;
+}
+
 interface TaskRuntimeContext {
   jobID: string;
   setTerminator: (input: {
@@ -165,6 +195,8 @@ export class MiyaDaemonService {
   private readonly activeTrainingJobIDs = new Set<string>();
   private started = false;
   private startedAtIso = '';
+  private zygote: ChildProcess | null = null;
+  private fluxWorker: { key: string; worker: FluxWorker } | null = null;
   private pythonRuntime?: PythonRuntimeStatus;
 
   constructor(
@@ -386,6 +418,10 @@ export class MiyaDaemonService {
   stop(): void {
     if (!this.started) return;
     this.started = false;
+    this.zygote?.kill('SIGTERM');
+    this.zygote = null;
+    this.fluxWorker?.worker.stop();
+    this.fluxWorker = null;
     this.writeRuntimeState('stopped');
   }
 
@@ -617,6 +653,10 @@ export class MiyaDaemonService {
       timeoutMs: input.resource?.timeoutMs ?? 15_000,
       metadata: input.resource?.metadata,
     });
+    this.syncResidentFlux(
+      input.resource?.modelID,
+      scheduler.snapshot().loadedModels.map((model) => model.modelID),
+    );
 
     const runningJob: DaemonJobRecord = {
       ...job,
@@ -808,16 +848,18 @@ export class MiyaDaemonService {
     profileDir: string;
     references: string[];
     size: string;
+    outputFormat?: FluxOutputFormat;
   }): Promise<{
     outputPath: string;
     tier: ModelTier;
     degraded: boolean;
     message: string;
+    format?: FluxOutputFormat;
   }> {
     const runtime = this.assertPythonRuntimeReady();
     const tier = this.resolveTierByBudget({
       kind: 'image.generate',
-      modelID: 'local:flux.1-schnell',
+      modelID: FLUX_MODEL_ID,
       fullTaskVramMB: 1536,
       fullModelVramMB: 4096,
       embeddingTaskVramMB: 768,
@@ -829,67 +871,98 @@ export class MiyaDaemonService {
     fs.mkdirSync(path.dirname(input.outputPath), { recursive: true });
     fs.mkdirSync(modelDir, { recursive: true });
 
-    const proc = await this.runModelCommand({
-      kind: 'image.generate',
-      envKey: 'MIYA_FLUX_GENERATE_CMD',
-      pythonPath: runtime.pythonPath,
-      scriptPath: path.join(
-        this.projectDir,
-        'miya-src',
-        'python',
-        'infer_flux.py',
-      ),
-      scriptArgs: [],
-      resourceByTier: {
-        lora: {
-          priority: 100,
-          vramMB: 1536,
-          modelID: 'local:flux.1-schnell',
-          modelVramMB: 4096,
-        },
-        embedding: {
-          priority: 100,
-          vramMB: 768,
-          modelID: 'local:flux.1-schnell',
-          modelVramMB: 2048,
-        },
-        reference: {
-          priority: 100,
-          vramMB: 256,
-          modelID: 'local:flux.1-schnell',
-          modelVramMB: 0,
-        },
+    const scriptPath = path.join(
+      this.projectDir,
+      'miya-src',
+      'python',
+      'infer_flux.py',
+    );
+    const resourceByTier = {
+      lora: {
+        priority: 100,
+        vramMB: 1536,
+        modelID: FLUX_MODEL_ID,
+        modelVramMB: 4096,
       },
-      tier,
-      timeoutMs: 180_000,
-      env: {
-        MIYA_PARENT_STDIN_MONITOR: '1',
-        MIYA_FLUX_PROMPT: input.prompt,
-        MIYA_FLUX_OUTPUT_PATH: input.outputPath,
-        MIYA_FLUX_PROFILE_DIR: input.profileDir,
-        MIYA_FLUX_REFERENCES: JSON.stringify(input.references),
-        MIYA_FLUX_SIZE: input.size,
-        MIYA_FLUX_TIER: tier,
-        MIYA_FLUX_MODEL_DIR: fluxModelDir,
-        MIYA_FLUX_LORA_PATH: path.join(
-          input.profileDir,
-          'lora',
-          'lora_weights.safetensors',
-        ),
-        MIYA_FLUX_EMBED_PATH: path.join(
-          input.profileDir,
-          'embeddings',
-          'face_embedding.pt',
-        ),
+      embedding: {
+        priority: 100,
+        vramMB: 768,
+        modelID: FLUX_MODEL_ID,
+        modelVramMB: 2048,
       },
-      metadata: { stage: 'daemon.flux.generate', tier },
-      progress: {
-        jobID: `flux-generate-${Date.now()}`,
-        phase: 'image.generate',
-        startProgress: 20,
-        endProgress: 95,
+      reference: {
+        priority: 100,
+        vramMB: 256,
+        modelID: FLUX_MODEL_ID,
+        modelVramMB: 0,
       },
-    });
+    };
+    const timeoutMs = scaleTimeoutByCapability(this.projectDir, 180_000, 'gpu');
+    const loraPath = path.join(
+      input.profileDir,
+      'lora',
+      'lora_weights.safetensors',
+    );
+    // 进程级设置随 worker 启动固定；每次请求各自的参数走 stdin 任务行。
+    const workerEnv = {
+      MIYA_FLUX_PROFILE_DIR: input.profileDir,
+      MIYA_FLUX_MODEL_DIR: fluxModelDir,
+      MIYA_FLUX_EMBED_PATH: path.join(
+        input.profileDir,
+        'embeddings',
+        'face_embedding.pt',
+      ),
+    };
+    const progressJobID = `flux-generate-${Date.now()}`;
+
+    const proc =
+      process.env.MIYA_FLUX_RESIDENT === '0'
+        ? await this.runModelCommand({
+            kind: 'image.generate',
+            envKey: 'MIYA_FLUX_GENERATE_CMD',
+            pythonPath: runtime.pythonPath,
+            scriptPath,
+            scriptArgs: [],
+            resourceByTier,
+            tier,
+            timeoutMs,
+            env: {
+              ...workerEnv,
+              MIYA_PARENT_STDIN_MONITOR: '1',
+              MIYA_FLUX_PROMPT: input.prompt,
+              MIYA_FLUX_OUTPUT_PATH: input.outputPath,
+              MIYA_FLUX_REFERENCES: JSON.stringify(input.references),
+              MIYA_FLUX_SIZE: input.size,
+              MIYA_FLUX_OUTPUT_FORMAT: input.outputFormat ?? 'png',
+              MIYA_FLUX_TIER: tier,
+              MIYA_FLUX_LORA_PATH: loraPath,
+            },
+            metadata: { stage: 'daemon.flux.generate', tier },
+            progress: {
+              jobID: progressJobID,
+              phase: 'image.generate',
+              startProgress: 20,
+              endProgress: 95,
+            },
+          })
+        : await this.runResidentFlux({
+            worker: this.residentFluxWorker(
+              runtime.pythonPath,
+              scriptPath,
+              workerEnv,
+            ),
+            job: {
+              id: progressJobID,
+              prompt: input.prompt,
+              outputPath: input.outputPath,
+              size: input.size,
+              outputFormat: input.outputFormat ?? 'png',
+              tier,
+              loraPath,
+            },
+            resource: resourceByTier[tier],
+            timeoutMs,
+          });
 
     if (
       proc.executed &&
@@ -901,6 +974,7 @@ export class MiyaDaemonService {
         tier,
         degraded: tier !== 'lora',
         message: 'flux_generate_ok',
+        format: readFluxOutputFormat(proc.stdout),
       };
     }
     return {
@@ -913,6 +987,132 @@ export class MiyaDaemonService {
     };
   }
 
+  // 图片生成默认交给常驻 FLUX worker，管线在请求之间保持加载；MIYA_FLUX_RESIDENT=0 退回每次起进程。
+  // 语音与训练仍是一次性进程：tts_engine 尚无可常驻的 GPT-SoVITS 推理，训练脚本本身就是长任务。
+  private residentFluxWorker(
+    pythonPath: string,
+    scriptPath: string,
+    env: Record<string, string>,
+  ): FluxWorker {
+    const key = JSON.stringify([pythonPath, scriptPath, env]);
+    if (this.fluxWorker?.key === key) return this.fluxWorker.worker;
+    this.fluxWorker?.worker.stop();
+    const worker = new FluxWorker({
+      pythonPath,
+      scriptPath,
+      cwd: this.projectDir,
+      env,
+    });
+    this.fluxWorker = { key, worker };
+    return worker;
+  }
+
+  // 调度器账本为装载别的模型按 LRU 卸下 FLUX 后，常驻 worker 也要真正交还显存。
+  private syncResidentFlux(
+    requestedModelID: string | undefined,
+    loadedModelIDs: string[],
+  ): void {
+    const worker = this.fluxWorker?.worker;
+    if (!worker?.running) return;
+    if (!requestedModelID || requestedModelID === FLUX_MODEL_ID) return;
+    if (loadedModelIDs.includes(FLUX_MODEL_ID)) return;
+    worker.stop();
+  }
+
+  private async runResidentFlux(input: {
+    worker: FluxWorker;
+    job: FluxWorkerJob;
+    resource: {
+      priority: number;
+      vramMB: number;
+      modelID: string;
+      modelVramMB: number;
+    };
+    timeoutMs: number;
+  }): Promise<ModelProcessResult> {
+    const wrapped = await this.runTask(
+      {
+        kind: 'image.generate',
+        resource: input.resource,
+        metadata: {
+          stage: 'daemon.flux.generate',
+          tier: input.job.tier,
+          resident: true,
+        },
+      },
+      async (): Promise<ModelProcessResult> => {
+        let timedOut = false;
+        let stopTimer: ReturnType<typeof setTimeout> | undefined;
+        const timer = setTimeout(
+          () => {
+            timedOut = true;
+            input.worker.cancel(input.job.id);
+            // 取消只在去噪步之间生效；装载卡住时再结束整个 worker。
+            stopTimer = setTimeout(() => input.worker.stop(), 10_000);
+          },
+          Math.max(1000, input.timeoutMs),
+        );
+        try {
+          const event = await input.worker.generate(input.job, (event) => {
+            if (event.event !== 'job_start') return;
+            this.emitProgress({
+              jobID: input.job.id,
+              kind: 'image.generate',
+              progress: 20,
+              status: 'Running',
+              phase: 'image.generate',
+            });
+          });
+          const ok = event.event === 'result';
+          return {
+            executed: true,
+            exitCode: ok ? 0 : 1,
+            stdout: JSON.stringify(event),
+            stderr: ok ? '' : String(event.message ?? event.event ?? ''),
+            timedOut,
+          };
+        } catch (error) {
+          return {
+            executed: true,
+            exitCode: null,
+            stdout: '',
+            stderr: error instanceof Error ? error.message : String(error),
+            timedOut,
+          };
+        } finally {
+          clearTimeout(timer);
+          if (stopTimer) clearTimeout(stopTimer);
+        }
+      },
+      {
+        onJobRunning: ({ setTerminator }) => {
+          setTerminator({
+            terminateSoft: () => input.worker.cancel(input.job.id),
+            terminateHard: () => input.worker.stop(),
+          });
+        },
+      },
+    );
+    return wrapped.result;
+  }
+
+  async getFluxHostStats(): Promise<Record<string, unknown>> {
+    const stats = await this.fluxWorker?.worker.stats();
+    if (!stats) return { running: false };
+    const { event: _event, id: _id, ...rest } = stats;
+    return { running: true, ...rest };
+  }
+
+  async unloadFluxModel(modelDir?: string): Promise<Record<string, unknown>> {
+    const target = modelDir || getMiyaFluxModelDir(this.projectDir);
+    const result = await this.fluxWorker?.worker.unload(target);
+    return {
+      running: Boolean(result),
+      modelDir: target,
+      unloaded: Number(result?.unloaded ?? 0),
+    };
+  }
+
   async runSovitsTts(input: {
     text: string;
     outputPath: string;
@@ -969,7 +1169,7 @@ export class MiyaDaemonService {
         },
       },
       tier,
-      timeoutMs: 120_000,
+      timeoutMs: scaleTimeoutByCapability(this.projectDir, 120_000, 'gpu'),
       env: {
         MIYA_PARENT_STDIN_MONITOR: '1',
         MIYA_SOVITS_TEXT: input.text,
@@ -1185,15 +1385,29 @@ export class MiyaDaemonService {
     embeddingTaskVramMB: number;
     embeddingModelVramMB: number;
   }): ModelTier {
+    // 调度器只看当前账本余量；能力档案补上设备本身的上限：没测到 GPU、总显存装不下、或 GPU 明显偏慢。
+    const profile = readCapabilityProfile(this.projectDir);
+    if (profile?.gpu_matmul === null) return 'reference';
+    const totalMB = Number(profile?.vram_total_mb);
+    const fitsDevice = (taskMB: number, modelMB: number) =>
+      !Number.isFinite(totalMB) || totalMB <= 0 || taskMB + modelMB <= totalMB;
+    const gpuScale = Number(profile?.timeout_scale?.gpu);
+    const slowGpu =
+      Number.isFinite(gpuScale) && gpuScale >= SLOW_GPU_TIMEOUT_SCALE;
     const scheduler = getResourceScheduler(this.projectDir);
-    const full = scheduler.planVramBudget({
-      kind: input.kind,
-      vramMB: input.fullTaskVramMB,
-      modelID: input.modelID,
-      modelVramMB: input.fullModelVramMB,
-      priority: this.defaultPriority(input.kind),
-    });
-    if (full.fit) return 'lora';
+    if (!slowGpu && fitsDevice(input.fullTaskVramMB, input.fullModelVramMB)) {
+      const full = scheduler.planVramBudget({
+        kind: input.kind,
+        vramMB: input.fullTaskVramMB,
+        modelID: input.modelID,
+        modelVramMB: input.fullModelVramMB,
+        priority: this.defaultPriority(input.kind),
+      });
+      if (full.fit) return 'lora';
+    }
+    if (!fitsDevice(input.embeddingTaskVramMB, input.embeddingModelVramMB)) {
+      return 'reference';
+    }
     const embedding = scheduler.planVramBudget({
       kind: input.kind,
       vramMB: input.embeddingTaskVramMB,
@@ -1205,6 +1419,43 @@ export class MiyaDaemonService {
     return 'reference';
   }
 
+  // 训练脚本经 zygote.py run 启动：常驻父进程已导入 torch 等重模块，fork 出的子进程省掉这段导入。
+  // 父进程首次用到时才拉起；尚未就绪或已退出时 run 直接 exec 脚本，行为与直接启动一致。
+  private zygoteRunArgs(
+    pythonPath: string,
+    scriptArgs: string[],
+  ): string[] | null {
+    if (process.platform !== 'linux' || process.env.MIYA_ZYGOTE === '0') {
+      return null;
+    }
+    const zygoteScript = path.join(
+      this.projectDir,
+      'miya-src',
+      'python',
+      'zygote.py',
+    );
+    if (!fs.existsSync(zygoteScript)) return null;
+    const socketPath = path.join(
+      getMiyaRuntimeDir(this.projectDir),
+      'daemon',
+      'python-zygote.sock',
+    );
+    if (!this.zygote) {
+      const child = spawn(
+        pythonPath,
+        [zygoteScript, '--socket', socketPath, 'serve', '--exit-with-parent'],
+        { cwd: this.projectDir, stdio: ['pipe', 'ignore', 'ignore'] },
+      );
+      const forget = () => {
+        if (this.zygote === child) this.zygote = null;
+      };
+      child.on('error', forget);
+      child.on('exit', forget);
+      this.zygote = child;
+    }
+    return [zygoteScript, '--socket', socketPath, 'run', ...scriptArgs];
+  }
+
   private async runModelCommand(input: {
     kind: ResourceTaskKind;
     envKey: string;
@@ -1227,7 +1478,10 @@ export class MiyaDaemonService {
     };
   }): Promise<ModelProcessResult> {
     const command = input.pythonPath;
-    const args = [input.scriptPath, ...(input.scriptArgs ?? [])];
+    const scriptArgs = [input.scriptPath, ...(input.scriptArgs ?? [])];
+    const args = input.kind.startsWith('training.')
+      ? (this.zygoteRunArgs(input.pythonPath, scriptArgs) ?? scriptArgs)
+      : scriptArgs;
     const resource = input.resourceByTier[input.tier];
     let currentProgress = input.progress?.startProgress ?? 12;
     const proc = await this.runIsolatedProcess({
@@ -1325,7 +1579,11 @@ export class MiyaDaemonService {
           pythonPath: input.pythonPath,
           scriptPath: input.scriptPath,
           tier,
-          timeoutMs: 30 * 60 * 1000,
+          timeoutMs: scaleTimeoutByCapability(
+            this.projectDir,
+            30 * 60 * 1000,
+            'gpu',
+          ),
           resourceByTier: input.resourceByTier,
           env: {
             ...input.envBase,
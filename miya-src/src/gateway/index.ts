@@ -4357,6 +4357,15 @@ function createMethods(
     const target = parseText(params.target);
     return daemon.applyModelUpdate(target || undefined);
   });
+  methods.register('daemon.flux.host.stats', async () => {
+    const daemon = getMiyaClient(projectDir);
+    return daemon.getFluxHostStats();
+  });
+  methods.register('daemon.flux.host.unload', async (params) => {
+    const daemon = getMiyaClient(projectDir);
+    const modelDir = parseText(params.modelDir);
+    return daemon.unloadFluxModel(modelDir || undefined);
+  });
   methods.register('daemon.model.update.wizard', async (params) => {
     const daemon = getMiyaClient(projectDir);
     const target = parseText(params.target);
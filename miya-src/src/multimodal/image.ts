@@ -13,6 +13,21 @@ const DEFAULT_IMAGE_SIZE = '1024x1024';
 const BLANK_PNG_BASE64 =
   'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMCAO6sYz0AAAAASUVORK5CYII=';
 
+const IMAGE_OUTPUT_FORMATS = {
+  png: { ext: 'png', mimeType: 'image/png' },
+  webp: { ext: 'webp', mimeType: 'image/webp' },
+  jpeg: { ext: 'jpg', mimeType: 'image/jpeg' },
+} as const;
+
+type ImageOutputFormat = keyof typeof IMAGE_OUTPUT_FORMATS;
+
+function resolveImageOutputFormat(): ImageOutputFormat {
+  const raw = String(process.env.MIYA_FLUX_OUTPUT_FORMAT ?? '')
+    .trim()
+    .toLowerCase();
+  return raw in IMAGE_OUTPUT_FORMATS ? (raw as ImageOutputFormat) : 'png';
+}
+
 function sanitizePrompt(prompt: string): string {
   return prompt.trim().slice(0, 2000);
 }
@@ -68,7 +83,9 @@ export async function generateImage(
       localPath: item.localPath,
     }));
   const outputDir = getMiyaImageTempDir(projectDir);
-  const outputPath = path.join(outputDir, `flux-${Date.now()}.png`);
+  const outputFormat = resolveImageOutputFormat();
+  const { ext } = IMAGE_OUTPUT_FORMATS[outputFormat];
+  const outputPath = path.join(outputDir, `flux-${Date.now()}.${ext}`);
   const profileDir = path.join(
     getMiyaRuntimeDir(projectDir),
     'profiles',
@@ -80,6 +97,7 @@ export async function generateImage(
     tier: 'lora' | 'embedding' | 'reference';
     degraded: boolean;
     message: string;
+    format?: ImageOutputFormat;
   };
   if (useMultimodalTestMode(projectDir)) {
     inference = {
@@ -98,6 +116,7 @@ export async function generateImage(
           .map((item) => item.localPath)
           .filter((item): item is string => Boolean(item)),
         size,
+        outputFormat,
       });
     } catch (error) {
       const updateTarget = parseModelUpdateTarget(error);
@@ -122,14 +141,18 @@ export async function generateImage(
       };
     }
   }
-  const payloadBase64 =
-    toBase64FromFile(inference.outputPath) ?? BLANK_PNG_BASE64;
+  const generatedBase64 = toBase64FromFile(inference.outputPath);
+  const payloadBase64 = generatedBase64 ?? BLANK_PNG_BASE64;
+  // MIME 与扩展名以 worker 上报的实际格式为准；回退到空白占位图时它本身是 PNG。
+  const payloadFormat = generatedBase64
+    ? IMAGE_OUTPUT_FORMATS[inference.format ?? outputFormat]
+    : IMAGE_OUTPUT_FORMATS.png;
 
   const media = ingestMedia(projectDir, {
     source: 'multimodal.image.generate',
     kind: 'image',
-    mimeType: 'image/png',
-    fileName: `generated-${Date.now()}.png`,
+    mimeType: payloadFormat.mimeType,
+    fileName: `generated-${Date.now()}.${payloadFormat.ext}`,
     contentBase64: payloadBase64,
     sizeBytes: Math.floor((payloadBase64.length * 3) / 4),
     metadata: {
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Benchmark cartographer phases on synthetic repositories.
+
+Generates a tree with a configurable file count, depth, file size mix,
+share of files under ignored directories and number of ignore/exclude
+patterns, then times each phase of init / changes / update separately:
+
+  init.select, init.hash, init.folder_hash, init.state_write
+  changes.state_load, changes.scan, changes.diff
+  update.folder_hash, update.state_commit
+
+Usage:
+  bench_cartographer.py --files 20000 --depth 5 --output bench.json
+  bench_cartographer.py --files 20000 --baseline bench.json --threshold 0.2
+
+With --baseline the run exits 1 if any phase's median is more than
+--threshold slower than the baseline (and slower by at least --min-delta-ms).
+Timings include OS page cache effects; compare runs made on the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cartographer
+
+RESULT_VERSION = 1
+DEFAULT_SIZES = "1k:0.7,16k:0.25,256k:0.05"
+
+
+def parse_sizes(spec: str) -> List[Tuple[int, float]]:
+    """Parse "1k:0.7,16k:0.3" into [(bytes, weight), ...]."""
+    sizes = []
+    for part in spec.split(","):
+        size, _, weight = part.strip().partition(":")
+        sizes.append((cartographer.parse_size(size), float(weight or 1)))
+    return sizes
+
+
+def _ignore_patterns(count: int) -> Tuple[List[str], List[str]]:
+    """A realistic mix of literal, extension, anchored and glob patterns."""
+    gitignore = ["ignored_*/"]
+    exclude = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            gitignore.append(f"generated_{i}.ts")
+        elif kind == 1:
+            gitignore.append(f"*.tmp{i}")
+        elif kind == 2:
+            gitignore.append(f"/d0/cache_{i}/")
+        else:
+            exclude.append(f"**/fixture_{i}_*.ts")
+    return gitignore, exclude
+
+
+def generate_tree(
+    root: Path,
+    files: int,
+    depth: int,
+    sizes: List[Tuple[int, float]],
+    ignored_weight: float,
+    patterns: int,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """Write a synthetic repository under root and return its description."""
+    rng = random.Random(seed)
+    fanout = max(2, round(max(files, 1) ** (1.0 / max(depth, 1)) / 2))
+    block = bytes(rng.getrandbits(8) for _ in range(4096))
+    gitignore, exclude = _ignore_patterns(patterns)
+    (root / ".gitignore").write_text("\n".join(gitignore) + "\n", encoding="utf-8")
+
+    size_values = [size for size, _ in sizes]
+    size_weights = [weight for _, weight in sizes]
+    total_bytes = 0
+    ignored = 0
+    for i in range(files):
+        parts = [f"d{rng.randrange(fanout)}" for _ in range(rng.randint(1, max(depth, 1)))]
+        if rng.random() < ignored_weight:
+            parts.insert(0, f"ignored_{rng.randrange(4)}")
+            ignored += 1
+        folder = root.joinpath(*parts)
+        folder.mkdir(parents=True, exist_ok=True)
+        size = rng.choices(size_values, size_weights)[0]
+        header = f"// file {i}\n".encode()
+        body = (block * (size // len(block) + 1))[: max(0, size - len(header))]
+        (folder / f"f{i}.ts").write_bytes(header + body)
+        total_bytes += len(header) + len(body)
+
+    return {
+        "files": files,
+        "ignored_files": ignored,
+        "bytes": total_bytes,
+        "fanout": fanout,
+        "gitignore_patterns": len(gitignore),
+        "exclude_patterns": exclude,
+    }
+
+
+def mutate_tree(root: Path, paths: List[str], ratio: float, rng: random.Random, tag: int) -> int:
+    """Modify, delete and add roughly ratio * len(paths) files; returns the count touched."""
+    count = max(1, int(len(paths) * ratio)) if paths else 0
+    touched = rng.sample(paths, min(count, len(paths)))
+    for i, rel_path in enumerate(touched):
+        path = root / rel_path
+        if i % 5 == 4:
+            path.unlink()
+            (path.parent / f"new_{tag}_{i}.ts").write_text(f"added {tag}\n")
+        else:
+            with open(path, "ab") as f:
+                f.write(f"// edit {tag}\n".encode())
+    return len(touched)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def measure(self, phase: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(phase, []).append((time.perf_counter() - start) * 1000.0)
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            phase: {
+                "median_ms": round(statistics.median(values), 3),
+                "min_ms": round(min(values), 3),
+                "max_ms": round(max(values), 3),
+                "runs": len(values),
+            }
+            for phase, values in self.samples.items()
+        }
+
+
+def run_cycle(
+    root: Path,
+    timer: PhaseTimer,
+    metadata: dict,
+    backend: str,
+    jobs: int,
+    change_ratio: float,
+    rng: random.Random,
+    tag: int,
+) -> Dict[str, int]:
+    """One init -> mutate -> changes -> update cycle, timing each phase."""
+    # init
+    stat_time_ns = time.time_ns()
+    files = timer.measure(
+        "init.select", lambda: cartographer.selector_for(root, metadata).select()
+    )
+    hashes, stats, _ = timer.measure(
+        "init.hash", cartographer.hash_changed_files, files, root, {}, {}, 0, jobs=jobs
+    )
+    folders = timer.measure("init.folder_hash", cartographer.compute_folder_hashes, hashes)
+    state_metadata = dict(
+        metadata,
+        stat_time_ns=stat_time_ns,
+        folder_hash_scheme=cartographer.FOLDER_HASH_SCHEME,
+        source="fs",
+        hash_algo=cartographer.SOURCE_HASH_ALGO["fs"],
+    )
+
+    def write_state():
+        store = cartographer.create_state_store(root, backend)
+        # Recorded like cmd_init does, so a JSON state is read back as JSON.
+        state_metadata["state_backend"] = store.backend
+        cartographer._import_state(
+            store,
+            {
+                "metadata": state_metadata,
+                "file_hashes": hashes,
+                "file_stats": stats,
+                "folder_hashes": folders,
+            },
+        )
+        store.close()
+
+    timer.measure("init.state_write", write_state)
+    touched = mutate_tree(root, sorted(hashes), change_ratio, rng, tag)
+
+    # changes
+    def load_state():
+        store = cartographer.open_state_store(root, migrate=False)
+        saved_metadata = store.load_metadata()
+        saved_hashes, saved_stats = store.load_files()
+        return store, saved_metadata, saved_hashes, saved_stats
+
+    store, saved_metadata, saved_hashes, saved_stats = timer.measure("changes.state_load", load_state)
+    current, current_stats, rehashed, _ = timer.measure(
+        "changes.scan", cartographer.scan_repository,
+        root, saved_metadata, saved_hashes, saved_stats, "fs", jobs=jobs,
+    )
+    added, removed, modified = timer.measure(
+        "changes.diff", cartographer.diff_hashes, saved_hashes, current
+    )
+
+    # update
+    changed = added | removed | modified
+    saved_folders = store.load_folders()
+    new_folders = timer.measure(
+        "update.folder_hash", cartographer.update_folder_hashes, saved_folders, current, changed
+    )
+    rows = {
+        path: (hash_val, current_stats.get(path))
+        for path, hash_val in current.items()
+        if path in changed or current_stats.get(path) != saved_stats.get(path)
+    }
+    timer.measure(
+        "update.state_commit", store.commit,
+        saved_metadata, rows, removed,
+        {k: v for k, v in new_folders.items() if saved_folders.get(k) != v},
+        saved_folders.keys() - new_folders.keys(),
+    )
+    store.close()
+    return {
+        "selected": len(files),
+        "touched": touched,
+        "rehashed": rehashed,
+        "changed": len(changed),
+        "rows_written": len(rows),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="cartobench-"))
+    root = workdir / "repo"
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+    try:
+        start = time.perf_counter()
+        tree = generate_tree(
+            root, args.files, args.depth, parse_sizes(args.sizes),
+            args.ignored_weight, args.patterns, args.seed,
+        )
+        generate_ms = (time.perf_counter() - start) * 1000.0
+        metadata = {
+            "include_patterns": ["**/*"],
+            "exclude_patterns": tree.pop("exclude_patterns"),
+            "exceptions": [],
+        }
+        timer = PhaseTimer()
+        rng = random.Random(args.seed + 1)
+        counts = {}
+        for repeat in range(args.repeats):
+            counts = run_cycle(
+                root, timer, metadata, args.backend, args.jobs, args.change_ratio, rng, repeat
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "version": RESULT_VERSION,
+        "params": {
+            "files": args.files,
+            "depth": args.depth,
+            "sizes": args.sizes,
+            "ignored_weight": args.ignored_weight,
+            "patterns": args.patterns,
+            "change_ratio": args.change_ratio,
+            "repeats": args.repeats,
+            "jobs": args.jobs or cartographer.default_jobs(),
+            "backend": args.backend,
+            "seed": args.seed,
+        },
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "tree": dict(tree, generate_ms=round(generate_ms, 3)),
+        "counts": counts,
+        "phases": timer.summary(),
+    }
+
+
+def compare_results(
+    current: dict, baseline: dict, threshold: float, min_delta_ms: float = 10.0
+) -> List[dict]:
+    """Per-phase comparison of median timings; `regressed` marks slowdowns past the threshold."""
+    rows = []
+    for phase, stats in sorted(current.get("phases", {}).items()):
+        base = baseline.get("phases", {}).get(phase)
+        if base is None:
+            continue
+        now_ms, base_ms = stats["median_ms"], base["median_ms"]
+        ratio = now_ms / base_ms if base_ms > 0 else float("inf") if now_ms > 0 else 1.0
+        rows.append({
+            "phase": phase,
+            "baseline_ms": base_ms,
+            "current_ms": now_ms,
+            "ratio": round(ratio, 3),
+            "regressed": ratio > 1.0 + threshold and now_ms - base_ms >= min_delta_ms,
+        })
+    return rows
+
+
+def print_report(result: dict, comparison: Optional[List[dict]]) -> None:
+    tree = result["tree"]
+    print(
+        f"{tree['files']} files ({tree['ignored_files']} ignored), "
+        f"{tree['bytes'] / 1024 / 1024:.1f} MiB, {result['params']['repeats']} runs",
+        file=sys.stderr,
+    )
+    baseline = {row["phase"]: row for row in comparison or []}
+    for phase, stats in result["phases"].items():
+        line = f"  {phase:<22} {stats['median_ms']:>10.2f} ms"
+        row = baseline.get(phase)
+        if row is not None:
+            line += f"  (baseline {row['baseline_ms']:.2f} ms, x{row['ratio']:.2f})"
+            if row["regressed"]:
+                line += "  REGRESSION"
+        print(line, file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cartographer on synthetic repositories")
+    parser.add_argument("--files", type=int, default=5000, help="Number of files to generate")
+    parser.add_argument("--depth", type=int, default=4, help="Maximum directory depth")
+    parser.add_argument(
+        "--sizes", default=DEFAULT_SIZES, help=f"File size mix as size:weight pairs (default: {DEFAULT_SIZES})"
+    )
+    parser.add_argument(
+        "--ignored-weight", type=float, default=0.2, help="Share of files placed under gitignored directories"
+    )
+    parser.add_argument("--patterns", type=int, default=50, help="Number of ignore/exclude patterns")
+    parser.add_argument(
+        "--change-ratio", type=float, default=0.01, help="Share of files changed before `changes`"
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="init/changes/update cycles to run")
+    parser.add_argument("--jobs", type=int, default=0, help="Hashing worker threads (default: 2x CPU count)")
+    parser.add_argument("--backend", choices=["sqlite", "json"], default="sqlite", help="State backend")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated tree")
+    parser.add_argument("--workdir", help="Directory to generate the tree in (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tree")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)"
+    )
+    parser.add_argument(
+        "--min-delta-ms", type=float, default=10.0, help="Ignore slowdowns smaller than this"
+    )
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != result["params"]:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        comparison = compare_results(result, baseline, args.threshold, args.min_delta_ms)
+        result["comparison"] = comparison
+
+    print_report(result, comparison)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if comparison and any(row["regressed"] for row in comparison):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,51 +6,299 @@ Commands:
   init     Initialize mapping (create hashes + empty codemaps)
   changes  Show what changed (read-only, like git status)
   update   Update hashes (like git commit)
+  watch    Keep hashes current in the background; `changes` reads its report
 
 Usage:
   cartographer.py init --root /path/to/repo --include "src/**/*.ts" --exclude "node_modules/**"
   cartographer.py changes --root /path/to/repo
+  cartographer.py changes --root /path/to/repo --path src/api --format json
   cartographer.py update --root /path/to/repo
+
+Inside a git work tree, `--source git` lists files and blob hashes from the
+git index and only reads modified or untracked files.
 """
 
 import argparse
+import bisect
 import hashlib
 import json
+import mmap
 import os
 import re
+import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path, PurePath
 from typing import Dict, List, Optional, Set, Tuple
 
+try:
+    import sqlite3
+except ImportError:  # pragma: no cover - Python built without sqlite
+    sqlite3 = None
+
 VERSION = "1.0.0"
 STATE_DIR = ".miya"
 STATE_FILE = "cartography.json"
+STATE_DB_FILE = "cartography.db"
+WATCH_FILE = "cartography-watch.json"
 CODEMAP_FILE = "codemap.md"
+READ_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
 
 
 def load_gitignore(root: Path) -> List[str]:
-    """Load .gitignore patterns from the repository root."""
-    gitignore_path = root / ".gitignore"
-    patterns = []
-    if gitignore_path.exists():
-        with open(gitignore_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    patterns.append(line)
-    return patterns
+    """Load raw .gitignore lines from the repository root."""
+    return _read_ignore_file(root / ".gitignore")
+
+
+def _read_ignore_file(path: Path) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def _glob_segment_to_regex(segment: str) -> str:
+    """Translate one path segment of a gitignore glob; `*` and `?` never cross '/'."""
+    out = []
+    i = 0
+    while i < len(segment):
+        c = segment[i]
+        if c == "\\" and i + 1 < len(segment):
+            out.append(re.escape(segment[i + 1]))
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = segment.find("]", i + 2 if segment[i + 1 : i + 2] in ("!", "^", "]") else i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = segment[i + 1 : end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("[", "\\[") + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a slash-separated gitignore glob, honouring `**` segments."""
+    segments = pattern.split("/")
+    out = []
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            out.append(".*" if last else "(?:.*/)?")
+        else:
+            out.append(_glob_segment_to_regex(segment) + ("" if last else "/"))
+    return "".join(out)
+
+
+def _has_glob(text: str) -> bool:
+    return any(c in text for c in "*?[\\")
+
+
+class _IgnoreRule:
+    __slots__ = ("index", "negated", "dir_only", "regex", "suffix")
+
+    def __init__(self, index: int, negated: bool, dir_only: bool, regex=None, suffix: str = ""):
+        self.index = index
+        self.negated = negated
+        self.dir_only = dir_only
+        self.regex = regex
+        self.suffix = suffix
+
+
+class _TrieNode:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.rules: List[_IgnoreRule] = []
+
+
+class _IgnoreRules:
+    """Rules from one ignore file, bucketed so most lookups are dict hits.
+
+    Unanchored literals are keyed by basename and `*.ext` globs by
+    extension; anchored patterns hang off a trie of their leading literal
+    segments. Only unanchored basename globs are tried one by one.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.by_name: Dict[str, List[_IgnoreRule]] = {}
+        self.by_ext: Dict[str, List[_IgnoreRule]] = {}
+        self.name_globs: List[_IgnoreRule] = []
+        self.trie = _TrieNode()
+        self.count = 0
+        for line in lines:
+            self._add(line)
+
+    def _add(self, line: str) -> None:
+        # Unescaped trailing spaces are ignored
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+        if not line or line.startswith("#"):
+            return
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith(("\\!", "\\#")):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        if dir_only:
+            line = line.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to this file's directory
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return
+        
+        index = self.count
+        self.count += 1
+        if not anchored:
+            if not _has_glob(line):
+                self.by_name.setdefault(line, []).append(_IgnoreRule(index, negated, dir_only))
+                return
+            ext = line.rpartition(".")[2]
+            if line.startswith("*.") and not _has_glob(line[1:]):
+                rule = _IgnoreRule(index, negated, dir_only, suffix=line[1:])
+                self.by_ext.setdefault(ext, []).append(rule)
+                return
+            regex = re.compile(_glob_segment_to_regex(line))
+            self.name_globs.append(_IgnoreRule(index, negated, dir_only, regex))
+            return
+        
+        segments = line.split("/")
+        node = self.trie
+        while segments and segments[0] != "**" and not _has_glob(segments[0]):
+            node = node.children.setdefault(segments.pop(0), _TrieNode())
+        regex = re.compile(_glob_to_regex("/".join(segments))) if segments else None
+        node.rules.append(_IgnoreRule(index, negated, dir_only, regex))
+
+    def match(self, parts: List[str], is_dir: bool) -> Optional[bool]:
+        """Verdict of the last matching rule for a path relative to this file."""
+        best: Optional[_IgnoreRule] = None
+        
+        def consider(rule: _IgnoreRule) -> None:
+            nonlocal best
+            if (is_dir or not rule.dir_only) and (best is None or rule.index > best.index):
+                best = rule
+        
+        name = parts[-1]
+        for rule in self.by_name.get(name, ()):
+            consider(rule)
+        if "." in name:
+            for rule in self.by_ext.get(name.rpartition(".")[2], ()):
+                if name.endswith(rule.suffix):
+                    consider(rule)
+        for rule in self.name_globs:
+            if (best is None or rule.index > best.index) and rule.regex.fullmatch(name):
+                consider(rule)
+        
+        node = self.trie
+        depth = 0
+        while True:
+            if node.rules:
+                rest = "/".join(parts[depth:])
+                for rule in node.rules:
+                    if rule.regex is None:
+                        if depth == len(parts):
+                            consider(rule)
+                    elif rest and rule.regex.fullmatch(rest):
+                        consider(rule)
+            if depth == len(parts):
+                break
+            node = node.children.get(parts[depth])
+            if node is None:
+                break
+            depth += 1
+        
+        if best is None:
+            return None
+        return not best.negated
+
+
+class GitignoreMatcher:
+    """gitignore semantics: nested files, negation, anchoring, directory-only rules.
+
+    Ignore files are read lazily the first time a path below their directory
+    is queried, which during a walk is when that directory is entered.
+    Deeper files override shallower ones, and nothing below an ignored
+    directory can be re-included.
+    """
+
+    def __init__(self, root: Path, root_patterns: Optional[List[str]] = None):
+        self.root = root
+        self._root_patterns = root_patterns
+        self._rules: Dict[str, Optional[_IgnoreRules]] = {}
+        self._dir_ignored: Dict[str, bool] = {}
+        info_exclude = _IgnoreRules(_read_ignore_file(root / ".git" / "info" / "exclude"))
+        self._fallback = info_exclude if info_exclude.count else None
+
+    def _rules_for(self, rel_dir: str) -> Optional[_IgnoreRules]:
+        if rel_dir in self._rules:
+            return self._rules[rel_dir]
+        if rel_dir == "" and self._root_patterns is not None:
+            lines = self._root_patterns
+        else:
+            lines = _read_ignore_file(self.root / rel_dir / ".gitignore")
+        rules = _IgnoreRules(lines)
+        self._rules[rel_dir] = rules if rules.count else None
+        return self._rules[rel_dir]
+
+    def _decide(self, rel_path: str, is_dir: bool) -> bool:
+        parts = rel_path.split("/")
+        for depth in range(len(parts) - 1, -1, -1):
+            rules = self._rules_for("/".join(parts[:depth]))
+            if rules is not None:
+                verdict = rules.match(parts[depth:], is_dir)
+                if verdict is not None:
+                    return verdict
+        if self._fallback is not None:
+            return bool(self._fallback.match(parts, is_dir))
+        return False
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        parent = rel_path.rpartition("/")[0]
+        if parent and self.covers_directory(parent):
+            return True
+        return self._decide(rel_path, is_dir)
+
+    def matches(self, rel_path: str) -> bool:
+        """Check if a file is ignored."""
+        return self.is_ignored(rel_path)
+
+    def covers_directory(self, rel_dir: str) -> bool:
+        """Check if a directory (and so everything below it) is ignored."""
+        ignored = self._dir_ignored.get(rel_dir)
+        if ignored is None:
+            ignored = self.is_ignored(rel_dir, is_dir=True)
+            self._dir_ignored[rel_dir] = ignored
+        return ignored
 
 
 class PatternMatcher:
     """Efficiently match paths against multiple glob patterns using pre-compiled regex."""
 
     def __init__(self, patterns: List[str]):
+        self.dir_regex = None
         if not patterns:
             self.regex = None
             return
 
         regex_parts = []
+        subtree_parts = []
         for pattern in patterns:
             # Regex conversion logic
             reg = re.escape(pattern)
@@ -68,10 +316,16 @@ class PatternMatcher:
                 reg = '(?:^|.*/)' + reg
             
             regex_parts.append(f'(?:{reg}$)')
+            # Patterns ending in an unbounded ".*" match everything below any
+            # directory whose "dir/" prefix they match, so they can prune it
+            if reg.endswith('.*'):
+                subtree_parts.append(f'(?:{reg}$)')
         
         # Combine all patterns into a single regex for speed
         combined_regex = '|'.join(regex_parts)
         self.regex = re.compile(combined_regex)
+        if subtree_parts:
+            self.dir_regex = re.compile('|'.join(subtree_parts))
 
     def matches(self, path: str) -> bool:
         """Check if a path matches any of the patterns."""
@@ -79,6 +333,94 @@ class PatternMatcher:
             return False
         return bool(self.regex.search(path))
 
+    def covers_directory(self, dir_path: str) -> bool:
+        """Check if every path beneath a directory is guaranteed to match."""
+        if not self.dir_regex:
+            return False
+        return bool(self.dir_regex.search(dir_path + "/"))
+
+
+class FileSelector:
+    """Decides which directories to descend into and which files to select."""
+
+    def __init__(
+        self,
+        root: Path,
+        include_patterns: List[str],
+        exclude_patterns: List[str],
+        exceptions: List[str],
+        gitignore_patterns: List[str],
+    ):
+        self.root = root
+        self.include_matcher = PatternMatcher(include_patterns)
+        self.exclude_matcher = PatternMatcher(exclude_patterns)
+        self.gitignore_matcher = GitignoreMatcher(root, gitignore_patterns)
+        self.exception_set = set(exceptions)
+        self.exception_list = sorted(exceptions)
+
+    def has_exception_under(self, rel_dir: str) -> bool:
+        prefix = rel_dir + "/"
+        i = bisect.bisect_left(self.exception_list, prefix)
+        return i < len(self.exception_list) and self.exception_list[i].startswith(prefix)
+
+    def keep_directory(self, rel_dir: str) -> bool:
+        if rel_dir.rpartition("/")[2].startswith("."):
+            return False
+        # Gitignored trees can never be re-admitted; excluded ones only by an exception
+        if self.gitignore_matcher.covers_directory(rel_dir):
+            return False
+        if self.exclude_matcher.covers_directory(rel_dir):
+            return self.has_exception_under(rel_dir)
+        return True
+
+    def admits(self, rel_path: str) -> bool:
+        """Check a single path the way a full walk would (ancestors included)."""
+        parts = rel_path.split("/")
+        for i in range(len(parts) - 1):
+            if not self.keep_directory("/".join(parts[: i + 1])):
+                return False
+        return self.wants(rel_path)
+
+    def wants(self, rel_path: str) -> bool:
+        # Skip if ignored by .gitignore
+        if self.gitignore_matcher.matches(rel_path):
+            return False
+        return is_selected(
+            rel_path, self.include_matcher, self.exclude_matcher, self.exception_set
+        )
+
+    def walk_directories(self, prefix: str = ""):
+        """Yield (rel_dir, filenames) for every directory that is not pruned.
+
+        With a prefix only that subtree is walked.
+        """
+        root_str = str(self.root)
+        top = root_str
+        if prefix:
+            parts = prefix.split("/")
+            if not all(self.keep_directory("/".join(parts[: i + 1])) for i in range(len(parts))):
+                return
+            top = os.path.join(root_str, *parts)
+        for dirpath, dirnames, filenames in os.walk(top):
+            rel_dir = os.path.relpath(dirpath, root_str).replace("\\", "/")
+            if rel_dir == ".":
+                rel_dir = ""
+            
+            # Skip hidden and fully ignored directories early by modifying dirnames in-place
+            dirnames[:] = [
+                d for d in dirnames if self.keep_directory(f"{rel_dir}/{d}" if rel_dir else d)
+            ]
+            yield rel_dir, filenames
+
+    def select(self, prefix: str = "") -> List[Path]:
+        selected = []
+        for rel_dir, filenames in self.walk_directories(prefix):
+            for filename in filenames:
+                rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+                if self.wants(rel_path):
+                    selected.append(self.root / rel_path)
+        return sorted(selected)
+
 
 def select_files(
     root: Path,
@@ -88,44 +430,158 @@ def select_files(
     gitignore_patterns: List[str],
 ) -> List[Path]:
     """Select files based on include/exclude patterns and exceptions."""
-    selected = []
+    return FileSelector(
+        root, include_patterns, exclude_patterns, exceptions, gitignore_patterns
+    ).select()
+
+
+def selector_for(root: Path, metadata: dict) -> FileSelector:
+    """Build the file selector described by saved state metadata."""
+    return FileSelector(
+        root,
+        metadata.get("include_patterns", ["**/*"]),
+        metadata.get("exclude_patterns", []),
+        metadata.get("exceptions", []),
+        load_gitignore(root),
+    )
+
+
+def is_selected(
+    rel_path: str,
+    include_matcher: PatternMatcher,
+    exclude_matcher: PatternMatcher,
+    exception_set: Set[str],
+) -> bool:
+    """Apply include/exclude patterns and exceptions to a relative path."""
+    # Check explicit exclusions first
+    if exclude_matcher.matches(rel_path):
+        # Unless it's an exception
+        if rel_path not in exception_set:
+            return False
     
-    # Pre-compile matchers
+    # Check inclusions
+    return include_matcher.matches(rel_path) or rel_path in exception_set
+
+
+def _run_git(root: Path, args: List[str]) -> Optional[bytes]:
+    try:
+        proc = subprocess.run(
+            ["git", "-C", str(root), *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout
+
+
+def _pathspec(prefix: str) -> List[str]:
+    return ["--", prefix] if prefix else []
+
+
+def list_git_files(root: Path, prefix: str = "") -> Optional[Tuple[Dict[str, str], Set[str]]]:
+    """List files known to git under root (or under root/prefix) in bulk.
+
+    Returns (blob SHA of every clean tracked file, paths git reports as
+    modified or untracked-but-not-ignored), or None when git is missing or
+    root is not inside a work tree. Paths are relative to root.
+    """
+    staged = _run_git(root, ["ls-files", "-s", "-z", *_pathspec(prefix)])
+    if staged is None:
+        return None
+    dirty_out = _run_git(
+        root, ["ls-files", "-m", "-o", "--exclude-standard", "-z", *_pathspec(prefix)]
+    )
+    if dirty_out is None:
+        return None
+    dirty = {p for p in dirty_out.decode("utf-8", "surrogateescape").split("\0") if p}
+    blobs: Dict[str, str] = {}
+    for entry in staged.decode("utf-8", "surrogateescape").split("\0"):
+        if not entry:
+            continue
+        info, _, path = entry.partition("\t")
+        mode, sha, _stage = info.split(" ")
+        # Skip submodules; unmerged entries show up once per stage
+        if mode == "160000":
+            continue
+        if path in blobs and blobs[path] != sha:
+            dirty.add(path)
+        blobs[path] = sha
+    for path in dirty:
+        blobs.pop(path, None)
+    return blobs, dirty
+
+
+def git_path_filter(
+    include_patterns: List[str], exclude_patterns: List[str], exceptions: List[str]
+):
+    """Selection predicate for paths listed by git (ignore rules are git's)."""
     include_matcher = PatternMatcher(include_patterns)
     exclude_matcher = PatternMatcher(exclude_patterns)
-    gitignore_matcher = PatternMatcher(gitignore_patterns)
     exception_set = set(exceptions)
     
-    root_str = str(root)
-    
-    for dirpath, dirnames, filenames in os.walk(root_str):
-        # Skip hidden directories early by modifying dirnames in-place
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        
-        rel_dir = os.path.relpath(dirpath, root_str)
-        if rel_dir == ".":
-            rel_dir = ""
-        
-        for filename in filenames:
-            rel_path = os.path.join(rel_dir, filename).replace("\\", "/")
-            if rel_path.startswith("./"):
-                rel_path = rel_path[2:]
-            
-            # Skip if ignored by .gitignore
-            if gitignore_matcher.matches(rel_path):
-                continue
-            
-            # Check explicit exclusions first
-            if exclude_matcher.matches(rel_path):
-                # Unless it's an exception
-                if rel_path not in exception_set:
-                    continue
-            
-            # Check inclusions
-            if include_matcher.matches(rel_path) or rel_path in exception_set:
-                selected.append(root / rel_path)
+    def wanted(rel_path: str) -> bool:
+        if any(part.startswith(".") for part in rel_path.split("/")[:-1]):
+            return False
+        return is_selected(rel_path, include_matcher, exclude_matcher, exception_set)
     
-    return sorted(selected)
+    return wanted
+
+
+def git_head(root: Path, rev: str = "HEAD") -> Optional[str]:
+    """Resolve a revision to a commit SHA, or None outside a git work tree."""
+    out = _run_git(root, ["rev-parse", "--verify", "--quiet", rev + "^{commit}"])
+    return out.decode().strip() if out else None
+
+
+def git_changes_since(
+    root: Path, commit: str, prefix: str = ""
+) -> Optional[Tuple[Set[str], Set[str], Set[str]]]:
+    """(added, removed, modified) between a commit and the work tree, per git."""
+    diff = _run_git(
+        root, ["diff", "--name-status", "--no-renames", "--relative", "-z", commit, *_pathspec(prefix)]
+    )
+    untracked = _run_git(root, ["ls-files", "-o", "--exclude-standard", "-z", *_pathspec(prefix)])
+    if diff is None or untracked is None:
+        return None
+    added = {p for p in untracked.decode("utf-8", "surrogateescape").split("\0") if p}
+    removed: Set[str] = set()
+    modified: Set[str] = set()
+    fields = diff.decode("utf-8", "surrogateescape").split("\0")
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status == "A":
+            added.add(path)
+        elif status == "D":
+            removed.add(path)
+        elif status:
+            modified.add(path)
+    return added, removed, modified
+
+
+def select_files_git(
+    root: Path,
+    include_patterns: List[str],
+    exclude_patterns: List[str],
+    exceptions: List[str],
+    prefix: str = "",
+) -> Optional[Tuple[Dict[str, str], List[Path]]]:
+    """Select files from the git index instead of walking the filesystem.
+
+    Returns (blob SHA for clean tracked files, files that must be hashed),
+    or None when git cannot be used. Ignore rules are git's own; tracked
+    files stay selected even if a .gitignore pattern matches them.
+    """
+    listed = list_git_files(root, prefix)
+    if listed is None:
+        return None
+    blobs, dirty = listed
+    wanted = git_path_filter(include_patterns, exclude_patterns, exceptions)
+    clean = {path: sha for path, sha in blobs.items() if wanted(path)}
+    to_hash = sorted(root / path for path in dirty if wanted(path))
+    return clean, to_hash
 
 
 def compute_file_hash(filepath: Path) -> str:
@@ -133,32 +589,437 @@ def compute_file_hash(filepath: Path) -> str:
     hasher = hashlib.md5()
     try:
         with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                hasher.update(chunk)
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                # Large files: hash straight from the page cache, no copies
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hasher.update(mm)
+            else:
+                buf = bytearray(READ_BUFFER_SIZE)
+                view = memoryview(buf)
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    hasher.update(view[:n])
         return hasher.hexdigest()
-    except (IOError, OSError):
+    except (IOError, OSError, ValueError):
         return ""
 
 
-def compute_folder_hash(folder: str, file_hashes: Dict[str, str]) -> str:
-    """Compute a stable hash for a folder based on its files."""
-    # Get all files in this folder
-    folder_files = sorted(
-        (path, hash_val)
-        for path, hash_val in file_hashes.items()
-        if path.startswith(folder + "/") or (folder == "." and "/" not in path)
-    )
-    
-    if not folder_files:
+def compute_git_blob_hash(filepath: Path) -> str:
+    """Compute the git blob SHA-1 of file content (as `git hash-object` would, without filters)."""
+    try:
+        with open(filepath, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            hasher = hashlib.sha1(f"blob {size}\0".encode())
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hasher.update(mm)
+            else:
+                hasher.update(f.read())
+        return hasher.hexdigest()
+    except (IOError, OSError, ValueError):
         return ""
+
+
+HASH_FUNCTIONS = {
+    "md5": compute_file_hash,
+    "git-sha1": compute_git_blob_hash,
+}
+
+
+CHUNK_SCHEME = "gear-v1"
+CHUNK_MIN_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 1024 * 1024
+# Gear rolling hash (as in FastCDC): h = (h << 1) + GEAR[byte] over 64 bits,
+# so every bit of h depends only on the last 64 bytes and the boundary test
+# needs no explicit window. The mask takes the top bits, which are the ones
+# that depend on the whole window; 12 bits give ~4 KiB expected past the
+# minimum size.
+CHUNK_WINDOW = 64
+CHUNK_MASK = 0xFFF << 52
+_HASH_BITS = (1 << 64) - 1
+_GEAR = [int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), "little") for i in range(256)]
+
+
+def _chunk_digest(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _next_chunk_boundary(buf, start: int, size: int) -> int:
+    low = start + CHUNK_MIN_SIZE
+    if low >= size:
+        return size
+    high = min(start + CHUNK_MAX_SIZE, size)
+    gear = _GEAR
+    h = 0
+    # Bytes before the minimum size can't end a chunk; only the last window
+    # of them feeds the hash at `low`, so rolling starts there.
+    for byte in buf[low - CHUNK_WINDOW : low]:
+        h = ((h << 1) + gear[byte]) & _HASH_BITS
+    for offset, byte in enumerate(buf[low:high]):
+        h = ((h << 1) + gear[byte]) & _HASH_BITS
+        if not h & CHUNK_MASK:
+            return low + offset + 1
+    return high
+
+
+def chunk_buffer(buf, saved_chunks: Optional[List[list]] = None) -> Tuple[str, List[list], Optional[dict]]:
+    """Split a buffer into content-defined chunks and hash it in one pass.
+
+    With the previous chunk list, a chunk starting where an old one would
+    (allowing for the shift caused by earlier edits) is verified by hash
+    and reused without searching for a boundary; only changed regions are
+    re-chunked. Every byte is still read and hashed once: the whole-file
+    MD5 needs it, and a reused chunk can only be trusted after its content
+    is verified. Files whose size and mtime are unchanged are skipped by
+    the scan before they get here.
+
+    Returns (MD5 of the whole buffer, [[length, chunk hash], ...], delta),
+    where delta describes changed regions relative to saved_chunks (None
+    when there was nothing to compare against).
+    """
+    view = memoryview(buf)
+    size = len(view)
+    file_hasher = hashlib.md5()
+    old: Dict[int, list] = {}
+    old_size = 0
+    for length, chunk_hash in saved_chunks or ():
+        old[old_size] = [length, chunk_hash]
+        old_size += length
+    growth = size - old_size
+
+    chunks: List[list] = []
+    regions: List[List[int]] = []
+    changed_bytes = 0
+    reused_bytes = 0
+    shift = 0
+    pos = 0
+    while pos < size:
+        candidate = old.get(pos - shift)
+        if candidate is not None and pos + candidate[0] <= size:
+            piece = view[pos : pos + candidate[0]]
+            if _chunk_digest(piece) == candidate[1]:
+                file_hasher.update(piece)
+                chunks.append(candidate)
+                reused_bytes += candidate[0]
+                pos += candidate[0]
+                continue
+        end = _next_chunk_boundary(buf, pos, size)
+        piece = view[pos:end]
+        file_hasher.update(piece)
+        chunks.append([end - pos, _chunk_digest(piece)])
+        if regions and regions[-1][1] == pos:
+            regions[-1][1] = end
+        else:
+            regions.append([pos, end])
+        changed_bytes += end - pos
+        pos = end
+        # Resync guess: keep the current shift, or assume the whole size change happened already
+        if (pos - shift) not in old and (pos - growth) in old:
+            shift = growth
+
+    view.release()
+    if saved_chunks is None:
+        return file_hasher.hexdigest(), chunks, None
+    return file_hasher.hexdigest(), chunks, {
+        "regions": regions,
+        "changed_bytes": changed_bytes,
+        "removed_bytes": max(0, old_size - reused_bytes),
+    }
+
+
+class ChunkTracker:
+    """Hash function for scans that keeps chunk lists for files over a size threshold.
+
+    Files below the threshold are hashed as usual. Results are collected in
+    `chunks` (new chunk lists), `deltas` (changed regions per file) and
+    `dropped` (files that no longer need a chunk list).
+    """
+
+    def __init__(self, root: Path, threshold: int, saved_chunks: Dict[str, List[list]]):
+        self.root = root
+        self.threshold = threshold
+        self.saved = saved_chunks
+        self.chunks: Dict[str, List[list]] = {}
+        self.deltas: Dict[str, dict] = {}
+        self.dropped: Set[str] = set()
+
+    def hash_file(self, filepath: Path) -> str:
+        rel_path = filepath.relative_to(self.root).as_posix()
+        try:
+            with open(filepath, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < self.threshold or size == 0:
+                    if rel_path in self.saved:
+                        self.dropped.add(rel_path)
+                    return compute_file_hash(filepath)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    file_hash, chunks, delta = chunk_buffer(mm, self.saved.get(rel_path))
+        except (IOError, OSError, ValueError):
+            return ""
+        self.chunks[rel_path] = chunks
+        if delta is not None:
+            self.deltas[rel_path] = delta
+        return file_hash
+
+    def commit_rows(self, removed: Set[str]) -> Dict[str, Optional[List[list]]]:
+        """Chunk rows to write: new lists, plus deletions for dropped files."""
+        rows: Dict[str, Optional[List[list]]] = {p: None for p in self.dropped - self.chunks.keys()}
+        rows.update({p: None for p in removed if p in self.saved})
+        rows.update(self.chunks)
+        return rows
+
+
+def chunk_tracker_for(
+    root: Path, metadata: dict, store, source: str, prefix: str = ""
+) -> Optional[ChunkTracker]:
+    """Chunk tracker for filesystem scans when chunked mode is enabled in state."""
+    threshold = metadata.get("chunk_threshold") or 0
+    if threshold <= 0 or source != "fs":
+        return None
+    saved = {}
+    if store is not None and metadata.get("chunk_scheme") == CHUNK_SCHEME:
+        saved = store.load_chunks(prefix)
+    return ChunkTracker(root, threshold, saved)
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte count such as "4096", "512k" or "64m"."""
+    text = text.strip().lower()
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def change_volume(
+    added: Set[str],
+    removed: Set[str],
+    modified: Set[str],
+    current_stats: Dict[str, List[int]],
+    saved_stats: Dict[str, List[int]],
+    deltas: Dict[str, dict],
+) -> Dict[str, int]:
+    """Changed bytes per folder (ancestors included); chunked files count only changed chunks."""
+    per_file: Dict[str, int] = {}
+    for path in added | modified:
+        delta = deltas.get(path)
+        if delta is not None:
+            per_file[path] = delta["changed_bytes"] + delta["removed_bytes"]
+        else:
+            per_file[path] = (current_stats.get(path) or [0])[0]
+    for path in removed:
+        per_file[path] = (saved_stats.get(path) or [0])[0]
+    folders: Dict[str, int] = {}
+    for path, volume in per_file.items():
+        for folder in affected_folders({path}):
+            folders[folder] = folders.get(folder, 0) + volume
+    return folders
+
+
+def default_jobs() -> int:
+    """Default worker count for hashing (hashlib releases the GIL on large updates)."""
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+def compute_file_hashes(
+    files: List[Path], root: Path, jobs: int = 0, hash_fn=compute_file_hash
+) -> Dict[str, str]:
+    """Hash files in parallel, keyed by path relative to root."""
+    jobs = jobs if jobs and jobs > 0 else default_jobs()
+    rel_paths = [f.relative_to(root).as_posix() for f in files]
+    if jobs == 1 or len(files) < 2:
+        hashes = [hash_fn(f) for f in files]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            hashes = list(pool.map(hash_fn, files))
+    return dict(zip(rel_paths, hashes))
+
+
+def stat_key(filepath: Path) -> Optional[List[int]]:
+    """Return the (size, mtime_ns, inode) tuple used to skip unchanged files."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def hash_changed_files(
+    files: List[Path],
+    root: Path,
+    saved_hashes: Dict[str, str],
+    saved_stats: Dict[str, List[int]],
+    stat_time_ns: int = 0,
+    jobs: int = 0,
+    verify: bool = False,
+    hash_fn=compute_file_hash,
+) -> Tuple[Dict[str, str], Dict[str, List[int]], int]:
+    """Hash only files whose stat tuple differs from the saved one.
+
+    Like git's index, a file whose mtime is not older than the time the stats
+    were recorded is "racily clean" and is rehashed anyway, since a same-tick
+    write would leave its stat tuple unchanged.
+
+    Returns (hashes, stats, number of files actually rehashed).
+    """
+    hashes: Dict[str, str] = {}
+    stats: Dict[str, List[int]] = {}
+    to_hash: List[Path] = []
+    for f in files:
+        rel_path = f.relative_to(root).as_posix()
+        key = stat_key(f)
+        if key is None:
+            continue
+        stats[rel_path] = key
+        if (
+            not verify
+            and rel_path in saved_hashes
+            and saved_stats.get(rel_path) == key
+            and key[1] < stat_time_ns
+        ):
+            hashes[rel_path] = saved_hashes[rel_path]
+        else:
+            to_hash.append(f)
+    hashes.update(compute_file_hashes(to_hash, root, jobs, hash_fn))
+    return hashes, stats, len(to_hash)
+
+
+def scan_repository(
+    root: Path,
+    metadata: dict,
+    saved_hashes: Dict[str, str],
+    saved_stats: Dict[str, List[int]],
+    source: str = "fs",
+    jobs: int = 0,
+    verify: bool = False,
+    prefix: str = "",
+    chunk_tracker: Optional["ChunkTracker"] = None,
+) -> Tuple[Dict[str, str], Dict[str, List[int]], int, str]:
+    """Select and hash the files described by the state metadata.
+
+    With source "git", clean tracked files take their blob SHA straight
+    from the index and only modified/untracked files are read. Falls back
+    to the filesystem walk when git is unavailable. A prefix limits the
+    scan to one folder. A chunk tracker (filesystem source only) hashes
+    large files chunk by chunk and records what changed inside them.
+
+    Returns (hashes, stats, number of files read, source actually used).
+    """
+    include_patterns = metadata.get("include_patterns", ["**/*"])
+    exclude_patterns = metadata.get("exclude_patterns", [])
+    exceptions = metadata.get("exceptions", [])
+    stat_time_ns = metadata.get("stat_time_ns", 0)
+    saved_algo = metadata.get("hash_algo", "md5")
+    
+    if source == "git":
+        selected = select_files_git(
+            root, include_patterns, exclude_patterns, exceptions, prefix
+        )
+        if selected is not None:
+            if saved_algo != SOURCE_HASH_ALGO["git"]:
+                saved_hashes, saved_stats = {}, {}
+            clean, to_hash = selected
+            hashes, stats, rehashed = hash_changed_files(
+                to_hash, root, saved_hashes, saved_stats, stat_time_ns,
+                jobs=jobs, verify=verify, hash_fn=compute_git_blob_hash,
+            )
+            hashes.update(clean)
+            return hashes, stats, rehashed, "git"
+        print("git unavailable, falling back to filesystem scan", file=sys.stderr)
     
-    # Hash the concatenation of path:hash pairs
+    if saved_algo != SOURCE_HASH_ALGO["fs"]:
+        # Cached hashes from another algorithm can never be reused
+        saved_hashes, saved_stats = {}, {}
+    selected_files = selector_for(root, metadata).select(prefix)
+    hashes, stats, rehashed = hash_changed_files(
+        selected_files, root, saved_hashes, saved_stats, stat_time_ns,
+        jobs=jobs, verify=verify,
+        hash_fn=chunk_tracker.hash_file if chunk_tracker is not None else compute_file_hash,
+    )
+    return hashes, stats, rehashed, "fs"
+
+
+FOLDER_HASH_SCHEME = "merkle-v1"
+
+
+def _split_parent(path: str) -> Tuple[str, str]:
+    """Split a relative path into (parent folder, name); the root folder is "."."""
+    parent, _, name = path.rpartition("/")
+    return (parent or "."), name
+
+
+def _hash_folder_entries(entries: List[Tuple[str, str]]) -> str:
     hasher = hashlib.md5()
-    for path, hash_val in folder_files:
-        hasher.update(f"{path}:{hash_val}\n".encode())
+    for name, hash_val in sorted(entries):
+        hasher.update(f"{name}:{hash_val}\n".encode())
     return hasher.hexdigest()
 
 
+def _folder_depth(folder: str) -> int:
+    return 0 if folder == "." else folder.count("/") + 1
+
+
+def update_folder_hashes(
+    folder_hashes: Dict[str, str],
+    file_hashes: Dict[str, str],
+    changed_paths: Set[str],
+) -> Dict[str, str]:
+    """Recompute Merkle folder hashes for the ancestors of changed files only.
+
+    A folder's hash covers its direct children: files as "name:hash" and
+    subfolders as "name/:hash". Dirty folders are processed deepest first,
+    so each one only reads its children's already-final hashes.
+    """
+    dirty: Set[str] = set()
+    for path in changed_paths:
+        folder = _split_parent(path)[0]
+        while folder not in dirty:
+            dirty.add(folder)
+            if folder == ".":
+                break
+            folder = _split_parent(folder)[0]
+    if not dirty:
+        return dict(folder_hashes)
+
+    # Direct children of the dirty folders, gathered in a single pass
+    entries: Dict[str, List[Tuple[str, str]]] = {folder: [] for folder in dirty}
+    for path, hash_val in file_hashes.items():
+        parent, name = _split_parent(path)
+        if parent in entries:
+            entries[parent].append((name, hash_val))
+    for folder, hash_val in folder_hashes.items():
+        if folder == "." or folder in dirty:
+            continue
+        parent, name = _split_parent(folder)
+        if parent in entries:
+            entries[parent].append((f"{name}/", hash_val))
+
+    result = {k: v for k, v in folder_hashes.items() if k not in dirty}
+    for folder in sorted(dirty, key=_folder_depth, reverse=True):
+        children = entries[folder]
+        if not children:
+            continue
+        result[folder] = _hash_folder_entries(children)
+        if folder != ".":
+            parent, name = _split_parent(folder)
+            entries[parent].append((f"{name}/", result[folder]))
+    result.setdefault(".", "")
+    return result
+
+
+def compute_folder_hashes(file_hashes: Dict[str, str]) -> Dict[str, str]:
+    """Compute Merkle hashes for every folder containing files, bottom-up in one pass."""
+    return update_folder_hashes({}, file_hashes, set(file_hashes))
+
+
+def compute_folder_hash(folder: str, file_hashes: Dict[str, str]) -> str:
+    """Compute a stable hash for a folder based on its files."""
+    return compute_folder_hashes(file_hashes).get(folder, "")
+
+
 def get_folders_with_files(files: List[Path], root: Path) -> Set[str]:
     """Get all unique folders that contain selected files."""
     folders = set()
@@ -194,6 +1055,240 @@ def save_state(root: Path, state: dict) -> None:
         json.dump(state, f, indent=2)
 
 
+def _prefix_bounds(prefix: str) -> Tuple[str, str]:
+    """Half-open key range [low, high) covering every path below a folder."""
+    low = prefix.rstrip("/") + "/"
+    return low, low[:-1] + "0"  # "0" sorts right after "/"
+
+
+def _under(path: str, prefix: Optional[str]) -> bool:
+    return not prefix or prefix == "." or path.startswith(prefix.rstrip("/") + "/")
+
+
+class JsonStateStore:
+    """State kept in a single cartography.json document (the original format)."""
+
+    backend = "json"
+
+    def __init__(self, root: Path, state: Optional[dict] = None):
+        self.root = root
+        self.path = root / STATE_DIR / STATE_FILE
+        self._state = state if state is not None else (load_state(root) or {})
+
+    def load_metadata(self) -> dict:
+        return dict(self._state.get("metadata", {}))
+
+    def load_files(self, prefix: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, List[int]]]:
+        hashes = {p: h for p, h in self._state.get("file_hashes", {}).items() if _under(p, prefix)}
+        stats = {p: st for p, st in self._state.get("file_stats", {}).items() if p in hashes}
+        return hashes, stats
+
+    def load_folders(self, prefix: Optional[str] = None) -> Dict[str, str]:
+        return {p: h for p, h in self._state.get("folder_hashes", {}).items() if _under(p, prefix)}
+
+    def load_chunks(self, prefix: Optional[str] = None) -> Dict[str, List[list]]:
+        return {p: c for p, c in self._state.get("file_chunks", {}).items() if _under(p, prefix)}
+
+    def commit(
+        self,
+        metadata: dict,
+        files: Dict[str, Tuple[str, Optional[List[int]]]],
+        removed_files: Set[str],
+        folders: Dict[str, str],
+        removed_folders: Set[str],
+        chunks: Optional[Dict[str, Optional[List[list]]]] = None,
+    ) -> None:
+        state = self._state
+        file_hashes = state.setdefault("file_hashes", {})
+        file_stats = state.setdefault("file_stats", {})
+        folder_hashes = state.setdefault("folder_hashes", {})
+        file_chunks = state.get("file_chunks", {})
+        for path in removed_files:
+            file_hashes.pop(path, None)
+            file_stats.pop(path, None)
+            file_chunks.pop(path, None)
+        for path, chunk_list in (chunks or {}).items():
+            if chunk_list is None:
+                file_chunks.pop(path, None)
+            else:
+                file_chunks[path] = chunk_list
+        if file_chunks:
+            state["file_chunks"] = file_chunks
+        else:
+            state.pop("file_chunks", None)
+        for path, (hash_val, stat) in files.items():
+            file_hashes[path] = hash_val
+            if stat is None:
+                file_stats.pop(path, None)
+            else:
+                file_stats[path] = stat
+        for path in removed_folders:
+            folder_hashes.pop(path, None)
+        folder_hashes.update(folders)
+        state["metadata"] = metadata
+        save_state(self.root, state)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteStateStore:
+    """State kept in cartography.db: one row per file/folder, keyed by path.
+
+    Updates upsert only the rows that changed inside a single transaction,
+    and folder-scoped reads use a range scan on the primary key instead of
+    loading the whole map.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.path = root / STATE_DIR / STATE_DB_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY, value TEXT NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY, hash TEXT NOT NULL,
+                    size INTEGER, mtime_ns INTEGER, ino INTEGER
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS folders (
+                    path TEXT PRIMARY KEY, hash TEXT NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS chunks (
+                    path TEXT PRIMARY KEY, data TEXT NOT NULL
+                ) WITHOUT ROWID;
+                """
+            )
+
+    def _range_query(self, table: str, columns: str, prefix: Optional[str]):
+        if not prefix or prefix == ".":
+            return self._conn.execute(f"SELECT {columns} FROM {table}")
+        low, high = _prefix_bounds(prefix)
+        return self._conn.execute(
+            f"SELECT {columns} FROM {table} WHERE path >= ? AND path < ?", (low, high)
+        )
+
+    def load_metadata(self) -> dict:
+        rows = self._conn.execute("SELECT key, value FROM meta")
+        return {key: json.loads(value) for key, value in rows}
+
+    def load_files(self, prefix: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, List[int]]]:
+        hashes: Dict[str, str] = {}
+        stats: Dict[str, List[int]] = {}
+        for path, hash_val, size, mtime_ns, ino in self._range_query(
+            "files", "path, hash, size, mtime_ns, ino", prefix
+        ):
+            hashes[path] = hash_val
+            if size is not None:
+                stats[path] = [size, mtime_ns, ino]
+        return hashes, stats
+
+    def load_folders(self, prefix: Optional[str] = None) -> Dict[str, str]:
+        return dict(self._range_query("folders", "path, hash", prefix))
+
+    def load_chunks(self, prefix: Optional[str] = None) -> Dict[str, List[list]]:
+        return {path: json.loads(data) for path, data in self._range_query("chunks", "path, data", prefix)}
+
+    def commit(
+        self,
+        metadata: dict,
+        files: Dict[str, Tuple[str, Optional[List[int]]]],
+        removed_files: Set[str],
+        folders: Dict[str, str],
+        removed_folders: Set[str],
+        chunks: Optional[Dict[str, Optional[List[list]]]] = None,
+    ) -> None:
+        chunks = chunks or {}
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?", ((p,) for p in removed_files)
+            )
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE path = ?",
+                ((p,) for p in removed_files | {p for p, c in chunks.items() if c is None}),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (path, data) VALUES (?, ?)",
+                ((p, json.dumps(c, separators=(",", ":"))) for p, c in chunks.items() if c is not None),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, hash, size, mtime_ns, ino) VALUES (?, ?, ?, ?, ?)",
+                ((p, h, *(st or (None, None, None))) for p, (h, st) in files.items()),
+            )
+            self._conn.executemany(
+                "DELETE FROM folders WHERE path = ?", ((p,) for p in removed_folders)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO folders (path, hash) VALUES (?, ?)", folders.items()
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                ((k, json.dumps(v)) for k, v in metadata.items()),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _import_state(store, state: dict) -> None:
+    file_stats = state.get("file_stats", {})
+    store.commit(
+        state.get("metadata", {}),
+        {p: (h, file_stats.get(p)) for p, h in state.get("file_hashes", {}).items()},
+        set(),
+        state.get("folder_hashes", {}),
+        set(),
+        state.get("file_chunks", {}),
+    )
+
+
+def create_state_store(root: Path, backend: str = "sqlite"):
+    """Create a fresh, empty state store, discarding any previous state."""
+    state_dir = root / STATE_DIR
+    for name in (STATE_FILE, STATE_DB_FILE, STATE_DB_FILE + "-wal", STATE_DB_FILE + "-shm"):
+        if (state_dir / name).exists():
+            (state_dir / name).unlink()
+    if backend == "sqlite" and sqlite3 is not None:
+        return SqliteStateStore(root)
+    return JsonStateStore(root, {})
+
+
+def open_state_store(root: Path, migrate: bool = True):
+    """Open existing state, migrating a legacy cartography.json to sqlite on first use.
+
+    Read-only commands pass migrate=False: they read the JSON as-is and
+    leave the migration to the next command that writes state.
+    """
+    if sqlite3 is not None and (root / STATE_DIR / STATE_DB_FILE).exists():
+        return SqliteStateStore(root)
+    state = load_state(root)
+    if not state:
+        return None
+    if not migrate or sqlite3 is None or state.get("metadata", {}).get("state_backend") == "json":
+        return JsonStateStore(root, state)
+    
+    json_path = root / STATE_DIR / STATE_FILE
+    store = SqliteStateStore(root)
+    try:
+        state.setdefault("metadata", {})["state_backend"] = "sqlite"
+        _import_state(store, state)
+    except Exception:
+        store.close()
+        store.path.unlink()
+        raise
+    json_path.replace(json_path.with_name(STATE_FILE + ".bak"))
+    print(f"Migrated {STATE_DIR}/{STATE_FILE} to {STATE_DIR}/{STATE_DB_FILE}", file=sys.stderr)
+    return store
+
+
 def create_empty_codemap(folder_path: Path, folder_name: str) -> None:
     """Create an empty codemap.md file with a header."""
     codemap_path = folder_path / CODEMAP_FILE
@@ -222,6 +1317,24 @@ def create_empty_codemap(folder_path: Path, folder_name: str) -> None:
             f.write(content)
 
 
+SOURCE_HASH_ALGO = {"fs": "md5", "git": "git-sha1"}
+
+
+def resolve_source(args: argparse.Namespace, metadata: dict) -> Optional[str]:
+    """Pick the scan source, refusing to compare hashes across algorithms."""
+    saved = metadata.get("source", "fs")
+    source = args.source or saved
+    if SOURCE_HASH_ALGO[source] != metadata.get("hash_algo", "md5"):
+        if args.command != "update":
+            print(
+                f"State was built with --source {saved}. "
+                f"Run 'update --source {source}' to switch.",
+                file=sys.stderr,
+            )
+            return None
+    return source
+
+
 def cmd_init(args: argparse.Namespace) -> int:
     """Initialize mapping: create hashes and empty codemaps."""
     root = Path(args.root).resolve()
@@ -231,7 +1344,6 @@ def cmd_init(args: argparse.Namespace) -> int:
         return 1
     
     # Load patterns
-    gitignore = load_gitignore(root)
     include_patterns = args.include or ["**/*"]
     exclude_patterns = args.exclude or []
     exceptions = args.exception or []
@@ -241,42 +1353,60 @@ def cmd_init(args: argparse.Namespace) -> int:
     print(f"Exclude patterns: {exclude_patterns}")
     print(f"Exceptions: {exceptions}")
     
-    # Select files
-    selected_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
+    # Select files and compute file hashes
+    metadata = {
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "exceptions": exceptions,
+    }
+    chunk_threshold = parse_size(args.chunk_threshold)
+    chunk_tracker = chunk_tracker_for(
+        root, {"chunk_threshold": chunk_threshold}, None, args.source
+    )
+    stat_time_ns = time.time_ns()
+    file_hashes, file_stats, _, source = scan_repository(
+        root, metadata, {}, {}, args.source, jobs=args.jobs, chunk_tracker=chunk_tracker
     )
+    selected_files = [root / path for path in sorted(file_hashes)]
     
     print(f"Selected {len(selected_files)} files")
     
-    # Compute file hashes
-    file_hashes: Dict[str, str] = {}
-    for f in selected_files:
-        rel_path = str(f.relative_to(root))
-        file_hashes[rel_path] = compute_file_hash(f)
-    
     # Get folders and compute folder hashes
     folders = get_folders_with_files(selected_files, root)
-    folder_hashes: Dict[str, str] = {}
-    for folder in folders:
-        folder_hashes[folder] = compute_folder_hash(folder, file_hashes)
+    folder_hashes = compute_folder_hashes(file_hashes)
     
     # Create state
-    state = {
-        "metadata": {
-            "version": VERSION,
-            "last_run": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-            "root": str(root),
-            "include_patterns": include_patterns,
-            "exclude_patterns": exclude_patterns,
-            "exceptions": exceptions,
-        },
-        "file_hashes": file_hashes,
-        "folder_hashes": folder_hashes,
+    metadata = {
+        "version": VERSION,
+        "last_run": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "root": str(root),
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "exceptions": exceptions,
+        "stat_time_ns": stat_time_ns,
+        "folder_hash_scheme": FOLDER_HASH_SCHEME,
+        "source": source,
+        "hash_algo": SOURCE_HASH_ALGO[source],
+        "commit": git_head(root),
+        "chunk_threshold": chunk_threshold,
+        "chunk_scheme": CHUNK_SCHEME,
     }
     
     # Save state
-    save_state(root, state)
-    print(f"Created {STATE_DIR}/{STATE_FILE}")
+    store = create_state_store(root, args.state_backend)
+    metadata["state_backend"] = store.backend
+    _import_state(
+        store,
+        {
+            "metadata": metadata,
+            "file_hashes": file_hashes,
+            "file_stats": file_stats,
+            "folder_hashes": folder_hashes,
+            "file_chunks": chunk_tracker.chunks if chunk_tracker and source == "fs" else {},
+        },
+    )
+    store.close()
+    print(f"Created {STATE_DIR}/{store.path.name}")
     
     # Create empty codemaps
     for folder in folders:
@@ -294,48 +1424,35 @@ def cmd_init(args: argparse.Namespace) -> int:
     return 0
 
 
-def cmd_changes(args: argparse.Namespace) -> int:
-    """Show what changed since last update."""
-    root = Path(args.root).resolve()
-    
-    state = load_state(root)
-    if not state:
-        print("No cartography state found. Run 'init' first.", file=sys.stderr)
-        return 1
-    
-    # Get patterns from saved state
-    metadata = state.get("metadata", {})
-    include_patterns = metadata.get("include_patterns", ["**/*"])
-    exclude_patterns = metadata.get("exclude_patterns", [])
-    exceptions = metadata.get("exceptions", [])
-    
-    gitignore = load_gitignore(root)
-    
-    # Select current files
-    current_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
-    )
-    
-    # Compute current hashes
-    current_hashes: Dict[str, str] = {}
-    for f in current_files:
-        rel_path = str(f.relative_to(root))
-        current_hashes[rel_path] = compute_file_hash(f)
-    
-    saved_hashes = state.get("file_hashes", {})
-    
-    # Find changes
-    added = set(current_hashes.keys()) - set(saved_hashes.keys())
-    removed = set(saved_hashes.keys()) - set(current_hashes.keys())
+def diff_hashes(
+    saved: Dict[str, str], current: Dict[str, str]
+) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Return (added, removed, modified) paths between two hash maps."""
+    added = current.keys() - saved.keys()
+    removed = saved.keys() - current.keys()
     modified = {
         path
-        for path in current_hashes.keys() & saved_hashes.keys()
-        if current_hashes[path] != saved_hashes[path]
+        for path in current.keys() & saved.keys()
+        if current[path] != saved[path]
     }
-    
+    return added, removed, modified
+
+
+def affected_folders(paths: Set[str]) -> Set[str]:
+    """Every folder (and ancestor folder) containing one of the paths."""
+    folders = set()
+    for path in paths:
+        parts = path.split("/")[:-1]
+        for i in range(len(parts)):
+            folders.add("/".join(parts[: i + 1]))
+        folders.add(".")
+    return folders
+
+
+def print_changes(added: Set[str], removed: Set[str], modified: Set[str]) -> None:
     if not added and not removed and not modified:
         print("No changes detected.")
-        return 0
+        return
     
     if added:
         print(f"\n{len(added)} added:")
@@ -353,61 +1470,511 @@ def cmd_changes(args: argparse.Namespace) -> int:
             print(f"  ~ {path}")
     
     # Show affected folders
-    affected_folders = set()
-    for path in added | removed | modified:
-        parts = Path(path).parts[:-1]
-        for i in range(len(parts)):
-            affected_folders.add("/".join(parts[: i + 1]))
-        affected_folders.add(".")
-    
-    print(f"\n{len(affected_folders)} folders affected:")
-    for folder in sorted(affected_folders):
+    folders = affected_folders(added | removed | modified)
+    print(f"\n{len(folders)} folders affected:")
+    for folder in sorted(folders):
         print(f"  {folder}/")
+
+
+def _state_marker(root: Path) -> Optional[int]:
+    """mtime of the state file, used by the watcher to notice an `update`."""
+    for name in (STATE_DB_FILE + "-wal", STATE_DB_FILE, STATE_FILE):
+        try:
+            return os.stat(root / STATE_DIR / name).st_mtime_ns
+        except OSError:
+            continue
+    return None
+
+
+def read_watch_report(root: Path, metadata: dict, source: str) -> Optional[dict]:
+    """Load the watcher's report if it is live and matches the saved state."""
+    try:
+        with open(root / STATE_DIR / WATCH_FILE, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        report.get("pending")
+        or report.get("source") != source
+        or report.get("state_last_run") != metadata.get("last_run")
+        or time.time_ns() - report.get("heartbeat_ns", 0) > report.get("stale_after_ns", 0)
+    ):
+        return None
+    return report
+
+
+class _PollingBackend:
+    """Fallback event source: every wakeup requests a stat-only rescan."""
+
+    name = "polling"
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(timeout)
+        return None
+
+    def sync(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    """Linux inotify event source via the pure-Python inotify_simple binding."""
+
+    name = "inotify"
+
+    def __init__(self, selector: "FileSelector"):
+        from inotify_simple import INotify, flags  # type: ignore
+        
+        self._flags = flags
+        self._inotify = INotify()
+        self._mask = (
+            flags.CREATE | flags.DELETE | flags.MODIFY | flags.CLOSE_WRITE
+            | flags.MOVED_FROM | flags.MOVED_TO | flags.ATTRIB
+        )
+        self._selector = selector
+        self._dirs: Dict[int, str] = {}
+        self.sync()
+
+    def sync(self) -> None:
+        """Watch every directory the selector would walk (new ones included)."""
+        watched = set(self._dirs.values())
+        for rel_dir, _ in self._selector.walk_directories():
+            if rel_dir in watched:
+                continue
+            try:
+                wd = self._inotify.add_watch(str(self._selector.root / rel_dir), self._mask)
+            except OSError:
+                continue
+            self._dirs[wd] = rel_dir
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        touched: Set[str] = set()
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            if event.mask & (self._flags.Q_OVERFLOW | self._flags.ISDIR | self._flags.IGNORED):
+                # Lost events or directory layout changed: fall back to a rescan
+                return None
+            rel_dir = self._dirs.get(event.wd)
+            if rel_dir is None or not event.name:
+                continue
+            touched.add(f"{rel_dir}/{event.name}" if rel_dir else event.name)
+        return touched
+
+
+class TreeWatcher:
+    """Keeps an in-memory file/folder hash tree in sync with the work tree.
+
+    After each debounced burst of events only the touched files are
+    rehashed, and the diff against the saved state is written to
+    .miya/cartography-watch.json for `changes` to read.
+    """
+
+    def __init__(self, root: Path, jobs: int = 0, interval_s: float = 1.0, debounce_s: float = 0.2):
+        self.root = root
+        self.jobs = jobs
+        self.interval_s = interval_s
+        self.debounce_s = debounce_s
+        self.hashes: Dict[str, str] = {}
+        self.stats: Dict[str, List[int]] = {}
+        self.folder_hashes: Dict[str, str] = {}
+        self.stat_time_ns = 0
+
+    def load_baseline(self) -> bool:
+        store = open_state_store(self.root, migrate=False)
+        if not store:
+            return False
+        self.metadata = store.load_metadata()
+        self.saved_hashes, saved_stats = store.load_files()
+        store.close()
+        self.source = self.metadata.get("source", "fs")
+        self.selector = selector_for(self.root, self.metadata)
+        self.state_marker = _state_marker(self.root)
+        if not self.hashes:
+            self.hashes = dict(self.saved_hashes)
+            self.stats = saved_stats
+            self.stat_time_ns = self.metadata.get("stat_time_ns", 0)
+            self.folder_hashes = compute_folder_hashes(self.hashes)
+        return True
+
+    def _apply(self, hashes: Dict[str, str], stats: Dict[str, List[int]]) -> None:
+        changed = {p for p in hashes.keys() | self.hashes.keys() if hashes.get(p) != self.hashes.get(p)}
+        self.folder_hashes = update_folder_hashes(self.folder_hashes, hashes, changed)
+        self.hashes = hashes
+        self.stats = stats
+
+    def rescan(self) -> None:
+        stat_time_ns = time.time_ns()
+        metadata = dict(self.metadata, stat_time_ns=self.stat_time_ns)
+        hashes, stats, _, _ = scan_repository(
+            self.root, metadata, self.hashes, self.stats, self.source, jobs=self.jobs
+        )
+        self.stat_time_ns = stat_time_ns
+        self._apply(hashes, stats)
+
+    def refresh_paths(self, rel_paths: Set[str]) -> None:
+        """Rehash only the touched files (filesystem source)."""
+        if self.source != "fs":
+            self.rescan()
+            return
+        hashes = dict(self.hashes)
+        stats = dict(self.stats)
+        wanted = []
+        for rel_path in rel_paths:
+            full = self.root / rel_path
+            if self.selector.admits(rel_path) and full.is_file():
+                wanted.append(full)
+            else:
+                hashes.pop(rel_path, None)
+                stats.pop(rel_path, None)
+        # Keep the older stat_time_ns: it only makes the racy-clean check stricter
+        new_hashes, new_stats, _ = hash_changed_files(
+            wanted, self.root, self.hashes, self.stats, self.stat_time_ns, jobs=self.jobs
+        )
+        for rel_path in {f.relative_to(self.root).as_posix() for f in wanted} - new_hashes.keys():
+            hashes.pop(rel_path, None)
+            stats.pop(rel_path, None)
+        hashes.update(new_hashes)
+        stats.update(new_stats)
+        self._apply(hashes, stats)
+
+    def write_report(self, pending: bool = False) -> dict:
+        added, removed, modified = diff_hashes(self.saved_hashes, self.hashes)
+        report = {
+            "pid": os.getpid(),
+            "heartbeat_ns": time.time_ns(),
+            "stale_after_ns": int(max(3 * self.interval_s, 5.0) * 1e9),
+            "pending": pending,
+            "source": self.source,
+            "state_last_run": self.metadata.get("last_run"),
+            "tree_hash": self.folder_hashes.get(".", ""),
+            "added": sorted(added),
+            "removed": sorted(removed),
+            "modified": sorted(modified),
+            "affected_folders": sorted(affected_folders(added | removed | modified)),
+        }
+        path = self.root / STATE_DIR / WATCH_FILE
+        tmp = path.with_name(WATCH_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        os.replace(tmp, path)
+        return report
+
+    def make_backend(self, polling: bool = False):
+        if not polling and self.source == "fs":
+            try:
+                return _InotifyBackend(self.selector)
+            except Exception:
+                pass
+        return _PollingBackend()
+
+    def run(self, polling: bool = False, max_cycles: Optional[int] = None) -> None:
+        self.rescan()
+        self.write_report()
+        backend = self.make_backend(polling)
+        print(f"Watching {self.root} ({backend.name}); Ctrl+C to stop", file=sys.stderr)
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            cycles += 1
+            touched = backend.wait(self.interval_s)
+            if touched or touched is None:
+                self.write_report(pending=True)
+                # Debounce: keep collecting until the burst goes quiet
+                while touched is not None:
+                    more = backend.wait(self.debounce_s)
+                    if more is None:
+                        touched = None
+                    elif not more:
+                        break
+                    else:
+                        touched |= more
+            if _state_marker(self.root) != self.state_marker:
+                self.load_baseline()
+            if touched is None:
+                backend.sync()
+                self.rescan()
+            elif touched:
+                self.refresh_paths(touched)
+            self.write_report()
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """Keep hashes up to date in the background and publish changes for `changes`."""
+    root = Path(args.root).resolve()
+    
+    watcher = TreeWatcher(root, args.jobs, args.interval, args.debounce_ms / 1000.0)
+    if not watcher.load_baseline():
+        print("No cartography state found. Run 'init' first.", file=sys.stderr)
+        return 1
     
+    try:
+        watcher.run(polling=args.poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        report = root / STATE_DIR / WATCH_FILE
+        if report.exists():
+            report.unlink()
     return 0
 
 
-def cmd_update(args: argparse.Namespace) -> int:
-    """Update hashes and save state."""
+def normalize_scope(root: Path, path: Optional[str]) -> Optional[str]:
+    """Turn --path into a root-relative folder prefix ("" for the whole repo)."""
+    if not path:
+        return ""
+    candidate = Path(path)
+    if candidate.is_absolute():
+        try:
+            candidate = candidate.resolve().relative_to(root)
+        except ValueError:
+            return None
+    scope = candidate.as_posix().strip("/")
+    if scope in ("", "."):
+        return ""
+    if scope == ".." or scope.startswith("../"):
+        return None
+    return scope[2:] if scope.startswith("./") else scope
+
+
+def _format_bytes(count: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024 or unit == "MiB":
+            return f"{count} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GiB"
+
+
+def print_change_volume(details: dict) -> None:
+    regions = details.get("regions", {})
+    if regions:
+        # 每个文件都已整体重读并哈希；这里列出的是内容变化落在哪些块里，不是读取范围。
+        print(f"\n{len(regions)} chunked files changed (each re-read in full; byte ranges of rewritten chunks):")
+        for path, delta in sorted(regions.items()):
+            spans = ", ".join(f"{start}-{end}" for start, end in delta["regions"][:5])
+            more = " ..." if len(delta["regions"]) > 5 else ""
+            print(
+                f"  ~ {path}: {_format_bytes(delta['changed_bytes'])} in rewritten chunks, "
+                f"{_format_bytes(delta['removed_bytes'])} of old chunks gone [{spans}{more}]"
+            )
+    volume = details.get("folder_changed_bytes", {})
+    if volume:
+        print("\nChanged bytes by folder:")
+        for folder, count in sorted(volume.items(), key=lambda item: (-item[1], item[0])):
+            print(f"  {folder}/  {_format_bytes(count)}")
+
+
+def report_changes(
+    fmt: str,
+    added: Set[str],
+    removed: Set[str],
+    modified: Set[str],
+    info: dict,
+    details: Optional[dict] = None,
+) -> None:
+    """Print changes as text, one JSON document, or newline-delimited JSON.
+
+    details (chunked mode) carries changed regions of large files and the
+    changed byte volume per folder.
+    """
+    details = details or {}
+    if fmt == "text":
+        print_changes(added, removed, modified)
+        print_change_volume(details)
+        return
+    folders = sorted(affected_folders(added | removed | modified))
+    if fmt == "json":
+        print(json.dumps({
+            **info,
+            "added": sorted(added),
+            "removed": sorted(removed),
+            "modified": sorted(modified),
+            "affected_folders": folders,
+            **details,
+        }))
+        return
+    regions = details.get("regions", {})
+    for status, paths in (("added", added), ("removed", removed), ("modified", modified)):
+        for path in sorted(paths):
+            line = {"type": "file", "status": status, "path": path}
+            if path in regions:
+                line.update(regions[path])
+            print(json.dumps(line))
+    summary = {
+        "type": "summary",
+        **info,
+        "added": len(added),
+        "removed": len(removed),
+        "modified": len(modified),
+        "affected_folders": folders,
+    }
+    if "folder_changed_bytes" in details:
+        summary["folder_changed_bytes"] = details["folder_changed_bytes"]
+    print(json.dumps(summary))
+
+
+def cmd_changes(args: argparse.Namespace) -> int:
+    """Show what changed since last update (or since a commit), optionally under one folder."""
     root = Path(args.root).resolve()
+    scope = normalize_scope(root, args.path)
+    if scope is None:
+        print(f"--path must be inside {root}", file=sys.stderr)
+        return 1
     
-    state = load_state(root)
-    if not state:
+    store = open_state_store(root, migrate=False)
+    if not store:
         print("No cartography state found. Run 'init' first.", file=sys.stderr)
         return 1
     
-    # Get patterns from saved state
-    metadata = state.get("metadata", {})
-    include_patterns = metadata.get("include_patterns", ["**/*"])
-    exclude_patterns = metadata.get("exclude_patterns", [])
-    exceptions = metadata.get("exceptions", [])
+    metadata = store.load_metadata()
+    source = resolve_source(args, metadata)
+    if source is None:
+        store.close()
+        return 1
+    info = {"scope": scope or ".", "source": source, "since": metadata.get("last_run")}
+    
+    if args.since_commit is not None:
+        rev = args.since_commit or metadata.get("commit")
+        commit = git_head(root, rev) if rev else None
+        if commit is None:
+            store.close()
+            print(
+                f"Cannot resolve commit {rev!r}" if rev else "No commit recorded in state; pass a revision",
+                file=sys.stderr,
+            )
+            return 1
+        # Always ask git: the saved hashes may include uncommitted edits taken at
+        # update time, so they cannot stand in for the commit even when it matches
+        store.close()
+        changes = git_changes_since(root, commit, scope)
+        if changes is None:
+            print("git diff failed", file=sys.stderr)
+            return 1
+        if source == "git":
+            wanted = git_path_filter(
+                metadata.get("include_patterns", ["**/*"]),
+                metadata.get("exclude_patterns", []),
+                metadata.get("exceptions", []),
+            )
+        else:
+            wanted = selector_for(root, metadata).admits
+        added, removed, modified = ({p for p in paths if wanted(p)} for paths in changes)
+        report_changes(args.format, added, removed, modified, dict(info, since=commit))
+        return 0
+    
+    # A live watcher already knows the answer; no scan and no state load needed
+    if not args.no_watch and not args.verify:
+        report = read_watch_report(root, metadata, source)
+        if report is not None:
+            store.close()
+            added, removed, modified = (
+                {p for p in report[key] if _under(p, scope)}
+                for key in ("added", "removed", "modified")
+            )
+            report_changes(args.format, added, removed, modified, dict(info, watch=True))
+            return 0
     
-    gitignore = load_gitignore(root)
+    saved_hashes, saved_stats = store.load_files(scope)
+    chunk_tracker = chunk_tracker_for(root, metadata, store, source, scope)
+    store.close()
     
-    # Select current files
-    selected_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
+    # Compute current hashes, rehashing only files whose stat changed
+    current_hashes, current_stats, _, _ = scan_repository(
+        root,
+        metadata,
+        saved_hashes,
+        saved_stats,
+        source,
+        jobs=args.jobs,
+        verify=args.verify,
+        prefix=scope,
+        chunk_tracker=chunk_tracker,
     )
     
-    # Compute new hashes
-    file_hashes: Dict[str, str] = {}
-    for f in selected_files:
-        rel_path = str(f.relative_to(root))
-        file_hashes[rel_path] = compute_file_hash(f)
+    added, removed, modified = diff_hashes(saved_hashes, current_hashes)
+    details = None
+    if chunk_tracker is not None:
+        regions = {p: d for p, d in chunk_tracker.deltas.items() if p in modified}
+        details = {
+            "regions": regions,
+            "folder_changed_bytes": change_volume(
+                added, removed, modified, current_stats, saved_stats, regions
+            ),
+        }
+    report_changes(args.format, added, removed, modified, info, details)
+    return 0
+
+
+def cmd_update(args: argparse.Namespace) -> int:
+    """Update hashes and save state."""
+    root = Path(args.root).resolve()
     
-    # Compute folder hashes
-    folders = get_folders_with_files(selected_files, root)
-    folder_hashes: Dict[str, str] = {}
-    for folder in folders:
-        folder_hashes[folder] = compute_folder_hash(folder, file_hashes)
+    store = open_state_store(root)
+    if not store:
+        print("No cartography state found. Run 'init' first.", file=sys.stderr)
+        return 1
+    
+    metadata = store.load_metadata()
+    source = resolve_source(args, metadata)
+    if source is None:
+        store.close()
+        return 1
     
-    # Update state
-    state["metadata"]["last_run"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    state["file_hashes"] = file_hashes
-    state["folder_hashes"] = folder_hashes
+    # Compute new hashes, rehashing only files whose stat changed
+    saved_hashes, saved_stats = store.load_files()
+    chunk_tracker = chunk_tracker_for(root, metadata, store, source)
+    stat_time_ns = time.time_ns()
+    file_hashes, file_stats, rehashed, source = scan_repository(
+        root,
+        metadata,
+        saved_hashes,
+        saved_stats,
+        source,
+        jobs=args.jobs,
+        verify=args.verify,
+        chunk_tracker=chunk_tracker,
+    )
+    
+    # Compute folder hashes, touching only ancestors of changed files
+    saved_folders = store.load_folders()
+    changed = {
+        path
+        for path in file_hashes.keys() | saved_hashes.keys()
+        if file_hashes.get(path) != saved_hashes.get(path)
+    }
+    if metadata.get("folder_hash_scheme") == FOLDER_HASH_SCHEME:
+        folder_hashes = update_folder_hashes(saved_folders, file_hashes, changed)
+    else:
+        folder_hashes = compute_folder_hashes(file_hashes)
     
-    save_state(root, state)
-    print(f"Updated {STATE_DIR}/{STATE_FILE} with {len(file_hashes)} files")
+    # Update state, writing only the rows that changed
+    metadata["last_run"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    metadata["stat_time_ns"] = stat_time_ns
+    metadata["folder_hash_scheme"] = FOLDER_HASH_SCHEME
+    metadata["source"] = source
+    metadata["hash_algo"] = SOURCE_HASH_ALGO[source]
+    metadata["commit"] = git_head(root)
+    metadata["state_backend"] = store.backend
+    changed_rows = {
+        path: (hash_val, file_stats.get(path))
+        for path, hash_val in file_hashes.items()
+        if path in changed or file_stats.get(path) != saved_stats.get(path)
+    }
+    removed_files = saved_hashes.keys() - file_hashes.keys()
+    if chunk_tracker is not None and source == "fs":
+        chunk_rows = chunk_tracker.commit_rows(removed_files)
+    else:
+        # Chunk lists only describe filesystem scans; drop any left from before
+        chunk_rows = {p: None for p in store.load_chunks()}
+    store.commit(
+        metadata,
+        changed_rows,
+        removed_files,
+        {k: v for k, v in folder_hashes.items() if saved_folders.get(k) != v},
+        saved_folders.keys() - folder_hashes.keys(),
+        chunk_rows,
+    )
+    store.close()
+    print(
+        f"Updated {STATE_DIR}/{store.path.name} with {len(file_hashes)} files "
+        f"({rehashed} rehashed, {len(changed_rows)} rows written)"
+    )
     
     return 0
 
@@ -430,14 +1997,79 @@ def main() -> int:
     init_parser.add_argument(
         "--exception", action="append", help="Explicit file paths to include despite exclusions"
     )
+    init_parser.add_argument(
+        "--jobs", type=int, default=0, help="Hashing worker threads (default: 2x CPU count)"
+    )
+    init_parser.add_argument(
+        "--source", choices=["fs", "git"], default="fs",
+        help="List files by walking the filesystem or from the git index",
+    )
+    init_parser.add_argument(
+        "--state-backend", choices=["sqlite", "json"], default="sqlite",
+        help="Store state in .miya/cartography.db (default) or .miya/cartography.json",
+    )
+    init_parser.add_argument(
+        "--chunk-threshold", default="0",
+        help="Track content-defined chunks for files at least this big, e.g. 32m (default: off)",
+    )
     
     # Changes command
     changes_parser = subparsers.add_parser("changes", help="Show what changed")
     changes_parser.add_argument("--root", required=True, help="Repository root path")
+    changes_parser.add_argument(
+        "--jobs", type=int, default=0, help="Hashing worker threads (default: 2x CPU count)"
+    )
+    changes_parser.add_argument(
+        "--verify", action="store_true", help="Rehash every file, ignoring cached stat info"
+    )
+    changes_parser.add_argument(
+        "--source", choices=["fs", "git"], help="Override the scan source saved in state"
+    )
+    changes_parser.add_argument(
+        "--no-watch", action="store_true", help="Scan even if a live watcher has a fresh report"
+    )
+    changes_parser.add_argument(
+        "--format", choices=["text", "json", "ndjson"], default="text", help="Output format"
+    )
+    changes_parser.add_argument(
+        "--path", help="Only report (and only scan) files under this folder, relative to --root"
+    )
+    changes_parser.add_argument(
+        "--since-commit",
+        nargs="?",
+        const="",
+        metavar="REV",
+        help="Report changes since a commit (default: the commit recorded at the last update)",
+    )
     
     # Update command
     update_parser = subparsers.add_parser("update", help="Update hashes")
     update_parser.add_argument("--root", required=True, help="Repository root path")
+    update_parser.add_argument(
+        "--jobs", type=int, default=0, help="Hashing worker threads (default: 2x CPU count)"
+    )
+    update_parser.add_argument(
+        "--verify", action="store_true", help="Rehash every file, ignoring cached stat info"
+    )
+    update_parser.add_argument(
+        "--source", choices=["fs", "git"], help="Override the scan source saved in state"
+    )
+    
+    # Watch command
+    watch_parser = subparsers.add_parser("watch", help="Track changes continuously")
+    watch_parser.add_argument("--root", required=True, help="Repository root path")
+    watch_parser.add_argument(
+        "--jobs", type=int, default=0, help="Hashing worker threads (default: 2x CPU count)"
+    )
+    watch_parser.add_argument(
+        "--interval", type=float, default=1.0, help="Seconds between heartbeats/polls"
+    )
+    watch_parser.add_argument(
+        "--debounce-ms", type=int, default=200, help="Quiet period that ends a burst of events"
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="Poll with stat scans instead of inotify"
+    )
     
     args = parser.parse_args()
     
@@ -447,6 +2079,8 @@ def main() -> int:
         return cmd_changes(args)
     elif args.command == "update":
         return cmd_update(args)
+    elif args.command == "watch":
+        return cmd_watch(args)
     else:
         parser.print_help()
         return 1
@@ -1,11 +1,18 @@
+import argparse
+import contextlib
+import io
 import unittest
+import unittest.mock
 import os
 import shutil
 import json
+import subprocess
 import tempfile
 import hashlib
+import time
 from pathlib import Path
-from cartographer import PatternMatcher, compute_file_hash, compute_folder_hash, select_files
+import cartographer
+from cartographer import PatternMatcher, compute_file_hash, compute_file_hashes, compute_folder_hash, compute_folder_hashes, hash_changed_files, select_files, stat_key, update_folder_hashes
 
 class TestCartographer(unittest.TestCase):
     def test_pattern_matcher(self):
@@ -30,6 +37,17 @@ class TestCartographer(unittest.TestCase):
         self.assertFalse(matcher.matches("README.md"))
         self.assertFalse(matcher.matches("tests/test.py"))
 
+    def test_pattern_matcher_covers_directory(self):
+        matcher = PatternMatcher(["node_modules/", "dist/**", "build/*", "*.log"])
+        self.assertTrue(matcher.covers_directory("node_modules"))
+        self.assertTrue(matcher.covers_directory("pkg/node_modules"))
+        self.assertTrue(matcher.covers_directory("dist"))
+        self.assertTrue(matcher.covers_directory("dist/sub"))
+        # build/* only covers direct children, nested files would not match
+        self.assertFalse(matcher.covers_directory("build"))
+        self.assertFalse(matcher.covers_directory("logs"))
+        self.assertFalse(matcher.covers_directory("src"))
+
     def test_compute_file_hash(self):
         # Use binary mode to avoid any newline translation issues
         with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f:
@@ -46,6 +64,59 @@ class TestCartographer(unittest.TestCase):
             if os.path.exists(f_path):
                 os.unlink(f_path)
 
+    def test_compute_file_hashes_parallel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            files = []
+            for i in range(20):
+                path = root / "src" / f"f{i}.txt"
+                path.write_bytes(f"content {i}".encode() * (i + 1))
+                files.append(path)
+
+            serial = compute_file_hashes(files, root, jobs=1)
+            parallel = compute_file_hashes(files, root, jobs=8)
+            self.assertEqual(serial, parallel)
+            self.assertEqual(serial["src/f3.txt"], hashlib.md5(b"content 3" * 4).hexdigest())
+
+    def test_compute_file_hash_mmap(self):
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f:
+            f.write(b"x" * 4096)
+            f_path = f.name
+
+        original = cartographer.MMAP_THRESHOLD
+        cartographer.MMAP_THRESHOLD = 1024
+        try:
+            self.assertEqual(compute_file_hash(Path(f_path)), hashlib.md5(b"x" * 4096).hexdigest())
+        finally:
+            cartographer.MMAP_THRESHOLD = original
+            os.unlink(f_path)
+
+    def test_hash_changed_files_uses_stat_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            a = root / "a.txt"
+            b = root / "b.txt"
+            a.write_text("alpha")
+            b.write_text("beta")
+            later = time.time_ns() + 10**9
+            saved_hashes = {"a.txt": "cached-a", "b.txt": "cached-b"}
+            saved_stats = {"a.txt": stat_key(a), "b.txt": [0, 0, 0]}
+
+            hashes, stats, rehashed = hash_changed_files([a, b], root, saved_hashes, saved_stats, later)
+            self.assertEqual(hashes["a.txt"], "cached-a")
+            self.assertEqual(hashes["b.txt"], hashlib.md5(b"beta").hexdigest())
+            self.assertEqual(rehashed, 1)
+            self.assertEqual(stats["b.txt"], stat_key(b))
+
+            hashes, _, rehashed = hash_changed_files([a, b], root, saved_hashes, saved_stats, later, verify=True)
+            self.assertEqual(hashes["a.txt"], hashlib.md5(b"alpha").hexdigest())
+            self.assertEqual(rehashed, 2)
+
+            # Racily clean: stats recorded before the file's mtime are not trusted
+            hashes, _, _ = hash_changed_files([a], root, saved_hashes, saved_stats, 0)
+            self.assertEqual(hashes["a.txt"], hashlib.md5(b"alpha").hexdigest())
+
     def test_compute_folder_hash(self):
         file_hashes = {
             "src/a.ts": "hash-a",
@@ -64,6 +135,30 @@ class TestCartographer(unittest.TestCase):
         h3 = compute_folder_hash("src", file_hashes_alt)
         self.assertNotEqual(h1, h3)
 
+    def test_folder_hashes_incremental_matches_full(self):
+        file_hashes = {
+            "README.md": "h-readme",
+            "src/a.ts": "h-a",
+            "src/lib/b.ts": "h-b",
+            "src/lib/deep/c.ts": "h-c",
+            "tests/t.ts": "h-t",
+        }
+        full = compute_folder_hashes(file_hashes)
+        self.assertEqual(set(full), {".", "src", "src/lib", "src/lib/deep", "tests"})
+
+        changed = dict(file_hashes)
+        changed["src/lib/deep/c.ts"] = "h-c2"
+        del changed["tests/t.ts"]
+        changed["docs/new.md"] = "h-new"
+        incremental = update_folder_hashes(
+            full, changed, {"src/lib/deep/c.ts", "tests/t.ts", "docs/new.md"}
+        )
+        self.assertEqual(incremental, compute_folder_hashes(changed))
+        self.assertNotIn("tests", incremental)
+        # Untouched siblings keep their hash, ancestors of the change do not
+        self.assertNotEqual(incremental["src/lib"], full["src/lib"])
+        self.assertNotEqual(incremental["."], full["."])
+
     def test_select_files(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             root = Path(tmpdir)
@@ -83,5 +178,581 @@ class TestCartographer(unittest.TestCase):
             rel_selected = sorted([os.path.relpath(f, root) for f in selected])
             self.assertEqual(rel_selected, ["package.json", "src/index.ts"])
 
+
+
+class TestSelectFilesPruning(unittest.TestCase):
+    def test_pruned_directories_are_not_walked(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "src" / "index.ts").write_text("code")
+            (root / "node_modules" / "pkg").mkdir(parents=True)
+            (root / "node_modules" / "pkg" / "index.js").write_text("dep")
+            (root / "vendor" / "lib").mkdir(parents=True)
+            (root / "vendor" / "lib" / "keep.ts").write_text("keep")
+            (root / "vendor" / "lib" / "drop.ts").write_text("drop")
+
+            walked = []
+            real_walk = os.walk
+
+            def recording_walk(top, *args, **kwargs):
+                for entry in real_walk(top, *args, **kwargs):
+                    walked.append(os.path.relpath(entry[0], tmpdir).replace("\\", "/"))
+                    yield entry
+
+            with unittest.mock.patch("cartographer.os.walk", recording_walk):
+                selected = select_files(
+                    root, ["**/*"], ["node_modules/", "vendor/"], ["vendor/lib/keep.ts"], []
+                )
+
+            rel_selected = sorted(f.relative_to(root).as_posix() for f in selected)
+            self.assertEqual(rel_selected, ["src/index.ts", "vendor/lib/keep.ts"])
+            self.assertNotIn("node_modules", walked)
+            self.assertNotIn("node_modules/pkg", walked)
+            # vendor holds an exception, so it must still be walked
+            self.assertIn("vendor/lib", walked)
+
+
+
+class TestGitignoreMatcher(unittest.TestCase):
+    def _tree(self, root, files):
+        for rel_path, content in files.items():
+            path = root / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+
+    def test_negation_anchoring_and_nested_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root, {
+                "src/.gitignore": "generated/\n!important.log\n/local.ts\n*.ts.bak\n",
+            })
+            matcher = cartographer.GitignoreMatcher(root, [
+                "# comment",
+                "*.log",
+                "!keep.log",
+                "/build/",
+                "docs/*.tmp",
+                "**/cache/**",
+                "logs/",
+                "!logs/keep.txt",
+                "\\#hash",
+                "trailing   ",
+                "[ab]?.cfg",
+            ])
+            ignored = [
+                "a.log", "x/y/a.log", "build/out.js", "docs/a.tmp", "x/cache/y.txt",
+                "logs/keep.txt", "#hash", "trailing", "a1.cfg",
+                "src/local.ts", "src/generated/a.ts", "src/x.ts.bak",
+            ]
+            kept = [
+                "keep.log", "src/build/out.js", "src/docs/a.tmp", "cache", "#other",
+                "c1.cfg", "src/important.log", "src/sub/important.log",
+                "src/sub/local.ts", "src/a.ts",
+            ]
+            for rel_path in ignored:
+                self.assertTrue(matcher.matches(rel_path), rel_path)
+            for rel_path in kept:
+                self.assertFalse(matcher.matches(rel_path), rel_path)
+            self.assertTrue(matcher.covers_directory("build"))
+            self.assertFalse(matcher.covers_directory("src/build"))
+            # Directory-only rules do not match files of the same name
+            self.assertFalse(matcher.matches("build"))
+
+    def test_nested_files_are_loaded_lazily(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root, {
+                ".gitignore": "out/\n",
+                "a/.gitignore": "*.gen.ts\n",
+                "a/x.ts": "",
+                "a/x.gen.ts": "",
+                "out/.gitignore": "",
+                "out/y.ts": "",
+                "b/z.gen.ts": "",
+            })
+            matcher = cartographer.GitignoreMatcher(root, cartographer.load_gitignore(root))
+            self.assertTrue(matcher.covers_directory("out"))
+            self.assertNotIn("a", matcher._rules)
+            self.assertTrue(matcher.matches("a/x.gen.ts"))
+            self.assertIn("a", matcher._rules)
+            # Ignored directories are never entered, so their ignore files are never read
+            self.assertNotIn("out", matcher._rules)
+
+            selected = select_files(root, ["**/*.ts"], [], [], cartographer.load_gitignore(root))
+            rel_selected = sorted(f.relative_to(root).as_posix() for f in selected)
+            self.assertEqual(rel_selected, ["a/x.ts", "b/z.gen.ts"])
+
+    def test_literal_patterns_do_not_grow_the_regex_path(self):
+        patterns = [f"name{i}.txt" for i in range(500)] + [f"*.ext{i}" for i in range(500)]
+        patterns += [f"/dir{i}/file" for i in range(500)]
+        rules = cartographer._IgnoreRules(patterns)
+        self.assertEqual(rules.name_globs, [])
+        self.assertTrue(rules.match(["name42.txt"], False))
+        self.assertTrue(rules.match(["x.ext7"], False))
+        self.assertTrue(rules.match(["dir3", "file"], False))
+        self.assertIsNone(rules.match(["sub", "dir3", "file"], False))
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class TestGitSource(unittest.TestCase):
+    def _git(self, root, *args):
+        subprocess.run(
+            ["git", "-C", str(root), "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def test_git_source_hashes_only_dirty_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "build").mkdir()
+            (root / "src" / "a.ts").write_text("alpha")
+            (root / "src" / "b.ts").write_text("beta")
+            (root / "build" / "out.js").write_text("built")
+            (root / ".gitignore").write_text("build/\n")
+            self._git(root, "init", "-q")
+            self._git(root, "add", ".")
+            self._git(root, "commit", "-q", "-m", "init")
+
+            (root / "src" / "b.ts").write_text("beta changed")
+            (root / "src" / "c.ts").write_text("gamma")
+
+            clean, to_hash = cartographer.select_files_git(root, ["**/*"], [], [])
+            self.assertEqual(sorted(clean), [".gitignore", "src/a.ts"])
+            self.assertEqual(
+                sorted(p.relative_to(root).as_posix() for p in to_hash), ["src/b.ts", "src/c.ts"]
+            )
+
+            metadata = {"include_patterns": ["src/**/*.ts"], "hash_algo": "git-sha1"}
+            hashes, _, rehashed, source = cartographer.scan_repository(
+                root, metadata, {}, {}, "git", jobs=1
+            )
+            self.assertEqual(source, "git")
+            self.assertEqual(rehashed, 2)
+            self.assertEqual(
+                hashes["src/a.ts"], hashlib.sha1(b"blob 5\0alpha").hexdigest()
+            )
+            self.assertEqual(
+                hashes["src/b.ts"], cartographer.compute_git_blob_hash(root / "src" / "b.ts")
+            )
+
+    def test_git_source_falls_back_outside_work_tree(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            with unittest.mock.patch("cartographer._run_git", return_value=None):
+                self.assertIsNone(cartographer.select_files_git(root, ["**/*"], [], []))
+
+
+
+class TestStateStore(unittest.TestCase):
+    def _legacy_state(self):
+        return {
+            "metadata": {"version": "1.0.0", "include_patterns": ["**/*"]},
+            "file_hashes": {"a.ts": "h-a", "src/b.ts": "h-b", "src/lib/c.ts": "h-c", "srcx/d.ts": "h-d"},
+            "file_stats": {"a.ts": [1, 2, 3]},
+            "folder_hashes": {".": "f-root", "src": "f-src", "src/lib": "f-lib", "srcx": "f-x"},
+        }
+
+    def test_legacy_json_is_migrated_to_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            cartographer.save_state(root, self._legacy_state())
+
+            store = cartographer.open_state_store(root)
+            try:
+                self.assertEqual(store.backend, "sqlite")
+                hashes, stats = store.load_files()
+                self.assertEqual(hashes, self._legacy_state()["file_hashes"])
+                self.assertEqual(stats, {"a.ts": [1, 2, 3]})
+                self.assertEqual(store.load_metadata()["include_patterns"], ["**/*"])
+            finally:
+                store.close()
+            self.assertFalse((root / ".miya" / "cartography.json").exists())
+            self.assertTrue((root / ".miya" / "cartography.json.bak").exists())
+
+    def test_changes_does_not_migrate_legacy_json(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            cartographer.save_state(root, self._legacy_state())
+
+            code, _ = run_changes(root, format="json")
+            self.assertEqual(code, 0)
+            self.assertTrue((root / ".miya" / "cartography.json").exists())
+            self.assertFalse((root / ".miya" / "cartography.json.bak").exists())
+            self.assertFalse((root / ".miya" / cartographer.STATE_DB_FILE).exists())
+
+    def test_prefix_lookup_and_incremental_commit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for backend in ("sqlite", "json"):
+                store = cartographer.create_state_store(root, backend)
+                try:
+                    cartographer._import_state(store, self._legacy_state())
+                    hashes, _ = store.load_files("src")
+                    self.assertEqual(sorted(hashes), ["src/b.ts", "src/lib/c.ts"])
+                    self.assertEqual(sorted(store.load_folders("src")), ["src/lib"])
+
+                    store.commit({"version": "1.0.0"}, {"src/b.ts": ("h-b2", [4, 5, 6])}, {"a.ts"}, {}, {"srcx"})
+                    hashes, stats = store.load_files()
+                    self.assertNotIn("a.ts", hashes)
+                    self.assertEqual(hashes["src/b.ts"], "h-b2")
+                    self.assertEqual(stats["src/b.ts"], [4, 5, 6])
+                    self.assertNotIn("srcx", store.load_folders())
+                finally:
+                    store.close()
+
+
+def init_state(root, include=("src/**/*.ts",), source="fs", chunk_threshold="0", state_backend="sqlite"):
+    args = argparse.Namespace(
+        root=str(root), include=list(include), exclude=[], exception=[],
+        jobs=1, source=source, state_backend=state_backend, chunk_threshold=chunk_threshold,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert cartographer.cmd_init(args) == 0
+
+
+def run_changes(root, **overrides):
+    args = argparse.Namespace(
+        root=str(root), jobs=1, verify=False, source=None, no_watch=False,
+        format="text", path=None, since_commit=None,
+    )
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        code = cartographer.cmd_changes(args)
+    return code, out.getvalue()
+
+
+class TestWatch(unittest.TestCase):
+    def _init(self, root):
+        init_state(root)
+
+    def _changes(self, root, **overrides):
+        code, out = run_changes(root, **overrides)
+        self.assertEqual(code, 0)
+        return out
+
+    def test_refresh_paths_matches_full_scan(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src" / "lib").mkdir(parents=True)
+            (root / "src" / "a.ts").write_text("alpha")
+            (root / "src" / "lib" / "b.ts").write_text("beta")
+            self._init(root)
+
+            watcher = cartographer.TreeWatcher(root, jobs=1)
+            self.assertTrue(watcher.load_baseline())
+            watcher.rescan()
+            self.assertEqual(watcher.write_report()["modified"], [])
+
+            (root / "src" / "a.ts").write_text("alpha changed")
+            (root / "src" / "lib" / "b.ts").unlink()
+            (root / "src" / "c.ts").write_text("gamma")
+            (root / "src" / "notes.md").write_text("not selected")
+            watcher.refresh_paths({"src/a.ts", "src/lib/b.ts", "src/c.ts", "src/notes.md"})
+
+            report = watcher.write_report()
+            self.assertEqual(report["added"], ["src/c.ts"])
+            self.assertEqual(report["removed"], ["src/lib/b.ts"])
+            self.assertEqual(report["modified"], ["src/a.ts"])
+            self.assertEqual(watcher.folder_hashes, compute_folder_hashes(watcher.hashes))
+
+            # `changes` answers from the report without scanning
+            with unittest.mock.patch.object(cartographer, "scan_repository") as scan:
+                out = self._changes(root)
+                scan.assert_not_called()
+            self.assertIn("+ src/c.ts", out)
+            self.assertIn("~ src/a.ts", out)
+            self.assertEqual(out, self._changes(root, no_watch=True))
+
+    def test_stale_or_pending_report_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "src" / "a.ts").write_text("alpha")
+            self._init(root)
+
+            watcher = cartographer.TreeWatcher(root, jobs=1)
+            watcher.load_baseline()
+            watcher.rescan()
+            watcher.write_report(pending=True)
+            metadata = {"last_run": watcher.metadata.get("last_run")}
+            self.assertIsNone(cartographer.read_watch_report(root, metadata, "fs"))
+
+            report = watcher.write_report()
+            self.assertIsNotNone(cartographer.read_watch_report(root, metadata, "fs"))
+            self.assertIsNone(cartographer.read_watch_report(root, {"last_run": "other"}, "fs"))
+            self.assertIsNone(cartographer.read_watch_report(root, metadata, "git"))
+            with unittest.mock.patch.object(
+                cartographer.time, "time_ns", return_value=report["heartbeat_ns"] + report["stale_after_ns"] + 1
+            ):
+                self.assertIsNone(cartographer.read_watch_report(root, metadata, "fs"))
+
+    def test_polling_run_picks_up_edits(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "src" / "a.ts").write_text("alpha")
+            self._init(root)
+
+            watcher = cartographer.TreeWatcher(root, jobs=1, interval_s=0.01, debounce_s=0.01)
+            watcher.load_baseline()
+            (root / "src" / "b.ts").write_text("beta")
+            with contextlib.redirect_stderr(io.StringIO()):
+                watcher.run(polling=True, max_cycles=1)
+            report = json.loads((root / ".miya" / "cartography-watch.json").read_text())
+            self.assertEqual(report["added"], ["src/b.ts"])
+            self.assertFalse(report["pending"])
+
+
+class TestChangesOutput(unittest.TestCase):
+    def _tree(self, root):
+        for rel_path in ("src/api/a.ts", "src/api/b.ts", "src/ui/c.ts", "lib/d.ts"):
+            (root / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            (root / rel_path).write_text(rel_path)
+
+    def test_json_and_ndjson_formats(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root)
+            init_state(root, include=["**/*.ts"])
+            (root / "src/api/a.ts").write_text("changed")
+            (root / "src/ui/c.ts").unlink()
+            (root / "src/api/e.ts").write_text("new")
+
+            code, out = run_changes(root, format="json")
+            self.assertEqual(code, 0)
+            report = json.loads(out)
+            self.assertEqual(report["added"], ["src/api/e.ts"])
+            self.assertEqual(report["removed"], ["src/ui/c.ts"])
+            self.assertEqual(report["modified"], ["src/api/a.ts"])
+            self.assertEqual(report["affected_folders"], [".", "src", "src/api", "src/ui"])
+            self.assertEqual(report["scope"], ".")
+
+            code, out = run_changes(root, format="ndjson")
+            lines = [json.loads(line) for line in out.splitlines()]
+            self.assertEqual(
+                [(line["status"], line["path"]) for line in lines[:-1]],
+                [("added", "src/api/e.ts"), ("removed", "src/ui/c.ts"), ("modified", "src/api/a.ts")],
+            )
+            self.assertEqual(lines[-1]["type"], "summary")
+            self.assertEqual(lines[-1]["modified"], 1)
+
+    def test_path_scope_only_walks_the_subtree(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root)
+            init_state(root, include=["**/*.ts"])
+            (root / "src/api/a.ts").write_text("changed")
+            (root / "lib/d.ts").write_text("changed")
+
+            walked = []
+            real_walk = os.walk
+
+            def recording_walk(top, *args, **kwargs):
+                walked.append(os.path.relpath(top, tmpdir).replace("\\", "/"))
+                return real_walk(top, *args, **kwargs)
+
+            with unittest.mock.patch("cartographer.os.walk", recording_walk):
+                code, out = run_changes(root, format="json", path="src/api/")
+            self.assertEqual(code, 0)
+            self.assertEqual(walked, ["src/api"])
+            report = json.loads(out)
+            self.assertEqual(report["scope"], "src/api")
+            self.assertEqual(report["modified"], ["src/api/a.ts"])
+            self.assertEqual(report["removed"], [])
+
+            code, _ = run_changes(root, path="../elsewhere")
+            self.assertEqual(code, 1)
+
+    @unittest.skipUnless(shutil.which("git"), "git is not installed")
+    def test_since_commit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root)
+            git = ["git", "-C", str(root), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+            subprocess.run([*git, "init", "-q"], check=True)
+            subprocess.run([*git, "add", "."], check=True)
+            subprocess.run([*git, "commit", "-q", "-m", "one"], check=True)
+            first = cartographer.git_head(root)
+            (root / "lib/d.ts").write_text("second")
+            subprocess.run([*git, "commit", "-q", "-am", "two"], check=True)
+            init_state(root, include=["**/*.ts"])
+            (root / "src/ui/c.ts").write_text("dirty")
+
+            # Default revision is the commit saved in state: same as a plain diff
+            code, out = run_changes(root, format="json", since_commit="")
+            self.assertEqual(code, 0)
+            report = json.loads(out)
+            self.assertEqual(report["since"], cartographer.git_head(root))
+            self.assertEqual(report["modified"], ["src/ui/c.ts"])
+
+            code, out = run_changes(root, format="json", since_commit=first)
+            report = json.loads(out)
+            self.assertEqual(report["since"], first)
+            self.assertEqual(report["modified"], ["lib/d.ts", "src/ui/c.ts"])
+
+            code, out = run_changes(root, format="json", since_commit=first, path="src")
+            self.assertEqual(json.loads(out)["modified"], ["src/ui/c.ts"])
+
+            code, _ = run_changes(root, since_commit="no-such-rev")
+            self.assertEqual(code, 1)
+
+    @unittest.skipUnless(shutil.which("git"), "git is not installed")
+    def test_since_commit_counts_edits_hashed_at_update(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            self._tree(root)
+            git = ["git", "-C", str(root), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+            subprocess.run([*git, "init", "-q"], check=True)
+            subprocess.run([*git, "add", "."], check=True)
+            subprocess.run([*git, "commit", "-q", "-m", "one"], check=True)
+            first = cartographer.git_head(root)
+            init_state(root, include=["**/*.ts"])
+            # Dirty edit taken into the saved state by update
+            (root / "src/ui/c.ts").write_text("dirty")
+            args = argparse.Namespace(root=str(root), jobs=1, verify=False, source=None)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(cartographer.cmd_update(args), 0)
+
+            code, out = run_changes(root, format="json", since_commit="HEAD")
+            self.assertEqual(code, 0)
+            self.assertEqual(json.loads(out)["modified"], ["src/ui/c.ts"])
+
+            # Committed afterwards: the recorded commit is now HEAD~1 and still differs
+            subprocess.run([*git, "commit", "-q", "-am", "two"], check=True)
+            code, out = run_changes(root, format="json", since_commit=first)
+            self.assertEqual(json.loads(out)["modified"], ["src/ui/c.ts"])
+
+
+def _text_blob(lines, seed=0):
+    import random
+    rng = random.Random(seed)
+    return b"".join(b"%d %032x\n" % (i, rng.getrandbits(128)) for i in range(lines))
+
+
+class TestChunkedHashing(unittest.TestCase):
+    def test_insertion_only_rechunks_nearby_region(self):
+        data = _text_blob(100_000)
+        file_hash, chunks, delta = cartographer.chunk_buffer(data)
+        self.assertEqual(file_hash, hashlib.md5(data).hexdigest())
+        self.assertIsNone(delta)
+        self.assertEqual(sum(length for length, _ in chunks), len(data))
+        self.assertGreater(len(chunks), 4)
+
+        middle = data.index(b"\n", len(data) // 2) + 1
+        edited = data[:middle] + b"inserted line\n" + data[middle:]
+        new_hash, new_chunks, delta = cartographer.chunk_buffer(edited, chunks)
+        self.assertEqual(new_hash, hashlib.md5(edited).hexdigest())
+        self.assertEqual(new_chunks, cartographer.chunk_buffer(edited)[1])
+        self.assertEqual(len(delta["regions"]), 1)
+        start, end = delta["regions"][0]
+        self.assertLessEqual(start, middle)
+        self.assertGreater(end, middle)
+        self.assertLess(delta["changed_bytes"], len(data) // 3)
+        self.assertEqual(delta["changed_bytes"] - delta["removed_bytes"], len(b"inserted line\n"))
+
+    def test_changes_report_regions_and_folder_volume(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "data").mkdir()
+            (root / "src").mkdir()
+            big = _text_blob(60_000, seed=1)
+            (root / "data" / "big.txt").write_bytes(big)
+            (root / "src" / "a.txt").write_text("small")
+            init_state(root, include=["**/*.txt"], chunk_threshold="256k")
+
+            store = cartographer.open_state_store(root)
+            try:
+                self.assertEqual(list(store.load_chunks()), ["data/big.txt"])
+            finally:
+                store.close()
+
+            offset = len(big) // 3
+            edited = big[:offset] + b"X" + big[offset + 1 :]
+            (root / "data" / "big.txt").write_bytes(edited)
+            (root / "src" / "a.txt").write_text("small!")
+
+            code, out = run_changes(root, format="json")
+            self.assertEqual(code, 0)
+            report = json.loads(out)
+            self.assertEqual(report["modified"], ["data/big.txt", "src/a.txt"])
+            delta = report["regions"]["data/big.txt"]
+            self.assertEqual(len(delta["regions"]), 1)
+            self.assertTrue(delta["regions"][0][0] <= offset < delta["regions"][0][1])
+            volume = report["folder_changed_bytes"]
+            self.assertEqual(volume["src"], 6)
+            self.assertEqual(volume["data"], delta["changed_bytes"] + delta["removed_bytes"])
+            self.assertLess(volume["data"], len(big) // 2)
+            self.assertEqual(volume["."], volume["data"] + volume["src"])
+
+            _, text = run_changes(root)
+            self.assertIn("Changed bytes by folder:", text)
+
+            args = argparse.Namespace(root=str(root), jobs=1, verify=False, source=None)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(cartographer.cmd_update(args), 0)
+            report = json.loads(run_changes(root, format="json")[1])
+            self.assertEqual(report["modified"], [])
+            store = cartographer.open_state_store(root)
+            try:
+                chunks = store.load_chunks()["data/big.txt"]
+            finally:
+                store.close()
+            self.assertEqual(chunks, cartographer.chunk_buffer(edited)[1])
+
+
+class TestBenchHarness(unittest.TestCase):
+    def test_json_backend_is_measured_without_migration(self):
+        import bench_cartographer
+
+        self.assertEqual(bench_cartographer.parse_sizes("1k:0.5,2m"), [(1024, 0.5), (2 * 1024 * 1024, 1.0)])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            args = argparse.Namespace(
+                files=20, depth=2, sizes="100:1", ignored_weight=0.0, patterns=4,
+                change_ratio=0.2, repeats=1, jobs=1, backend="json", seed=1,
+                workdir=tmpdir, keep=True,
+            )
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                bench_cartographer.run_benchmark(args)
+            state_dir = Path(tmpdir) / "repo" / ".miya"
+            self.assertTrue((state_dir / cartographer.STATE_FILE).exists())
+            self.assertFalse((state_dir / cartographer.STATE_DB_FILE).exists())
+            self.assertFalse((state_dir / (cartographer.STATE_FILE + ".bak")).exists())
+            self.assertNotIn("Migrated", stderr.getvalue())
+
+    def test_small_run_and_regression_check(self):
+        import bench_cartographer
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            args = argparse.Namespace(
+                files=60, depth=3, sizes="100:1,2k:1", ignored_weight=0.25, patterns=8,
+                change_ratio=0.1, repeats=2, jobs=1, backend="sqlite", seed=3,
+                workdir=tmpdir, keep=False,
+            )
+            result = bench_cartographer.run_benchmark(args)
+            self.assertEqual(result["tree"]["files"], 60)
+            # Every generated file outside ignored directories, plus .gitignore itself
+            self.assertEqual(
+                result["counts"]["selected"], 60 - result["tree"]["ignored_files"] + 1
+            )
+            self.assertGreater(result["counts"]["changed"], 0)
+            self.assertLess(result["counts"]["rehashed"], result["counts"]["selected"])
+            for phase in ("init.select", "init.hash", "changes.scan", "update.state_commit"):
+                self.assertEqual(result["phases"][phase]["runs"], 2)
+
+        baseline = {"phases": {"a": {"median_ms": 100.0}, "b": {"median_ms": 1.0}}}
+        current = {"phases": {"a": {"median_ms": 150.0}, "b": {"median_ms": 3.0}}}
+        rows = {row["phase"]: row for row in bench_cartographer.compare_results(current, baseline, 0.2)}
+        self.assertTrue(rows["a"]["regressed"])
+        # Tripled, but below the absolute noise floor
+        self.assertFalse(rows["b"]["regressed"])
+
+
 if __name__ == "__main__":
     unittest.main()